@@ -39,34 +39,52 @@
     This module contains some functions to analyse Javascript code inside the PDF file
 '''
 
-import sys, re , os, jsbeautifier, traceback
-from PDFUtils import unescapeHTMLEntities, escapeString
+import sys, re , os, math, traceback, time, threading, multiprocessing, hashlib, json, binascii
+from collections import OrderedDict
+from PDFUtils import unescapeHTMLEntities, escapeString, isModuleAvailable
 try:
-    import PyV8
-    
-    JS_MODULE = True
-    
-    class Global(PyV8.JSClass):
-        evalCode = ''
-        
-        def evalOverride(self, expression):
-            self.evalCode += '\n\n// New evaluated code\n' + expression
-            return
-        
+    import Queue
 except:
-    JS_MODULE = False
+    import queue as Queue
+try:
+    import resource
+except:
+    resource = None
+
+# PyV8 is imported by loadJSEngine the first time some code is evaluated
+JS_MODULE = isModuleAvailable('PyV8')
+PyV8 = None
+Global = None
 
 
 errorsFile = 'errors.txt'
 newLine = os.linesep         
 reJSscript = '<script[^>]*?contentType\s*?=\s*?[\'"]application/x-javascript[\'"][^>]*?>(.*?)</script>'
 preDefinedCode = 'var app = this;'
+rePercentEscapedTokens = re.compile(br'((?:%+[uU][0-9a-fA-F]{4})+)|((?:%+[0-9a-fA-F]{2})+)|(%+)|([^%]+)')
+reBackslashEscapedTokens = re.compile(br'((?:\\+[uU][0-9a-fA-F]{4})+)|((?:\\+[0-9a-fA-F]{2})+)|(\\+)|([^\\]+)')
+escapeChars = b'%\\uU'
+jsCache = None
+shellcodeCache = OrderedDict()
+maxShellcodeCacheEntries = 1000
+shellcodeCacheLock = threading.Lock()
+maxBeautifySize = 2*1024*1024
+countLogTable = [0.0] + [count * math.log(count, 2) for count in range(1, 4097)]
+# NOP and the 0x0c0c0c0c sled of the classic heap sprays
+reNopSled = re.compile(br'([\x90\x0c])\1{127,}')
+reTextBlock = re.compile(br'^[\x09\x0a\x0d\x20-\x7e]*$')
+shellcodeSignatures = {'GetPC code (call/pop)':re.compile(br'\xe8\x00\x00\x00\x00[\x58-\x5f]'),
+                       'GetPC code (call $+4)':re.compile(br'\xe8\xff\xff\xff\xff[\xc0-\xc7]'),
+                       'GetPC code (fnstenv)':re.compile(br'\xd9\x74\x24\xf4'),
+                       'PEB access':re.compile(br'\x64(?:\xa1|\x8b[\x05\x0d\x15\x1d\x25\x2d\x35\x3d])\x30\x00\x00\x00'),
+                       'XOR decoder loop':re.compile(br'\x80[\x30-\x37\x70-\x77][\x00-\xff]{1,2}[\x40-\x47]\xe2[\xe0-\xff]')}
 
-def analyseJS(code, context = None, manualAnalysis = False):
+def analyseJS(code, context = None, manualAnalysis = False, maxStages = 0):
     '''
         Hooks the eval function and search for obfuscated elements in the Javascript code
         
         @param code: The Javascript code (string)
+        @param maxStages: Maximum number of evaluated code stages to unwrap. By default: 0 (no limit).
         @return: List with analysis information of the Javascript code: [JSCode,unescapedBytes,urlsFound,errors,context], where 
                 JSCode is a list with the several stages Javascript code,
                 unescapedBytes is a list with the parameters of unescape functions, 
@@ -79,6 +97,11 @@ def analyseJS(code, context = None, manualAnalysis = False):
     unescapedBytes = []
     urlsFound = []
     
+    if jsCache != None and not manualAnalysis:
+        cachedResult = jsCache.get(code)
+        if cachedResult != None:
+            return cachedResult + [context]
+        cacheCode = code
     try:
         code = unescapeHTMLEntities(code)
         scriptElements = re.findall(reJSscript, code, re.DOTALL | re.IGNORECASE)
@@ -86,10 +109,10 @@ def analyseJS(code, context = None, manualAnalysis = False):
             code = ''
             for scriptElement in scriptElements:
                 code += scriptElement + '\n\n'
-        code = jsbeautifier.beautify(code)
+        code = beautify(code)
         JSCode.append(code)
     
-        if code != None and JS_MODULE and not manualAnalysis:
+        if code != None and not manualAnalysis and loadJSEngine():
             if context == None:
                 context = PyV8.JSContext(Global())
             context.enter()
@@ -97,11 +120,14 @@ def analyseJS(code, context = None, manualAnalysis = False):
             context.eval('eval=evalOverride')
             #context.eval(preDefinedCode)
             while True:
+                if maxStages > 0 and len(JSCode) >= maxStages:
+                    errors.append('Maximum number of evaluation stages reached ('+str(maxStages)+')')
+                    break
                 originalCode = code
                 try:
                     context.eval(code)
                     evalCode = context.eval('evalCode')
-                    evalCode = jsbeautifier.beautify(evalCode)
+                    evalCode = beautify(evalCode)
                     if evalCode != '' and evalCode != code:
                         code = evalCode
                         JSCode.append(code)
@@ -148,8 +174,79 @@ def analyseJS(code, context = None, manualAnalysis = False):
         for js in JSCode:
             if js == None or js == '':
                  JSCode.remove(js)
+    if jsCache != None and not manualAnalysis:
+        cacheJSAnalysis(cacheCode, [JSCode,unescapedBytes,urlsFound,errors])
     return [JSCode,unescapedBytes,urlsFound,errors,context]
  
+def getCachedJSAnalysis(code):
+    '''
+        Gets the memoized analysis of the given Javascript code, if the cache is enabled
+        
+        @param code: The Javascript code (string)
+        @return: List [JSCode,unescapedBytes,urlsFound,errors] or None if it's not cached
+    '''
+    if jsCache == None:
+        return None
+    return jsCache.get(code)
+
+def cacheJSAnalysis(code, result):
+    '''
+        Stores the analysis of the given Javascript code, if the cache is enabled and the analysis finished without errors
+        
+        @param code: The Javascript code (string)
+        @param result: List [JSCode,unescapedBytes,urlsFound,errors]
+    '''
+    if jsCache != None and result[3] == []:
+        jsCache.set(code, result)
+
+def enableJSCache(cacheDir = None, maxEntries = 10000):
+    '''
+        Enables the memoization of the Javascript analysis results, which is disabled by default.
+        A cached result is returned without evaluating the code again, so the shared execution context does not include the definitions of the cached scripts.
+        
+        @param cacheDir: Directory where the results are also stored to be reused between executions. By default: None (memory only).
+        @param maxEntries: Maximum number of results kept in memory. By default: 10000.
+        @return: The JSAnalysisCache instance used
+    '''
+    global jsCache
+    jsCache = JSAnalysisCache(cacheDir, maxEntries)
+    return jsCache
+
+def loadJSEngine():
+    '''
+        Imports the Javascript engine (PyV8) the first time it is needed
+        
+        @return: A boolean, False if PyV8 is not installed or can't be loaded
+    '''
+    global JS_MODULE, PyV8, Global
+    if PyV8 == None and JS_MODULE:
+        try:
+            import PyV8 as engine
+            
+            class JSGlobal(engine.JSClass):
+                evalCode = ''
+                
+                def evalOverride(self, expression):
+                    self.evalCode += '\n\n// New evaluated code\n' + expression
+                    return
+            
+            PyV8, Global = engine, JSGlobal
+        except:
+            JS_MODULE = False
+    return JS_MODULE
+ 
+def beautify(code):
+    '''
+        Beautifies the Javascript code unless it's bigger than maxBeautifySize. Big scripts are kept as they are and can be beautified later for display purposes with jsbeautifier.
+        
+        @param code: The Javascript code (string)
+        @return: The beautified code or the original one if it exceeds the size limit
+    '''
+    if maxBeautifySize > 0 and len(code) > maxBeautifySize:
+        return code
+    import jsbeautifier
+    return jsbeautifier.beautify(code)
+
 def getVarContent(jsCode, varContent):
     '''
         Given the Javascript code and the content of a variable this method tries to obtain the real value of the variable, cleaning expressions like "a = eval; a(js_code);"
@@ -238,39 +335,510 @@ def unescape(escapedBytes, unicode = True):
         @param escapedBytes: A string to unescape
         @return: A tuple (status,statusContent), where statusContent is an unescaped string in case status = 0 or an error in case status = -1
     '''
-    #TODO: modify to accept a list of escaped strings?
-    unescapedBytes = ''
-    if unicode:
-        unicodePadding = '\x00'
-    else:
-        unicodePadding = ''
+    ret = unescapeWithOffsets(escapedBytes, unicode)
+    if ret[0] == -1:
+        return ret
+    return (0,ret[1][0])
+
+def unescapeWithOffsets(escapedBytes, unicode = True):
+    '''
+        This method unescapes the given string in one pass, decoding each run of consecutive %uXXXX, \\uXXXX or %XX sequences at once
+        
+        @param escapedBytes: A string to unescape
+        @param unicode: A boolean indicating if the non %uXXXX characters must be padded with a null byte. By default: True.
+        @return: A tuple (status,statusContent), where statusContent is a list [unescapedBytes,regions] in case status = 0 or an error in case status = -1. 
+                regions is a list of (start,end) offsets of the decoded sequences in unescapedBytes.
+    '''
+    regions = []
+    isText = not isinstance(escapedBytes, bytes)
     try:
-        if escapedBytes.lower().find('%u') != -1 or escapedBytes.lower().find(r'\u') != -1 or escapedBytes.find('%') != -1:
-            if escapedBytes.lower().find(r'\u') != -1:
-                splitBytes = escapedBytes.split('\\')
-            else:
-                splitBytes = escapedBytes.split('%')
-            for i in range(len(splitBytes)):
-                splitByte = splitBytes[i]
-                if splitByte == '':
-                    continue
-                if len(splitByte) > 4 and re.match('u[0-9a-f]{4}',splitByte[:5],re.IGNORECASE):
-                    unescapedBytes += chr(int(splitByte[3]+splitByte[4],16))+chr(int(splitByte[1]+splitByte[2],16))
-                    if len(splitByte) > 5:
-                        for j in range(5,len(splitByte)): 
-                            unescapedBytes += splitByte[j] + unicodePadding
-                elif len(splitByte) > 1 and re.match('[0-9a-f]{2}',splitByte[:2],re.IGNORECASE):
-                    unescapedBytes += chr(int(splitByte[0]+splitByte[1],16)) + unicodePadding
-                    if len(splitByte) > 2:
-                        for j in range(2,len(splitByte)): 
-                            unescapedBytes += splitByte[j] + unicodePadding
-                else:
-                    if i != 0:
-                        unescapedBytes += '%' + unicodePadding
-                    for j in range(len(splitByte)):
-                        unescapedBytes += splitByte[j] + unicodePadding
+        lowerBytes = escapedBytes.lower()
+        if lowerBytes.find('%u') == -1 and lowerBytes.find(r'\u') == -1 and escapedBytes.find('%') == -1:
+            return (0,[escapedBytes,regions])
+        if lowerBytes.find(r'\u') != -1:
+            reTokens = reBackslashEscapedTokens
+            separator = b'\\'
         else:
-            unescapedBytes = escapedBytes
+            reTokens = rePercentEscapedTokens
+            separator = b'%'
+        if isText:
+            escapedBytes = escapedBytes.encode('latin-1', 'replace')
+        # The leading characters are decoded like any other escaped sequence
+        addedSeparator = not escapedBytes.startswith(separator)
+        if addedSeparator:
+            escapedBytes = separator + escapedBytes
+        if unicode:
+            padding = 2
+        else:
+            padding = 1
+        output = bytearray()
+        for match in reTokens.finditer(escapedBytes):
+            unicodeRun, byteRun, separators, text = match.groups()
+            start = len(output)
+            if unicodeRun != None:
+                # %uHHLL is stored little-endian: LL HH
+                rawBytes = bytearray(binascii.unhexlify(unicodeRun.translate(None, escapeChars)))
+                decodedBytes = bytearray(len(rawBytes))
+                decodedBytes[0::2] = rawBytes[1::2]
+                decodedBytes[1::2] = rawBytes[0::2]
+                output += decodedBytes
+                regions.append((start, len(output)))
+            elif byteRun != None:
+                rawBytes = binascii.unhexlify(byteRun.translate(None, escapeChars))
+                output += padBytes(rawBytes, padding)
+                regions.append((start, len(output)))
+            elif separators != None:
+                # A lonely separator is kept as a percent sign unless it is at the end
+                if match.end() != len(escapedBytes) and not (addedSeparator and match.start() == 0):
+                    output += padBytes(b'%', padding)
+            else:
+                output += padBytes(text, padding)
+        unescapedBytes = bytes(output)
+        if isText:
+            unescapedBytes = unescapedBytes.decode('latin-1')
     except:
         return (-1,'Error while unescaping the bytes')
-    return (0,unescapedBytes)
+    return (0,[unescapedBytes,regions])
+
+def padBytes(rawBytes, padding):
+    '''
+        Inserts a null byte after each byte of the given string if padding is 2
+        
+        @param rawBytes: The bytes to pad (string)
+        @param padding: Number of bytes per input byte in the output (1 or 2)
+        @return: A bytearray with the padded bytes
+    '''
+    if padding == 1:
+        return bytearray(rawBytes)
+    paddedBytes = bytearray(len(rawBytes)*padding)
+    paddedBytes[0::padding] = rawBytes
+    return paddedBytes
+
+def jsWorker(jobQueue, resultQueue, memoryLimit = 0, maxStages = 0):
+    '''
+        Main loop of a Javascript analysis worker process. The execution context is kept between jobs, so the interpreter stays warm.
+        
+        @param jobQueue: Queue where the jobs (jobId,code) are received. None stops the worker.
+        @param resultQueue: Queue where the results (jobId,[JSCode,unescapedBytes,urlsFound,errors]) are sent
+        @param memoryLimit: Maximum size of the address space of the worker in bytes. By default: 0 (no limit).
+        @param maxStages: Maximum number of evaluated code stages to unwrap per job. By default: 0 (no limit).
+    '''
+    if memoryLimit > 0 and resource != None:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memoryLimit, memoryLimit))
+        except:
+            pass
+    context = None
+    while True:
+        job = jobQueue.get()
+        if job == None:
+            break
+        jobId, code = job
+        try:
+            JSCode, unescapedBytes, urlsFound, errors, context = analyseJS(code, context, maxStages = maxStages)
+        except MemoryError:
+            JSCode, unescapedBytes, urlsFound, errors = [code], [], [], ['Memory limit exceeded while analysing Javascript']
+            context = None
+        resultQueue.put((jobId, [JSCode, unescapedBytes, urlsFound, errors]))
+
+
+class JSAnalysisCache :
+    '''
+        Content-addressed cache of Javascript analysis results, keyed by the SHA-256 of the code
+    '''
+    def __init__(self, cacheDir = None, maxEntries = 10000):
+        '''
+            Constructor of a JSAnalysisCache
+            
+            @param cacheDir: Directory where the results are also stored. By default: None (memory only).
+            @param maxEntries: Maximum number of results kept in memory. By default: 10000.
+        '''
+        self.cacheDir = cacheDir
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if cacheDir != None and not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+    
+    def get(self, code):
+        '''
+            Gets the stored analysis of the given Javascript code
+            
+            @param code: The Javascript code (string)
+            @return: A copy of the stored [JSCode,unescapedBytes,urlsFound,errors] or None if the code has not been analysed yet
+        '''
+        key = self.getKey(code)
+        self.lock.acquire()
+        try:
+            result = self.entries.pop(key, None)
+            if result != None:
+                self.entries[key] = result
+        finally:
+            self.lock.release()
+        if result == None and self.cacheDir != None:
+            try:
+                cacheFile = open(os.path.join(self.cacheDir, key), 'rb')
+                result = self.decodeResult(json.loads(cacheFile.read().decode('ascii')))
+                cacheFile.close()
+                self.storeEntry(key, result)
+            except:
+                result = None
+        if result == None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [list(element) for element in result]
+    
+    def decodeResult(self, storedResult):
+        '''
+            Rebuilds an analysis result read from the cache directory
+            
+            @param storedResult: List of lists of [type,text] pairs, as returned by encodeResult
+            @return: List [JSCode,unescapedBytes,urlsFound,errors]
+        '''
+        result = []
+        for storedElement in storedResult:
+            element = []
+            for elementType, text in storedElement:
+                if elementType == 'b':
+                    element.append(text.encode('latin-1'))
+                else:
+                    element.append(text)
+            result.append(element)
+        return result
+    
+    def encodeResult(self, result):
+        '''
+            Converts an analysis result to a structure which can be stored as JSON, keeping the bytes apart from the text
+            
+            @param result: List [JSCode,unescapedBytes,urlsFound,errors]
+            @return: List of lists of [type,text] pairs, where type is 'b' for bytes (stored as Latin-1) and 'u' for text
+        '''
+        storedResult = []
+        for element in result:
+            storedElement = []
+            for value in element:
+                if isinstance(value, bytes):
+                    storedElement.append(['b', value.decode('latin-1')])
+                else:
+                    storedElement.append(['u', value])
+            storedResult.append(storedElement)
+        return storedResult
+    
+    def getKey(self, code):
+        '''
+            Returns the SHA-256 of the exact bytes of the code, so only identical code shares an entry
+            
+            @param code: The Javascript code (string)
+            @return: The hexdigest used as key in the cache
+        '''
+        if isinstance(code, bytes):
+            code = b'b' + code
+        else:
+            code = b'u' + code.encode('utf-8')
+        return hashlib.sha256(code).hexdigest()
+    
+    def set(self, code, result):
+        '''
+            Stores the analysis of the given Javascript code
+            
+            @param code: The Javascript code (string)
+            @param result: List [JSCode,unescapedBytes,urlsFound,errors]
+        '''
+        key = self.getKey(code)
+        result = [list(element) for element in result[:4]]
+        self.storeEntry(key, result)
+        if self.cacheDir != None:
+            cachePath = os.path.join(self.cacheDir, key)
+            tempPath = cachePath + '.' + str(os.getpid()) + '.tmp'
+            try:
+                cacheFile = open(tempPath, 'wb')
+                cacheFile.write(json.dumps(self.encodeResult(result)).encode('ascii'))
+                cacheFile.close()
+                os.rename(tempPath, cachePath)
+            except:
+                if os.path.exists(tempPath):
+                    os.remove(tempPath)
+    
+    def storeEntry(self, key, result):
+        self.lock.acquire()
+        try:
+            self.entries.pop(key, None)
+            self.entries[key] = result
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last = False)
+        finally:
+            self.lock.release()
+
+
+class JSAnalysisJob :
+    '''
+        Pending Javascript analysis sent to a JSAnalysisPool
+    '''
+    def __init__(self, jobId, code, callback = None):
+        self.id = jobId
+        self.code = code
+        self.callback = callback
+        self.result = None
+        self.event = threading.Event()
+    
+    def getResult(self, timeout = None):
+        '''
+            Waits for the analysis to finish and returns its result
+            
+            @param timeout: Maximum number of seconds to wait. By default: None (wait forever).
+            @return: List with analysis information of the Javascript code: [JSCode,unescapedBytes,urlsFound,errors] or None if the timeout expires
+        '''
+        self.event.wait(timeout)
+        return self.result
+    
+    def isReady(self):
+        return self.event.is_set()
+    
+    def setResult(self, result):
+        self.result = result
+        self.code = None
+        self.event.set()
+        if self.callback != None:
+            try:
+                self.callback(self)
+            except:
+                traceback.print_exc(file=open(errorsFile,'a'))
+
+
+class JSAnalysisPool :
+    '''
+        Pool of reusable worker processes which analyse Javascript code asynchronously, with time, memory and evaluation stages limits per job
+    '''
+    def __init__(self, numWorkers = None, timeout = 30, memoryLimit = 512*1024*1024, maxStages = 20):
+        '''
+            Constructor of a JSAnalysisPool
+            
+            @param numWorkers: Number of worker processes. By default: None (number of CPUs).
+            @param timeout: Maximum number of seconds of wall time per job. By default: 30.
+            @param memoryLimit: Maximum size of the address space of each worker in bytes. By default: 512MB.
+            @param maxStages: Maximum number of evaluated code stages to unwrap per job. By default: 20.
+        '''
+        if numWorkers == None:
+            try:
+                numWorkers = multiprocessing.cpu_count()
+            except:
+                numWorkers = 1
+        self.numWorkers = max(1, numWorkers)
+        self.timeout = timeout
+        self.memoryLimit = memoryLimit
+        self.maxStages = maxStages
+        self.nextJobId = 0
+        self.pendingJobs = []
+        self.runningJobs = {}
+        self.workers = []
+        self.lock = threading.Lock()
+        self.resultQueue = multiprocessing.Queue()
+        self.closed = False
+        for i in range(self.numWorkers):
+            self.workers.append(self.startWorker())
+        self.dispatcher = threading.Thread(target = self.dispatch)
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+    
+    def close(self):
+        '''
+            Stops the workers once the pending jobs have finished
+        '''
+        while True:
+            self.lock.acquire()
+            busy = self.pendingJobs != [] or self.runningJobs != {}
+            self.lock.release()
+            if not busy:
+                break
+            time.sleep(0.05)
+        self.closed = True
+        for worker in self.workers:
+            worker[1].put(None)
+        for worker in self.workers:
+            worker[0].join(1)
+            if worker[0].is_alive():
+                worker[0].terminate()
+    
+    def dispatch(self):
+        '''
+            Loop run by the dispatcher thread: assigns pending jobs to idle workers, collects the results and kills the workers exceeding the time limit or dying
+        '''
+        while not self.closed:
+            try:
+                jobId, result = self.resultQueue.get(True, 0.05)
+            except Queue.Empty:
+                jobId = None
+            except:
+                jobId = None
+            self.lock.acquire()
+            try:
+                finishedJobs = []
+                if jobId != None and jobId in self.runningJobs:
+                    job, workerIndex, startTime = self.runningJobs.pop(jobId)
+                    finishedJobs.append((job, result))
+                now = time.time()
+                for runningId in list(self.runningJobs.keys()):
+                    job, workerIndex, startTime = self.runningJobs[runningId]
+                    process = self.workers[workerIndex][0]
+                    if self.timeout > 0 and now - startTime > self.timeout:
+                        errorMessage = 'Javascript analysis timed out after '+str(self.timeout)+' seconds'
+                    elif not process.is_alive():
+                        errorMessage = 'Javascript analysis worker died (exit code '+str(process.exitcode)+')'
+                    else:
+                        continue
+                    if process.is_alive():
+                        process.terminate()
+                    process.join()
+                    self.workers[workerIndex] = self.startWorker()
+                    del(self.runningJobs[runningId])
+                    finishedJobs.append((job, [[job.code], [], [], [errorMessage]]))
+                busyWorkers = [running[1] for running in self.runningJobs.values()]
+                for workerIndex in range(len(self.workers)):
+                    if self.pendingJobs == []:
+                        break
+                    if workerIndex not in busyWorkers:
+                        job = self.pendingJobs.pop(0)
+                        self.workers[workerIndex][1].put((job.id, job.code))
+                        self.runningJobs[job.id] = (job, workerIndex, time.time())
+            finally:
+                self.lock.release()
+            for job, result in finishedJobs:
+                job.setResult(result)
+    
+    def startWorker(self):
+        jobQueue = multiprocessing.Queue()
+        process = multiprocessing.Process(target = jsWorker, args = (jobQueue, self.resultQueue, self.memoryLimit, self.maxStages))
+        process.daemon = True
+        process.start()
+        return [process, jobQueue]
+    
+    def submit(self, code, callback = None):
+        '''
+            Queues the given Javascript code to be analysed by the workers
+            
+            @param code: The Javascript code (string)
+            @param callback: Function called with the JSAnalysisJob as argument when the analysis finishes. By default: None.
+            @return: A JSAnalysisJob instance to retrieve the result asynchronously
+        '''
+        self.lock.acquire()
+        try:
+            job = JSAnalysisJob(self.nextJobId, code, callback)
+            self.nextJobId += 1
+            self.pendingJobs.append(job)
+        finally:
+            self.lock.release()
+        return job
+
+def detectShellcode(unescapedBytes, blockSize = 1024, minSprayCoverage = 0.9, minSpraySize = 64*1024, maxEntropy = 7.0):
+    '''
+        Looks for typical shellcode and heap spraying patterns in the unescaped bytes: NOP sleds, repeated blocks, GetPC and decoder stubs and high entropy blocks. 
+        The buffer is processed with regular expressions and block level statistics, avoiding Python loops per byte. The findings are cached by the SHA-1 of the bytes, so each buffer is only analysed once.
+        
+        @param unescapedBytes: The unescaped bytes (string)
+        @param blockSize: Size of the blocks used to calculate the entropy. By default: 1024.
+        @param minSprayCoverage: Minimum fraction of the buffer covered by a repeated block to be considered a heap spray. By default: 0.9.
+        @param minSpraySize: Minimum size of the buffer to be considered a heap spray. By default: 64KB.
+        @param maxEntropy: Entropy per byte above which a block is considered anomalous. By default: 7.0.
+        @return: A dictionary with the findings names as keys and lists of (offset,size) tuples, one per occurrence, as values
+    '''
+    if not isinstance(unescapedBytes, bytes):
+        unescapedBytes = unescapedBytes.encode('latin-1', 'replace')
+    key = (hashlib.sha1(unescapedBytes).digest(), blockSize, minSprayCoverage, minSpraySize, maxEntropy)
+    shellcodeCacheLock.acquire()
+    try:
+        findings = shellcodeCache.pop(key, None)
+        if findings != None:
+            shellcodeCache[key] = findings
+            return dict([(name, list(findings[name])) for name in findings])
+    finally:
+        shellcodeCacheLock.release()
+    findings = {}
+    length = len(unescapedBytes)
+    if length > 0:
+        # NOP sleds: long runs of the same sled opcode
+        for match in reNopSled.finditer(unescapedBytes):
+            findings.setdefault('NOP sled', []).append((match.start(), match.end() - match.start()))
+        # Heap spray: a block repeated along most of the buffer
+        ret = getRepeatedBlockCoverage(unescapedBytes)
+        # repetitive JavaScript or plain text is not a spray, the sprayed blocks contain binary opcodes
+        if ret != None and length >= minSpraySize and ret[1] >= minSprayCoverage and not reTextBlock.match(unescapedBytes[ret[2]:ret[2]+max(ret[0], 32)]):
+            findings['Heap spray'] = [(ret[2], int(ret[1]*length))]
+        # GetPC and decoder stubs
+        for signature in shellcodeSignatures:
+            for match in shellcodeSignatures[signature].finditer(unescapedBytes):
+                findings.setdefault(signature, []).append((match.start(), match.end() - match.start()))
+        # Entropy anomalies, joining the consecutive blocks
+        anomalousBlocks = []
+        for offset in range(0, length, blockSize):
+            block = unescapedBytes[offset:offset+blockSize]
+            if len(block) < blockSize and offset != 0:
+                break
+            if len(block) >= 256 and getEntropy(block) > maxEntropy:
+                if anomalousBlocks != [] and sum(anomalousBlocks[-1]) == offset:
+                    anomalousBlocks[-1] = (anomalousBlocks[-1][0], anomalousBlocks[-1][1] + len(block))
+                else:
+                    anomalousBlocks.append((offset, len(block)))
+        if anomalousBlocks != []:
+            findings['High entropy data'] = anomalousBlocks
+    shellcodeCacheLock.acquire()
+    try:
+        shellcodeCache[key] = findings
+        while len(shellcodeCache) > maxShellcodeCacheEntries:
+            shellcodeCache.popitem(last = False)
+    finally:
+        shellcodeCacheLock.release()
+    return dict([(name, list(findings[name])) for name in findings])
+
+def getEntropy(data):
+    '''
+        Calculates the Shannon entropy per byte of the given data, counting only the bytes found in it with str.count, so the histogram is built without looping over the bytes
+        
+        @param data: A string
+        @return: The entropy (float between 0 and 8)
+    '''
+    entropy = 0.0
+    length = float(len(data))
+    if length == 0:
+        return entropy
+    histogram = map(data.count, set(data))
+    # H = log2(n) - sum(c*log2(c))/n, with c*log2(c) taken from the table for the usual block sizes
+    total = 0.0
+    for count in histogram:
+        if count < len(countLogTable):
+            total += countLogTable[count]
+        else:
+            total += count * math.log(count, 2)
+    entropy = math.log(length, 2) - total / length
+    return max(entropy, 0.0)
+
+def getRepeatedBlockCoverage(data, sampleSize = 32, numSamples = 16):
+    '''
+        Estimates how much of the data is made of repetitions of the same block, sampling some positions and counting their occurrences
+        
+        @param data: A string
+        @param sampleSize: Size of the sampled chunks. By default: 32.
+        @param numSamples: Number of positions sampled. By default: 16.
+        @return: A tuple (period,coverage,offset) of the most repeated block, where coverage is a fraction of the data length and offset is the first occurrence of the block, or None if the data is too short
+    '''
+    length = len(data)
+    if length < sampleSize*2:
+        return None
+    bestPeriod = 0
+    bestCoverage = 0.0
+    bestOffset = 0
+    step = max(1, (length - sampleSize) // numSamples)
+    for position in range(0, length - sampleSize, step):
+        sample = data[position:position+sampleSize]
+        nextPosition = data.find(sample, position+1)
+        if nextPosition == -1:
+            continue
+        period = nextPosition - position
+        coverage = data.count(sample) * max(period, sampleSize) / float(length)
+        if coverage > bestCoverage:
+            bestPeriod = period
+            bestCoverage = min(coverage, 1.0)
+            bestOffset = data.find(sample)
+    return (bestPeriod,bestCoverage,bestOffset)
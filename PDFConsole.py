@@ -48,10 +48,11 @@ import re
 import subprocess
 import optparse
 import hashlib
-import jsbeautifier
 import traceback
-import redact
 import imp
+import copy
+import threading
+import Queue
 from PDFUtils import *
 from PDFCrypto import *
 from JSAnalysis import *
@@ -75,13 +76,7 @@ try:
 except:
     RL_PROMPT_START_IGNORE = RL_PROMPT_END_IGNORE = ''
     
-try:	
-    from bs4 import BeautifulSoup
-except ImportError:
-    print 'BeautifulSoup needed for JS extraction. "pip install BeautifulSoup4". (Will include this in the build soon).'    
-    sys.exit()
-    
-    
+
 # File and variable redirections 
 FILE_WRITE = 1
 FILE_ADD = 2
@@ -133,10 +128,16 @@ class PDFConsole(cmd.Cmd):
         self.variables = {'output_limit':[1000,1000],
                           'malformed_options':[[],[]],
                           'header_file':[None,None],
-                          'vt_key':[vtKey,vtKey]}
+                          'vt_key':[vtKey,vtKey],
+                          'profile':['off','off']}
+        if pdfFile != None and pdfFile.getProfile() != None:
+            self.variables['profile'][0] = 'on'
         self.javaScriptContexts = {'global': None}
         self.readOnlyVariables = ['malformed_options','header_file']
         self.loggingFile = None
+        self.logFile = None
+        self.logBuffer = None
+        self.documentUpdates = None
         self.output = None
         self.redirect = None
         self.leaving = False
@@ -155,6 +156,7 @@ class PDFConsole(cmd.Cmd):
     def postloop(self):
     	if self.use_rawinput:
         	print newLine + 'Leaving the ParanoiDF interactive console.' + newLine
+        self.closeLog()
         self.leaving = True
 	
 ######################################################################################################
@@ -167,6 +169,11 @@ class PDFConsole(cmd.Cmd):
 	except ImportError:
 	    print 'No NLTK module found (Natural Language ToolKit), type <apt-get install python-nltk> to get.'
 	    return True
+	try:		
+	    import redact
+	except ImportError:
+	    print 'No PIL module found (Python Imaging Library), type <apt-get install python-imaging> to get.'
+	    return True
 	try:		
 	    null = open('/dev/null', 'w')
 	    subprocess.Popen('java', stdout=null, stderr=null)
@@ -448,6 +455,11 @@ class PDFConsole(cmd.Cmd):
 	except ImportError:
 	    print 'No extractJavaScript script found, check source repository and re-download.'
 	    return True
+	try:	
+	    import bs4
+	except ImportError:
+	    print 'BeautifulSoup needed for JS extraction. "pip install BeautifulSoup4".'
+	    return True
     	args = self.parseArgs(argv)
 	numArgs = len(args)
 	if numArgs == 1:
@@ -516,6 +528,30 @@ class PDFConsole(cmd.Cmd):
             version = None
         elif len(args) == 1:
             version = args[0]
+        elif len(args) == 2:
+            # Diff between two versions
+            if not args[0].isdigit() or not args[1].isdigit():
+                self.help_changelog()
+                return False
+            oldVersion = int(args[0])
+            newVersion = int(args[1])
+            if oldVersion > self.pdfFile.getNumUpdates() or newVersion > self.pdfFile.getNumUpdates():
+                message = '*** Error: The version number is not valid!!'
+                self.log_output('changelog ' + argv, message)
+                return False
+            addedObjects, modifiedObjects, removedObjects = self.pdfFile.getVersionsDiff(oldVersion, newVersion)
+            if addedObjects == [] and modifiedObjects == [] and removedObjects == []:
+                output = 'No changes from version ' + str(oldVersion) + ' to version ' + str(newVersion) + newLine
+            else:
+                output = 'Changes from version ' + str(oldVersion) + ' to version ' + str(newVersion) + ':' + newLine
+            if addedObjects != []:
+                output += '\tAdded objects: ' + str(addedObjects) + newLine
+            if modifiedObjects != []:
+                output += '\tModified objects: ' + str(modifiedObjects) + newLine
+            if removedObjects != []:
+                output += '\tRemoved objects: ' + str(removedObjects) + newLine
+            self.log_output('changelog ' + argv, output)
+            return False
         else:
             self.help_changelog()
             return False
@@ -580,7 +616,8 @@ class PDFConsole(cmd.Cmd):
         
     def help_changelog(self):
         print newLine + 'Usage: changelog [$version]'
-        print newLine + 'Shows the changelog of the document or version of the document' + newLine
+        print 'Usage: changelog $version1 $version2' + newLine
+        print 'Shows the changelog of the document or version of the document, or the objects added, modified or removed from $version1 to $version2' + newLine
         
     def do_decode(self, argv):
         decodedContent = ''
@@ -588,7 +625,7 @@ class PDFConsole(cmd.Cmd):
         offset = 0
         size = 0
         validTypes = ['variable','file','raw']
-        notImplementedFilters = ['ccittfax''ccf','jbig2','dct','jpx']
+        notImplementedFilters = ['jbig2','dct','jpx']
         filters = []
         args = self.parseArgs(argv)
         if args == None:
@@ -699,7 +736,7 @@ class PDFConsole(cmd.Cmd):
         offset = 0
         size = 0
         validTypes = ['variable','file','raw']
-        notImplementedFilters = ['ascii85','a85','runlength','rl','jbig2','jpx','ccittfax','ccf','dct']
+        notImplementedFilters = ['jbig2','jpx','ccittfax','ccf','dct']
         filters = []
         args = self.parseArgs(argv)
         if args == None:
@@ -790,10 +827,10 @@ class PDFConsole(cmd.Cmd):
         print 'Encodes the content of the specified variable, file or raw bytes using the following filters or algorithms:'
         print '\tbase64,b64: Base64'
         print '\tasciihex,ahx: /ASCIIHexDecode'
-        print '\tascii85,a85: /ASCII85Decode (Not implemented)'
+        print '\tascii85,a85: /ASCII85Decode'
         print '\tlzw: /LZWDecode'
         print '\tflatedecode,fl: /FlateDecode'
-        print '\trunlength,rl: /RunLengthDecode (Not implemented)'
+        print '\trunlength,rl: /RunLengthDecode'
         print '\tccittfax,ccf: /CCITTFaxDecode (Not implemented)'
         print '\tjbig2: /JBIG2Decode (Not implemented)'
         print '\tdct: /DCTDecode (Not implemented)'
@@ -981,7 +1018,7 @@ class PDFConsole(cmd.Cmd):
         message = ''
         value = ''
         filtersArray = []
-        notImplementedFilters = ['ascii85','a85','runlength','rl','jbig2','jpx','ccittfax','ccf','dct']
+        notImplementedFilters = ['jbig2','jpx','ccittfax','ccf','dct']
         iniFilterArgs = 1
         filters = []
         args = self.parseArgs(argv)
@@ -1094,10 +1131,10 @@ class PDFConsole(cmd.Cmd):
         print newLine + 'Shows the filters found in the stream object or set the filters in the object (first filter is used first). The valid values for filters are the following:'
         print '\tnone: No filters'
         print '\tasciihex,ahx: /ASCIIHexDecode'
-        print '\tascii85,a85: /ASCII85Decode (Not implemented)'
+        print '\tascii85,a85: /ASCII85Decode'
         print '\tlzw: /LZWDecode'
         print '\tflatedecode,fl: /FlateDecode'
-        print '\trunlength,rl: /RunLengthDecode (Not implemented)'
+        print '\trunlength,rl: /RunLengthDecode'
         print '\tccittfax,ccf: /CCITTFaxDecode (Not implemented)'
         print '\tjbig2: /JBIG2Decode (Not implemented)'
         print '\tdct: /DCTDecode (Not implemented)'
@@ -1105,14 +1142,47 @@ class PDFConsole(cmd.Cmd):
 
     def do_hash(self, argv):
         content = ''
-        validTypes = ['variable','file','raw','object','rawobject','stream','rawstream']
+        validTypes = ['variable','file','raw','object','rawobject','stream','rawstream','all']
+        algorithms = list(hashAlgorithms)
+        if SSDEEP_MODULE:
+            algorithms.append('ssdeep')
         args = self.parseArgs(argv)
         if args == None:
             message = '*** Error: The command line arguments have not been parsed successfully!!'
             self.log_output('hash ' + argv, message)
             return False
         
-        if len(args) == 2:
+        if len(args) in [1,2] and args[0] == 'all':
+            if self.pdfFile == None:
+                message = '*** Error: You must open a file!!'
+                self.log_output('hash ' + argv, message)
+                return False
+            version = None
+            if len(args) == 2:
+                if not args[1].isdigit():
+                    self.help_hash()
+                    return False
+                version = int(args[1])
+            ret = self.pdfFile.getHashes(version, algorithms)
+            if ret[0] == -1:
+                message = '*** Error: ' + ret[1] + '!!'
+                self.log_output('hash ' + argv, message)
+                return False
+            output = ''
+            for id, objectVersion in sorted(ret[1].keys(), key = lambda x: (x[1], x[0])):
+                entry = ret[1][(id, objectVersion)]
+                sources = [('object', entry['object'])]
+                if 'stream' in entry:
+                    sources += [('rawstream', entry['rawstream']), ('stream', entry['stream'])]
+                sources += [('js', digests) for digests in entry['js']]
+                for source, digests in sources:
+                    output += str(id) + '\t' + str(objectVersion) + '\t' + entry['type'] + '\t' + source
+                    for algorithm in algorithms:
+                        output += '\t' + digests[algorithm]
+                    output += newLine
+            self.log_output('hash ' + argv, output)
+            return False
+        elif len(args) == 2:
             if args[0] in ['object','rawobject','stream','rawstream']:
                 id = args[1]
                 version = None
@@ -1199,11 +1269,15 @@ class PDFConsole(cmd.Cmd):
                     content = object.getValue()
                 else:
                     content = object.getRawValue()
-        content = str(content)
-        md5Hash = hashlib.md5(content).hexdigest()
-        sha1Hash = hashlib.sha1(content).hexdigest()
-        sha256Hash = hashlib.sha256(content).hexdigest()
-        output = 'MD5: ' + md5Hash + newLine + 'SHA1: ' + sha1Hash + newLine + 'SHA256: ' + sha256Hash + newLine
+        ret = hashContent(content, algorithms)
+        if ret[0] == -1:
+            message = '*** Error: ' + ret[1] + '!!'
+            self.log_output('hash ' + argv, message)
+            return False
+        digests = ret[1]
+        output = 'MD5: ' + digests['md5'] + newLine + 'SHA1: ' + digests['sha1'] + newLine + 'SHA256: ' + digests['sha256'] + newLine
+        if SSDEEP_MODULE:
+            output += 'SSDEEP: ' + digests['ssdeep'] + newLine
         self.log_output('hash ' + argv, output)
 
     def help_hash(self):
@@ -1211,7 +1285,9 @@ class PDFConsole(cmd.Cmd):
         print 'Usage: hash raw $offset $num_bytes'
         print 'Usage: hash file $file_name'
         print 'Usage: hash variable $var_name'
-        print newLine + 'Generates the hash (MD5/SHA1/SHA256) of the specified source: raw bytes of the file, objects and streams, and the content of files or variables' + newLine
+        print 'Usage: hash all [$version]'
+        print newLine + 'Generates the hash (MD5/SHA1/SHA256, and SSDEEP if installed) of the specified source: raw bytes of the file, objects and streams, and the content of files or variables'
+        print 'With "all" every object, raw and decoded stream, embedded file and Javascript code of the document (or of the specified version) is hashed, one per line with the format: id version type source hashes' + newLine
             
     def help_help(self):
         print newLine + 'Usage: help [$command]'
@@ -1303,8 +1379,9 @@ class PDFConsole(cmd.Cmd):
                 actions = statsVersion['Actions']
                 events = statsVersion['Events']
                 vulns = statsVersion['Vulns']
+                shellcode = statsVersion['Shellcode']
                 elements = statsVersion['Elements']
-                if events != None or actions != None or vulns != None or elements != None:
+                if events != None or actions != None or vulns != None or shellcode != None or elements != None:
                     stats += newLine + beforeStaticLabel + '\tSuspicious elements:' + self.resetColor + newLine
                     if events != None:
                         for event in events:
@@ -1323,6 +1400,9 @@ class PDFConsole(cmd.Cmd):
                                 stats = stats[:-1] + '): ' + self.resetColor + str(vulns[vuln]) + newLine
                             else:
                                 stats += '\t\t' + beforeStaticLabel + vuln + ': ' + self.resetColor + str(vulns[vuln]) + newLine
+                    if shellcode != None:
+                        for finding in shellcode:
+                            stats += '\t\t' + beforeStaticLabel + finding + ': ' + self.resetColor + str(shellcode[finding]) + newLine
                     if elements != None:
                         for element in elements:
                             if vulnsDict.has_key(element):
@@ -1601,6 +1681,7 @@ class PDFConsole(cmd.Cmd):
                 self.log_output('js_beautify ' + argv, message)
                 return False
             
+        import jsbeautifier
         beautyContent = jsbeautifier.beautify(content)
         self.log_output('js_beautify ' + argv, beautyContent)        
         
@@ -1938,6 +2019,7 @@ class PDFConsole(cmd.Cmd):
                 print newLine + 'Log file: ' + self.loggingFile + newLine
         elif numArgs == 1:
             param = args[0]
+            self.closeLog()
             if param == 'stop':
                 self.loggingFile = None
             else:
@@ -2309,6 +2391,46 @@ class PDFConsole(cmd.Cmd):
         print '\t-f: Sets force parsing mode to ignore errors'
         print '\t-l: Sets loose parsing mode for problematic files' + newLine
 
+    def do_profile(self, argv):
+        if self.pdfFile == None:
+            message = '*** Error: You must open a file!!'
+            self.log_output('profile ' + argv, message)
+            return False
+        args = self.parseArgs(argv)
+        if args == None:
+            message = '*** Error: The command line arguments have not been parsed successfully!!'
+            self.log_output('profile ' + argv, message)
+            return False
+        jsonOutput = False
+        numOutliers = None
+        if len(args) > 0 and args[0] == '-j':
+            jsonOutput = True
+            args = args[1:]
+        if len(args) == 1:
+            if not args[0].isdigit():
+                self.help_profile()
+                return False
+            numOutliers = int(args[0])
+        elif len(args) > 1:
+            self.help_profile()
+            return False
+        profile = self.pdfFile.getProfile()
+        if profile == None:
+            message = '*** Error: The document was not profiled, use "set profile on" and open it again!!'
+            self.log_output('profile ' + argv, message)
+            return False
+        if jsonOutput:
+            output = profile.toJSON(numOutliers)
+        else:
+            output = profile.getTable(numOutliers)
+        self.log_output('profile ' + argv, output)
+
+    def help_profile(self):
+        print newLine + 'Usage: profile [-j] [$num_objects]'
+        print newLine + 'Shows the time, calls and bytes processed by each phase of the parsing process, and the slowest objects. The profiling must be enabled before opening the file ("set profile on" or the --profile option).' + newLine
+        print 'Options:'
+        print '\t-j: Shows the results in JSON format' + newLine
+
     def do_quit(self, argv):
         return True
         
@@ -2766,6 +2888,12 @@ class PDFConsole(cmd.Cmd):
                     return False
                 else:
                     value = int(value)
+            elif varName == 'profile':
+                if value not in ['on','off']:
+                    message = '*** Error: The value for this variable must be "on" or "off"!!'
+                    self.log_output('set ' + argv, message)
+                    return False
+                enableProfiling(value == 'on')
             if self.variables.has_key(varName):
                 self.variables[varName][0] = value
             else:
@@ -2778,6 +2906,7 @@ class PDFConsole(cmd.Cmd):
         print '\theader_file: READ ONLY. Specifies the file header to be used when \'malformed_options\' are active.' + newLine
         print '\tmalformed_options: READ ONLY. Variable to store the malformed options used to save the file.' + newLine
         print '\toutput_limit: variable to specify the maximum number of lines to be shown at once when the output is long (no limit = -1). By default there is no limit.' + newLine
+        print '\tprofile: variable to enable ("on") or disable ("off") the profiling of the parsing process of the files opened afterwards (see the "profile" command). By default it is disabled.' + newLine
         print '\tvt_key: VirusTotal Api key.' + newLine
 
     def do_show(self, argv):
@@ -2815,6 +2944,7 @@ class PDFConsole(cmd.Cmd):
         print '\tmalformed_options'
         print '\toutput'
         print '\toutput_limit'
+        print '\tprofile'
         print '\tvt_key' + newLine
 
     def do_stream(self, argv):
@@ -3039,8 +3169,8 @@ class PDFConsole(cmd.Cmd):
                 if jsonDict.has_key('scan_date') and jsonDict.has_key('positives') and jsonDict.has_key('total') and jsonDict.has_key('scans') and jsonDict.has_key('permalink'):
                     detectionColor = ''
                     if args == []:
-                        self.pdfFile.setDetectionRate([jsonDict['positives'], jsonDict['total']])
-                        self.pdfFile.setDetectionReport(jsonDict['permalink'])
+                        self.updateDocument(self.pdfFile.setDetectionRate, [jsonDict['positives'], jsonDict['total']])
+                        self.updateDocument(self.pdfFile.setDetectionReport, jsonDict['permalink'])
                     if not self.avoidOutputColors:
                         detectionLevel = jsonDict['positives']/(jsonDict['total']/3)
                         if detectionLevel == 0:
@@ -3064,7 +3194,7 @@ class PDFConsole(cmd.Cmd):
                     return False
             else:
                 if args == []:
-                    self.pdfFile.setDetectionRate(None)
+                    self.updateDocument(self.pdfFile.setDetectionRate, None)
                 output = 'File not found on VirusTotal!' 
         else:
             message = '*** Error: Bad response from VirusTotal!!'
@@ -3540,6 +3670,14 @@ class PDFConsole(cmd.Cmd):
                 objectContent = objectContent.lower()
         return objectContent
 
+    def closeLog(self):
+        '''
+            Closes the log file, the output is written to it again when a command is logged
+        '''
+        if self.logFile != None:
+            self.logFile.close()
+            self.logFile = None
+
     def log_output(self, command, output, bytesToSave = None, printOutput = True, bytesOutput = False):
         '''
             Method to check the commands output and write it to the console and/or files / variables
@@ -3562,7 +3700,7 @@ class PDFConsole(cmd.Cmd):
         niceOutput = niceOutput.replace('\r','\n')
         longOutput = command + newLine * 2 + niceOutput + newLine * 2
         if self.loggingFile != None:
-            open(self.loggingFile,'ab').write('ParanoiDF> '+longOutput)
+            self.writeLog('ParanoiDF> '+longOutput)
         if self.redirect:
             if bytesToSave == None:
                 bytesToSave = [niceOutput]
@@ -3961,3 +4099,201 @@ class PDFConsole(cmd.Cmd):
                 else:
                     return expandedNodes,output
         return expandedNodes,output
+
+    def updateDocument(self, function, *args):
+        '''
+            Calls a method which modifies the document. The commands run by a PDFScriptExecutor thread keep the call, and the executor makes it in the order of the script.
+            
+            @param function: The method of the document
+            @param args: The arguments of the method
+        '''
+        if self.documentUpdates != None:
+            self.documentUpdates.append((function, args))
+        else:
+            function(*args)
+
+    def writeLog(self, output):
+        '''
+            Writes the output of a command to the log file, which is kept open between commands
+            
+            @param output: The output of the command, with the command itself
+        '''
+        if self.logBuffer != None:
+            # Command run by a PDFScriptExecutor thread, the executor logs it in the order of the script
+            self.logBuffer.append(output)
+            return
+        if self.logFile == None:
+            self.logFile = open(self.loggingFile,'ab')
+        self.logFile.write(output)
+        if self.use_rawinput:
+            self.logFile.flush()
+
+
+class ThreadOutput :
+    '''
+        Replacement of the standard output which keeps apart the text printed by each thread of a PDFScriptExecutor
+    '''
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def setBuffer(self, buffer):
+        '''
+            Sets the list where the text printed by the current thread is stored
+            
+            @param buffer: A list, or None to print to the original stream again
+        '''
+        self.local.buffer = buffer
+
+    def write(self, data):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer != None:
+            buffer.append(data)
+        else:
+            self.stream.write(data)
+
+
+class PDFScriptJob :
+    '''
+        Command of a script run by a PDFScriptExecutor thread
+    '''
+    def __init__(self, line):
+        self.line = line
+        self.output = ''
+        self.logEntries = []
+        self.documentUpdates = []
+        self.event = threading.Event()
+
+
+class PDFScriptExecutor :
+    '''
+        Batch executor of console scripts: the whole script is read first, the consecutive read-only commands without redirections run in a pool of threads and the rest of commands wait for them and run alone. The output is printed and logged, and the changes of the parallel commands to the document are made, in the order of the script.
+    '''
+    # Commands which don't modify the variables or any file, nor ask the user. The changes of vtcheck to the document are made when its output is printed.
+    parallelCommands = ['changelog', 'decode', 'encode', 'errors', 'hash', 'info', 'js_join', 'js_unescape', 'metadata', 'object', 'offsets',
+                        'rawobject', 'rawstream', 'references', 'search', 'show', 'stream', 'tree', 'vtcheck', 'xor', 'xor_search']
+    # Parallel commands which modify the document and the ones reading those changes, which wait for them
+    documentWriters = ['vtcheck']
+    documentReaders = ['info']
+
+    def __init__(self, console, numThreads = 4):
+        '''
+            Constructor of a PDFScriptExecutor
+            
+            @param console: The PDFConsole, created with the script file as stdin
+            @param numThreads: Number of threads running the independent commands. By default: 4.
+        '''
+        self.console = console
+        self.numThreads = max(1, numThreads)
+        self.output = None
+        self.jobQueue = Queue.Queue()
+
+    def flushJobs(self, jobs, wait):
+        '''
+            Prints and logs the output of the finished jobs at the head of the list, in the order of the script
+            
+            @param jobs: List of PDFScriptJob, in the order of the script
+            @param wait: Boolean to wait for all the jobs to finish
+        '''
+        while jobs != [] and (wait or jobs[0].event.is_set()):
+            job = jobs.pop(0)
+            job.event.wait()
+            for function, args in job.documentUpdates:
+                function(*args)
+            self.output.stream.write(job.output)
+            for logEntry in job.logEntries:
+                self.console.writeLog(logEntry)
+
+    def isParallel(self, line):
+        '''
+            Checks if a command can run at the same time as its neighbours
+            
+            @param line: The command line
+            @return: A boolean
+        '''
+        command, argv, line = self.console.parseline(line)
+        if command not in self.parallelCommands:
+            return False
+        # Redirections write files or variables which can be read by the following commands
+        probe = copy.copy(self.console)
+        args = probe.parseArgs(argv)
+        return args != None and probe.redirect == None
+
+    def parseScript(self):
+        '''
+            Reads the whole script from the stdin of the console
+            
+            @return: A list of tuples (line,parallel) with the commands, ending with the exit command
+        '''
+        commands = []
+        for line in self.console.stdin.readlines():
+            line = self.console.precmd(line.rstrip('\r\n'))
+            if line.strip() == '':
+                continue
+            commands.append((line, self.isParallel(line)))
+        commands.append((self.console.precmd('EOF'), False))
+        return commands
+
+    def run(self):
+        '''
+            Runs the script, like the cmdloop method of the console
+        '''
+        commands = self.parseScript()
+        jobs = []
+        threads = []
+        self.output = ThreadOutput(sys.stdout)
+        sys.stdout = self.output
+        try:
+            for line, parallel in commands:
+                if parallel:
+                    if self.console.parseline(line)[0] in self.documentReaders:
+                        for job in jobs:
+                            if self.console.parseline(job.line)[0] in self.documentWriters:
+                                self.flushJobs(jobs, True)
+                                break
+                    if len(threads) < self.numThreads:
+                        thread = threading.Thread(target = self.runJobs)
+                        thread.daemon = True
+                        thread.start()
+                        threads.append(thread)
+                    job = PDFScriptJob(line)
+                    jobs.append(job)
+                    self.jobQueue.put(job)
+                    self.flushJobs(jobs, False)
+                else:
+                    self.flushJobs(jobs, True)
+                    stop = self.console.onecmd(line)
+                    stop = self.console.postcmd(stop, line)
+                    if stop:
+                        break
+        finally:
+            self.flushJobs(jobs, True)
+            for thread in threads:
+                self.jobQueue.put(None)
+            sys.stdout = self.output.stream
+        self.console.postloop()
+
+    def runJobs(self):
+        '''
+            Loop run by the threads: each command runs in a copy of the console, with its own redirection state, and its output is stored in the job
+        '''
+        while True:
+            job = self.jobQueue.get()
+            if job == None:
+                break
+            console = copy.copy(self.console)
+            console.logBuffer = job.logEntries
+            console.documentUpdates = job.documentUpdates
+            buffer = []
+            self.output.setBuffer(buffer)
+            try:
+                console.onecmd(job.line)
+            except:
+                traceback.print_exc(file=open(errorsFile,'a'))
+                print newLine + console.errorColor + '*** Error: Exception not handled running "' + job.line + '"!!' + console.resetColor + newLine
+            self.output.setBuffer(None)
+            job.output = ''.join(buffer)
+            job.event.set()
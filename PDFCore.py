@@ -40,7 +40,7 @@
     This module contains classes and methods to analyse and modify PDF files
 '''
 
-import sys,os,re,hashlib,struct,aes as AES
+import sys,os,re,hashlib,json,struct,tempfile,threading,time,aes as AES
 from PDFUtils import *
 from PDFCrypto import *
 from JSAnalysis import *
@@ -58,6 +58,18 @@ isForceMode = False
 isManualAnalysis = False
 spacesChars = ['\x00','\x09','\x0a','\x0c','\x0d','\x20']
 delimiterChars = ['<<','(','<','[','{','/','%']
+reSpaces = re.compile('[\x00\x09\x0a\x0c\x0d\x20]*')
+reRegularChars = re.compile('[^\x00\x09\x0a\x0c\x0d\x20<(\[{/%]*')
+reEndOfLine = re.compile('[\r\n]')
+reReference = re.compile('\d{1,10}\s{1,3}\d{1,10}\s{1,3}R')
+reNumber = re.compile('[-+]?\.?\d{1,15}\.?\d{0,15}')
+reStreamKeyword = re.compile('[>\s]stream')
+reObjectHeader = re.compile('(?<!\d)\d{1,10}\s\d{1,10}\sobj')
+reDelimitedChars = {'<<':re.compile('[>(\[<]'),
+                    '(':re.compile('[()]'),
+                    '<':re.compile('[>(\[<]'),
+                    '[':re.compile('[\](\[<]'),
+                    '{':re.compile('[}(\[<]')}
 monitorizedEvents = ['/OpenAction ','/AA ','/Names ','/AcroForm ', '/XFA ']
 monitorizedActions = ['/JS ','/JavaScript','/Launch','/SubmitForm','/ImportData']
 monitorizedElements = ['/EmbeddedFiles ',
@@ -98,11 +110,21 @@ vulnsDict = {'mailto':('mailto',['CVE-2007-5020']),
              bmpVuln:(bmpVuln,['CVE-2013-2729']),
              'app.removeToolButton':('app.removeToolButton',['CVE-2013-3346'])}
 jsContexts = {'global':None}
-
-class PDFObject :
+jsAnalysisPool = None
+pendingJSAnalysis = []
+streamAttributes = ['rawStream','encodedStream','encryptedStream','decodedStream']
+streamSpillThreshold = None
+streamSpillDirectory = None
+profilingEnabled = False
+profileOutliers = 10
+profiler = None
+
+class PDFObject (object) :
     '''
         Base class for all the PDF objects
     '''
+    __slots__ = ()
+    
     def __init__(self, raw = None):
         '''
             Constructor of a PDFObject
@@ -132,6 +154,30 @@ class PDFObject :
         if errorMessage not in self.errors:
             self.errors.append(errorMessage)
             
+    def analyseJSCode(self, code):
+        '''
+            Analyses the Javascript code of the object. If a JSAnalysisPool has been set the analysis is queued and the results are filled in when the parsing finishes.
+            
+            @param code: The Javascript code (string)
+            @return: A list of errors found during the analysis
+        '''
+        if jsAnalysisPool != None and not isManualAnalysis:
+            cachedResult = getCachedJSAnalysis(code)
+            if cachedResult != None:
+                self.JSCode, self.unescapedBytes, self.urlsFound, jsErrors = cachedResult
+                return jsErrors
+            self.JSCode = []
+            self.unescapedBytes = []
+            self.urlsFound = []
+            pendingJSAnalysis.append((self, code, jsAnalysisPool.submit(code)))
+            return []
+        if profiler != None:
+            profiler.start('js', len(code))
+        self.JSCode, self.unescapedBytes, self.urlsFound, jsErrors, jsContexts['global'] = analyseJS(code, jsContexts['global'], isManualAnalysis)
+        if profiler != None:
+            profiler.stop('js')
+        return jsErrors
+
     def contains(self, string):
         '''
             Look for the string inside the object content
@@ -403,55 +449,121 @@ class PDFObject :
             return self.getRawValue()
 
 
-class PDFBool (PDFObject) :
+class PDFCompactAttribute (object) :
+    '''
+        Attribute of a compact PDF object which usually keeps its default value. It's only stored (in the extraAttributes dictionary of the object) when it differs from the default.
+    '''
+    __slots__ = ('name', 'default', 'derived')
+    
+    def __init__(self, name, default = None, derived = None):
+        '''
+            Constructor of a PDFCompactAttribute
+            
+            @param name: The name of the attribute
+            @param default: The default value. Lists and dictionaries are copied in each access, so they must be set again after modifying them.
+            @param derived: A function which computes the default value from the object, used instead of a fixed default value (Ex. the raw value of a name is usually its value)
+        '''
+        self.name = name
+        self.default = default
+        self.derived = derived
+
+    def __get__(self, pdfObject, objectClass):
+        if pdfObject is None:
+            return self
+        extraAttributes = pdfObject.extraAttributes
+        if extraAttributes != None and self.name in extraAttributes:
+            return extraAttributes[self.name]
+        return self.getDefault(pdfObject)
+
+    def __set__(self, pdfObject, value):
+        extraAttributes = pdfObject.extraAttributes
+        if value == self.getDefault(pdfObject):
+            if extraAttributes != None and self.name in extraAttributes:
+                del extraAttributes[self.name]
+                if extraAttributes == {}:
+                    pdfObject.extraAttributes = None
+        else:
+            if extraAttributes == None:
+                extraAttributes = pdfObject.extraAttributes = {}
+            extraAttributes[self.name] = value
+
+    def getDefault(self, pdfObject):
+        '''
+            Gets the default value of the attribute for the given object
+            
+            @param pdfObject: The PDFCompactObject
+            @return: The default value
+        '''
+        if self.derived != None:
+            return self.derived(pdfObject)
+        elif isinstance(self.default, list):
+            return []
+        elif isinstance(self.default, dict):
+            return {}
+        return self.default
+
+
+class PDFCompactObject (PDFObject) :
+    '''
+        Base class for the most common PDF objects (booleans, nulls, numbers, names, references and strings).
+        They use slots instead of a dictionary of attributes, derive the raw and encrypted values when they can and only store the rest of attributes when they are not the default ones.
+    '''
+    __slots__ = ('extraAttributes',)
+    errors = PDFCompactAttribute('errors', [])
+    references = PDFCompactAttribute('references', [])
+    JSCode = PDFCompactAttribute('JSCode', [])
+    referencesInElements = PDFCompactAttribute('referencesInElements', {})
+    compressedIn = PDFCompactAttribute('compressedIn', None)
+    encrypted = PDFCompactAttribute('encrypted', False)
+    encryptionKey = PDFCompactAttribute('encryptionKey', '')
+    updateNeeded = PDFCompactAttribute('updateNeeded', False)
+    containsJScode = PDFCompactAttribute('containsJScode', False)
+
+    def addError(self, errorMessage):
+        errors = self.errors
+        if errorMessage not in errors:
+            self.errors = errors + [errorMessage]
+
+
+class PDFBool (PDFCompactObject) :
     '''
         Boolean object of a PDF document
     '''
+    __slots__ = ('value',)
+    type = 'bool'
+    rawValue = PDFCompactAttribute('rawValue', derived = lambda pdfObject: pdfObject.value)
+    encryptedValue = PDFCompactAttribute('encryptedValue', derived = lambda pdfObject: pdfObject.value)
+    
     def __init__(self, value) :
-        self.type = 'bool'
-        self.errors = []
-        self.references = []
-        self.JSCode = []
-        self.encrypted = False
-        self.updateNeeded = False
-        self.containsJScode = False
-        self.referencesInElements = {}
-        self.value = self.rawValue = self.encryptedValue = value
-        self.compressedIn = None
+        self.extraAttributes = None
+        self.value = value
 
 
-class PDFNull (PDFObject) :
+class PDFNull (PDFCompactObject) :
     '''
         Null object of a PDF document
     '''
+    __slots__ = ('value',)
+    type = 'null'
+    rawValue = PDFCompactAttribute('rawValue', derived = lambda pdfObject: pdfObject.value)
+    encryptedValue = PDFCompactAttribute('encryptedValue', derived = lambda pdfObject: pdfObject.value)
+    
     def __init__(self, content) :
-        self.type = 'null'
-        self.errors = []
-        self.JSCode = []
-        self.compressedIn = None
-        self.encrypted = False
-        self.value = self.rawValue = self.encryptedValue = content
-        self.updateNeeded = False
-        self.containsJScode = False
-        self.referencesInElements = {}
-        self.references = []
+        self.extraAttributes = None
+        self.value = content
 
 
-class PDFNum (PDFObject) :
+class PDFNum (PDFCompactObject) :
     '''
         Number object of a PDF document: can be an integer or a real number.
     '''
+    __slots__ = ('value', 'rawValue')
+    type = PDFCompactAttribute('type', derived = lambda pdfObject: 'real' if pdfObject.value.find('.') != -1 else 'integer')
+    encryptedValue = PDFCompactAttribute('encryptedValue', derived = lambda pdfObject: str(pdfObject.rawValue))
+    
     def __init__(self, num) :
-        self.errors = []
-        self.JSCode = []
-        self.compressedIn = None
-        self.encrypted = False
+        self.extraAttributes = None
         self.value = num
-        self.compressedIn = None
-        self.updateNeeded = False
-        self.containsJScode = False
-        self.referencesInElements = {}
-        self.references = []
         ret = self.update()
         if ret[0] == -1:
             if isForceMode:
@@ -494,25 +606,20 @@ class PDFNum (PDFObject) :
         return str(self.rawValue)
 
 
-class PDFName (PDFObject) :
+class PDFName (PDFCompactObject) :
     '''
         Name object of a PDF document
     '''
+    __slots__ = ('value', 'rawValue', 'encryptedValue')
+    type = 'name'
+    
     def __init__(self, name) :
-        self.type = 'name'
-        self.errors = []
-        self.JSCode = []
-        self.references = []
-        self.compressedIn = None
+        self.extraAttributes = None
+        # The same names are used in all the objects, so only one copy of each one is kept
         if name[0] == '/':
-            self.rawValue = self.value = self.encryptedValue = name
+            self.rawValue = self.value = self.encryptedValue = intern(name)
         else:
-            self.rawValue = self.value = self.encryptedValue = '/' + name
-        self.updateNeeded = False
-        self.containsJScode = False
-        self.encryptedValue = ''
-        self.encrypted = False
-        self.referencesInElements = {}
+            self.rawValue = self.value = self.encryptedValue = intern('/' + name)
         ret = self.update()
         if ret[0] == -1:
             if isForceMode:
@@ -545,23 +652,18 @@ class PDFName (PDFObject) :
             return (0,'')
 
 
-class PDFString (PDFObject) :
+class PDFString (PDFCompactObject) :
     '''
         String object of a PDF document
     '''
+    __slots__ = ('value', 'rawValue', 'encryptedValue')
+    type = 'string'
+    unescapedBytes = PDFCompactAttribute('unescapedBytes', [])
+    urlsFound = PDFCompactAttribute('urlsFound', [])
+    
     def __init__(self, string) :
-        self.type = 'string'
-        self.errors = []
-        self.compressedIn = None
-        self.encrypted = False
+        self.extraAttributes = None
         self.value = self.rawValue = self.encryptedValue = string
-        self.updateNeeded = False
-        self.containsJScode = False
-        self.JSCode = []
-        self.unescapedBytes = []
-        self.urlsFound = []
-        self.references = []
-        self.referencesInElements = {}
         ret = self.update()
         if ret[0] == -1:
             if isForceMode:
@@ -601,7 +703,7 @@ class PDFString (PDFObject) :
             return (-1,errorMessage)
         if isJavascript(self.value):
             self.containsJScode = True
-            self.JSCode, self.unescapedBytes, self.urlsFound, jsErrors, jsContexts['global'] = analyseJS(self.value, jsContexts['global'], isManualAnalysis)
+            jsErrors = self.analyseJSCode(self.value)
             if jsErrors != []:
                 for jsError in jsErrors:
                     errorMessage = 'Error analysing Javascript: '+jsError
@@ -754,7 +856,7 @@ class PDFHexString (PDFObject) :
                 return (-1,errorMessage)
         if isJavascript(self.value):
             self.containsJScode = True
-            self.JSCode, self.unescapedBytes, self.urlsFound, jsErrors, jsContexts['global'] = analyseJS(self.value, jsContexts['global'], isManualAnalysis)
+            jsErrors = self.analyseJSCode(self.value)
             if jsErrors != []:
                 for jsError in jsErrors:
                     errorMessage = 'Error analysing Javascript: '+jsError
@@ -841,23 +943,20 @@ class PDFHexString (PDFObject) :
         return self.urlsFound
 
 
-class PDFReference (PDFObject) :
+class PDFReference (PDFCompactObject) :
     '''
         Reference object of a PDF document
     '''
+    __slots__ = ('id', 'genNumber')
+    type = 'reference'
+    rawValue = PDFCompactAttribute('rawValue', derived = lambda pdfObject: str(pdfObject.id) + ' ' + str(pdfObject.genNumber) + ' R')
+    value = PDFCompactAttribute('value', derived = lambda pdfObject: pdfObject.rawValue)
+    encryptedValue = PDFCompactAttribute('encryptedValue', derived = lambda pdfObject: pdfObject.rawValue)
+    
     def __init__(self, id, genNumber = '0') :
-        self.type = 'reference'
-        self.errors = []
-        self.JSCode = []
-        self.compressedIn = None
-        self.encrypted = False
-        self.value = self.rawValue = self.encryptedValue = id + ' ' + genNumber + ' R'
+        self.extraAttributes = None
         self.id = id
         self.genNumber = genNumber
-        self.updateNeeded = False
-        self.containsJScode = False
-        self.referencesInElements = {}
-        self.references = []
         ret = self.update()
         if ret[0] == -1:
             if isForceMode:
@@ -945,9 +1044,10 @@ class PDFArray (PDFObject) :
         '''
         errorMessage = ''
         self.errors = []
-        self.encryptedValue = '[ '
-        self.rawValue = '[ '
-        self.value = '[ '
+        # The values are joined at the end, the attributes are not local variables and adding to them would copy the whole value for every element
+        encryptedValues = ['[ ']
+        rawValues = ['[ ']
+        values = ['[ ']
         self.references = []
         self.containsJScode = False
         self.JSCode = []
@@ -973,15 +1073,15 @@ class PDFArray (PDFObject) :
                     if ret[0] == -1:
                         errorMessage = 'Error encrypting element'
                         self.addError(errorMessage)
-                self.encryptedValue += str(element.getEncryptedValue()) + ' '
-                self.rawValue += str(element.getRawValue()) + ' '
-                self.value += element.getValue() + ' '
+                encryptedValues.append(str(element.getEncryptedValue()) + ' ')
+                rawValues.append(str(element.getRawValue()) + ' ')
+                values.append(element.getValue() + ' ')
             else:
                 errorMessage = 'None elements'
                 self.addError(errorMessage)
-        self.encryptedValue = self.encryptedValue[:-1] + ' ]'
-        self.rawValue = self.rawValue[:-1] + ' ]'
-        self.value = self.value[:-1] + ' ]'
+        self.encryptedValue = ''.join(encryptedValues)[:-1] + ' ]'
+        self.rawValue = ''.join(rawValues)[:-1] + ' ]'
+        self.value = ''.join(values)[:-1] + ' ]'
         if errorMessage != '':
             return (-1,'Errors while updating PDFArray')
         else:
@@ -1219,9 +1319,10 @@ class PDFDictionary (PDFObject):
         self.unescapedBytes = []
         self.urlsFound = []
         errorMessage = ''
-        self.value = '<< '
-        self.rawValue = '<< '
-        self.encryptedValue = '<< '
+        # The values are joined at the end, the attributes are not local variables and adding to them would copy the whole value for every element
+        dictValues = ['<< ']
+        rawValues = ['<< ']
+        encryptedValues = ['<< ']
         keys = self.elements.keys()
         values = self.elements.values()
         for i in range(len(keys)):
@@ -1231,6 +1332,9 @@ class PDFDictionary (PDFObject):
                     self.addError(errorMessage)
                     valueObject = PDFString('')
                 else:
+                    self.value = ''.join(dictValues)
+                    self.rawValue = ''.join(rawValues)
+                    self.encryptedValue = ''.join(encryptedValues)
                     return (-1,errorMessage)
             else:
                 valueObject = values[i]
@@ -1266,12 +1370,12 @@ class PDFDictionary (PDFObject):
                 if ret[0] == -1:
                     errorMessage = 'Error encrypting element'
                     self.addError(errorMessage)
-            self.encryptedValue += rawValue + ' ' + str(valueObject.getEncryptedValue()) + newLine
-            self.rawValue += rawValue + ' ' + str(valueObject.getRawValue()) + newLine
-            self.value += keys[i] + ' ' + v + newLine
-        self.encryptedValue = self.encryptedValue[:-1] + ' >>'
-        self.rawValue = self.rawValue[:-1] + ' >>'
-        self.value = self.value[:-1] + ' >>'
+            encryptedValues.append(rawValue + ' ' + str(valueObject.getEncryptedValue()) + newLine)
+            rawValues.append(rawValue + ' ' + str(valueObject.getRawValue()) + newLine)
+            dictValues.append(keys[i] + ' ' + v + newLine)
+        self.encryptedValue = ''.join(encryptedValues)[:-1] + ' >>'
+        self.rawValue = ''.join(rawValues)[:-1] + ' >>'
+        self.value = ''.join(dictValues)[:-1] + ' >>'
         if errorMessage != '':
             return (-1,errorMessage)
         return (0,'')
@@ -1556,10 +1660,116 @@ class PDFDictionary (PDFObject):
             return (-1,'Element not found')
 
 
+def enableStreamSpilling(threshold = 16*1024*1024, directory = None):
+    '''
+        Keeps the stream contents bigger than the threshold in temporary files instead of memory, reading them again each time they are needed
+        
+        @param threshold: Size in bytes above which the stream contents are spilled to disk. None disables the spilling. By default: 16MB.
+        @param directory: Directory of the temporary files. By default: None (the system one).
+    '''
+    global streamSpillThreshold, streamSpillDirectory
+    streamSpillThreshold = threshold
+    streamSpillDirectory = directory
+
+
+class PDFStreamBuffer :
+    '''
+        Immutable content of a stream, kept in memory or in a temporary file if it's bigger than the spilling threshold
+    '''
+    # (buffer, content) of the last spilled buffer read by each thread, so consecutive reads of the same stream only access the file once
+    lastRead = threading.local()
+
+    def __init__(self, content):
+        '''
+            Constructor of a PDFStreamBuffer
+            
+            @param content: The content of the stream (string)
+        '''
+        self.size = len(content)
+        self.file = None
+        self.content = None
+        self.digest = None
+        self.lock = None
+        if streamSpillThreshold != None and self.size > streamSpillThreshold:
+            self.lock = threading.Lock()
+            self.file = tempfile.TemporaryFile(dir = streamSpillDirectory)
+            self.file.write(content)
+            self.file.flush()
+            self.digest = hashlib.sha1(content).digest()
+        else:
+            self.content = content
+
+    def contains(self, content):
+        '''
+            Checks if the buffer holds the given content, to share it instead of storing it again. The spilled buffers are compared by size and SHA-1, without reading the file.
+            
+            @param content: The content of the stream (string)
+            @return: A boolean
+        '''
+        if self.file == None:
+            return self.content is content
+        return len(content) == self.size and hashlib.sha1(content).digest() == self.digest
+
+    def get(self):
+        '''
+            Gets the content of the buffer
+            
+            @return: The content of the stream (string)
+        '''
+        if self.file == None:
+            return self.content
+        lastBuffer, content = getattr(PDFStreamBuffer.lastRead, 'value', (None, None))
+        if lastBuffer is not self:
+            # The file position is shared by the threads reading the same stream
+            self.lock.acquire()
+            try:
+                self.file.seek(0)
+                content = self.file.read()
+            finally:
+                self.lock.release()
+            PDFStreamBuffer.lastRead.value = (self, content)
+        return content
+
+
+class PDFStreamAttribute (object) :
+    '''
+        Content of a stream object (raw, encoded, encrypted or decoded stream). The attributes with the same content share one PDFStreamBuffer, so the stream is kept only once when no filters are applied.
+    '''
+    def __init__(self, name):
+        '''
+            Constructor of a PDFStreamAttribute
+            
+            @param name: The name of the attribute
+        '''
+        self.bufferName = name + 'Buffer'
+
+    def __get__(self, pdfObject, objectClass):
+        if pdfObject is None:
+            return self
+        streamBuffer = pdfObject.__dict__.get(self.bufferName)
+        if streamBuffer == None:
+            return ''
+        return streamBuffer.get()
+
+    def __set__(self, pdfObject, content):
+        for attribute in streamAttributes:
+            streamBuffer = pdfObject.__dict__.get(attribute + 'Buffer')
+            if streamBuffer != None and streamBuffer.contains(content):
+                break
+        else:
+            streamBuffer = PDFStreamBuffer(content)
+        pdfObject.__dict__[self.bufferName] = streamBuffer
+
+
 class PDFStream (PDFDictionary) :
     '''
         Stream object of a PDF document
     '''
+    rawStream = PDFStreamAttribute('rawStream')
+    encodedStream = PDFStreamAttribute('encodedStream')
+    encryptedStream = PDFStreamAttribute('encryptedStream')
+    decodedStream = PDFStreamAttribute('decodedStream')
+    
     def __init__(self, rawDict = '', rawStream = '', elements = {}, rawNames = {}) :
         global isForceMode
         self.type = 'stream'
@@ -1778,7 +1988,7 @@ class PDFStream (PDFDictionary) :
                         self.references = list(set(self.references))
                     if isJavascript(self.decodedStream):
                         self.containsJScode = True
-                        self.JSCode, self.unescapedBytes, self.urlsFound, jsErrors, jsContexts['global'] = analyseJS(self.decodedStream, jsContexts['global'], isManualAnalysis)
+                        jsErrors = self.analyseJSCode(self.decodedStream)
                         if jsErrors != []:
                             for jsError in jsErrors:
                                 errorMessage = 'Error analysing Javascript: '+jsError
@@ -1877,7 +2087,7 @@ class PDFStream (PDFDictionary) :
                                 self.references = list(set(self.references))
                             if isJavascript(self.decodedStream):
                                 self.containsJScode = True
-                                self.JSCode, self.unescapedBytes, self.urlsFound, jsErrors, jsContexts['global'] = analyseJS(self.decodedStream, jsContexts['global'], isManualAnalysis)
+                                jsErrors = self.analyseJSCode(self.decodedStream)
                                 if jsErrors != []:
                                     for jsError in jsErrors:
                                         errorMessage = 'Error analysing Javascript: '+jsError
@@ -1948,7 +2158,7 @@ class PDFStream (PDFDictionary) :
                                 self.references = list(set(self.references))
                             if isJavascript(self.decodedStream):
                                 self.containsJScode = True
-                                self.JSCode, self.unescapedBytes, self.urlsFound, jsErrors, jsContexts['global'] = analyseJS(self.decodedStream, jsContexts['global'], isManualAnalysis)
+                                jsErrors = self.analyseJSCode(self.decodedStream)
                                 if jsErrors != []:
                                     for jsError in jsErrors:
                                         errorMessage = 'Error analysing Javascript: '+jsError
@@ -2049,6 +2259,20 @@ class PDFStream (PDFDictionary) :
             
             @return: A tuple (status,statusContent), where statusContent is empty in case status = 0 or an error message in case status = -1
         '''
+        if profiler != None:
+            profiler.start('decode', len(self.rawStream))
+            try:
+                return self.decodeFilters()
+            finally:
+                profiler.stop('decode')
+        return self.decodeFilters()
+
+    def decodeFilters (self) :
+        '''
+            Applies the filters of the stream to decode it, storing the result in decodedStream
+            
+            @return: A tuple (status,statusContent), where statusContent is empty in case status = 0 or an error message in case status = -1
+        '''
         errorMessage = ''
         if len(self.rawStream) > 0:
             if self.isEncodedStream:
@@ -2539,7 +2763,7 @@ class PDFStream (PDFDictionary) :
             self.references = list(set(self.references))
         if isJavascript(self.decodedStream):
             self.containsJScode = True
-            self.JSCode, self.unescapedBytes, self.urlsFound, jsErrors, jsContexts['global'] = analyseJS(self.decodedStream, jsContexts['global'], isManualAnalysis)
+            jsErrors = self.analyseJSCode(self.decodedStream)
             if jsErrors != []:
                 for jsError in jsErrors:
                     errorMessage = 'Error analysing Javascript: '+jsError
@@ -3047,7 +3271,7 @@ class PDFObjectStream (PDFStream) :
                             self.references = list(set(self.references))
                         if isJavascript(self.decodedStream):
                             self.containsJScode = True
-                            self.JSCode, self.unescapedBytes, self.urlsFound, jsErrors, jsContexts['global'] = analyseJS(self.decodedStream, jsContexts['global'], isManualAnalysis)
+                            jsErrors = self.analyseJSCode(self.decodedStream)
                             if jsErrors != []:
                                 for jsError in jsErrors:
                                     errorMessage = 'Error analysing Javascript: '+jsError
@@ -3799,6 +4023,7 @@ class PDFBody :
         self.suspiciousActions = {}
         self.suspiciousElements = {}
         self.vulns = {}
+        self.shellcode = {}
         self.JSCode = []
         self.URLs = []
         self.toUpdate = []
@@ -4007,6 +4232,18 @@ class PDFBody :
                 matchedObjects.append(indirectObject.getId())
         return matchedObjects
     
+    def getObjectsHashes(self):
+        '''
+            Gets a hash of the content of each object of the body, to find out if an object has really changed between versions
+            
+            @return: A dictionary with the object ids as keys and the MD5 digests of their generation number and content as values
+        '''
+        hashes = {}
+        for id, indirectObject in self.objects.items():
+            content = str(indirectObject.getGenerationNumber()) + newLine + indirectObject.getObject().toFile()
+            hashes[id] = hashlib.md5(content).digest()
+        return hashes
+
     def getObjectsIds(self):
         sortedIdsOffsets = []
         sortedIds = []
@@ -4023,6 +4260,9 @@ class PDFBody :
     def getStreams(self):
         return self.streams
 
+    def getShellcode(self):
+        return self.shellcode
+
     def getSuspiciousActions(self):
         return self.suspiciousActions
     
@@ -4058,7 +4298,11 @@ class PDFBody :
         self.numObjects += 1
         if pdfObject.isFaulty():
             self.faultyObjects.append(id)
+        if profiler != None:
+            profiler.start('stats')
         ret = self.updateStats(id,pdfObject)
+        if profiler != None:
+            profiler.stop('stats', id)
         if ret[0] == -1:
             errorMessage = ret[1]
         if pdfObject.updateNeeded:
@@ -4279,6 +4523,9 @@ class PDFBody :
                             if jsCode.find(vuln) != -1:
                                 if self.vulns.has_key(vuln) and id in self.vulns[vuln]:
                                     self.vulns[vuln].remove(id)
+                    for finding in self.shellcode:
+                        if id in self.shellcode[finding]:
+                            self.shellcode[finding].remove(id)
             else:
                 jsCode = pdfObject.getJSCode()
                 if id not in self.containingJS:
@@ -4293,6 +4540,13 @@ class PDFBody :
                                 self.vulns[vuln].append(id)
                             else:
                                 self.vulns[vuln] = [id]
+                for unescapedBytes in pdfObject.getUnescapedBytes():
+                    for finding in detectShellcode(unescapedBytes):
+                        if self.shellcode.has_key(finding):
+                            if id not in self.shellcode[finding]:
+                                self.shellcode[finding].append(id)
+                        else:
+                            self.shellcode[finding] = [id]
         ## Extra checks
         objectType = pdfObject.getType()
         if objectType == 'stream':
@@ -4641,6 +4895,7 @@ class PDFFile :
         self.numEncodedStreams = 0
         self.numDecodingErrors = 0
         self.maxObjectId = 0
+        self.profile = None # PDFProfile
 
     def addBody(self, newBody):
         if newBody != None and isinstance(newBody,PDFBody):
@@ -5332,6 +5587,8 @@ class PDFFile :
             # Computing objects passwords and decryption
             numKeyBytes = self.encryptionKeyLength/8
             for v in range(self.updates+1):
+                if profiler != None:
+                    profiler.version = v
                 indirectObjectsIds = list(set(self.body[v].getObjectsIds()))
                 for id in indirectObjectsIds:
                     indirectObject = self.body[v].getObject(id, indirect = True)
@@ -5341,6 +5598,8 @@ class PDFFile :
                         if object != None and not object.isCompressed():
                             objectType = object.getType()
                             if objectType in ['string','hexstring','array','dictionary'] or (objectType == 'stream' and (object.getElement('/Type') == None or (object.getElement('/Type').getValue() not in ['/XRef','/Metadata'] or (object.getElement('/Type').getValue() == '/Metadata' and encryptMetadata)))):
+                                if profiler != None:
+                                    profiler.start('decrypt', indirectObject.getSize())
                                 key = self.encryptionKey
                                 if objectType in ['string','hexstring','array','dictionary']:
                                     if revision < 5:
@@ -5356,6 +5615,8 @@ class PDFFile :
                                             key = computeObjectKey(id,generationNum,self.encryptionKey,numKeyBytes,stmAlgorithm[0])
                                         altAlgorithm = stmAlgorithm[0]
                                     ret = object.decrypt(key,strAlgorithm[0], altAlgorithm)
+                                if profiler != None:
+                                    profiler.stop('decrypt', id, v)
                                 if ret[0] == -1:
                                     errorMessage = ret[1]
                                     self.addError(ret[1])
@@ -5617,52 +5878,42 @@ class PDFFile :
             return catalogId
 
     def getChangeLog (self, version = None) :
-        lastVersionObjects = []
-        actualVersionObjects = []
-        addedObjects = []
-        removedObjects = []
-        modifiedObjects = []
-        notMatchingObjects = []
+        '''
+            Gets the changes made in each incremental update of the document. Objects re-declared with the same content are not reported as modified.
+            
+            @param version: The last version to check. By default all the versions are checked.
+            @return: A list with an element [addedObjects,modifiedObjects,removedObjects,notMatchingObjects] for each update
+        '''
+        lastVersionObjects = {}
         changes = []
         if version == None:
             version = self.updates + 1
         else:
             version += 1
         for i in range(version):
-            actualVersionObjects = self.body[i].getObjectsIds()
+            actualVersionHashes = self.body[i].getObjectsHashes()
             if i != 0:
-                xrefNewObjects = []
-                xrefFreeObjects = []
-                crossRefSection = self.crossRefTable[i][0]
-                crossRefStreamSection = self.crossRefTable[i][1]
-                if crossRefSection != None:
-                    xrefNewObjects += crossRefSection.getNewObjectIds()
-                    xrefFreeObjects += crossRefSection.getFreeObjectIds()
-                if crossRefStreamSection != None:
-                    xrefNewObjects += crossRefStreamSection.getNewObjectIds()
-                    xrefFreeObjects += crossRefStreamSection.getFreeObjectIds()
-                for id in actualVersionObjects:
+                addedObjects = []
+                removedObjects = []
+                modifiedObjects = []
+                notMatchingObjects = []
+                xrefNewObjects, xrefFreeObjects = self.getXrefObjectIds(i)
+                for id in self.body[i].getObjectsIds():
                     if id not in lastVersionObjects:
                         addedObjects.append(id)
-                        lastVersionObjects.append(id)
-                    else:
+                    elif lastVersionObjects[id] != actualVersionHashes[id]:
                         modifiedObjects.append(id)
                     if id not in xrefNewObjects or id in xrefFreeObjects:
                         notMatchingObjects.append(id)
-                for id in lastVersionObjects:
-                    if id not in actualVersionObjects:
+                for id in sorted(xrefNewObjects | xrefFreeObjects):
+                    if id in lastVersionObjects and id not in actualVersionHashes:
                         if id in xrefFreeObjects:
                             removedObjects.append(id)
-                            lastVersionObjects.remove(id)
+                            del lastVersionObjects[id]
                         if id in xrefNewObjects:
                             notMatchingObjects.append(id)
                 changes.append([addedObjects,modifiedObjects,removedObjects,notMatchingObjects])
-                addedObjects = []
-                removedObjects = []
-                modifiedObjects = []
-                notMatchingObjects = []
-            else:
-                lastVersionObjects = actualVersionObjects
+            lastVersionObjects.update(actualVersionHashes)
         return changes
 
     def getDetectionRate(self):
@@ -5698,6 +5949,53 @@ class PDFFile :
     def getGarbageHeader(self):
         return self.garbageHeader
     
+    def getHashes(self, version = None, algorithms = hashAlgorithms, numThreads = 4):
+        '''
+            Computes the digests of all the objects, streams, embedded files and Javascript code of the document in one pass, with a pool of threads
+            
+            @param version: The version of the document. By default all the versions are hashed.
+            @param algorithms: List of algorithms, see PDFUtils.hashContent. By default: MD5, SHA1 and SHA256.
+            @param numThreads: Number of threads. By default: 4.
+            @return: A tuple (status,statusContent), where statusContent is a dictionary with (id,version) tuples as keys and dictionaries as values in case status = 0 or an error in case status = -1. Each dictionary contains the type of the object ('embeddedfile' for embedded files) and the digests of the object ('object'), of the raw and decoded streams ('rawstream' and 'stream') and of each Javascript code found ('js', a list).
+        '''
+        if version == None:
+            versions = range(self.updates + 1)
+        elif version <= self.updates and not version < 0:
+            versions = [version]
+        else:
+            return (-1,'The version number is not valid')
+        table = {}
+        # The threads get each content when they hash it, so only the contents being hashed are kept in memory (the streams can be spilled to disk)
+        contents = []
+        targets = []
+        for v in versions:
+            for id in self.body[v].getObjectsIds():
+                object = self.body[v].getObject(id)
+                if object == None:
+                    continue
+                objectType = object.getType()
+                entry = {'type':objectType, 'js':[]}
+                contents.append(object.getRawValue)
+                targets.append((entry, 'object'))
+                if objectType == 'stream':
+                    if object.getElement('/Type') != None and object.getElement('/Type').getValue() == '/EmbeddedFile':
+                        entry['type'] = 'embeddedfile'
+                    contents += [object.getRawStream, object.getStream]
+                    targets += [(entry, 'rawstream'), (entry, 'stream')]
+                for jsCode in object.getJSCode():
+                    contents.append(jsCode)
+                    targets.append((entry, 'js'))
+                table[(id, v)] = entry
+        ret = hashContents(contents, algorithms, numThreads)
+        if ret[0] == -1:
+            return ret
+        for (entry, field), digests in zip(targets, ret[1]):
+            if field == 'js':
+                entry['js'].append(digests)
+            else:
+                entry[field] = digests
+        return (0,table)
+
     def getHeaderOffset(self):
         return self.headerOffset
         
@@ -5890,6 +6188,9 @@ class PDFFile :
     def getPath(self):
         return self.path
     
+    def getProfile(self):
+        return self.profile
+    
     def getReferencesIn (self, id, version = None) :
         ''' 
             Get the references in an object
@@ -6036,6 +6337,7 @@ class PDFFile :
             actions = self.body[version].getSuspiciousActions()
             events = self.body[version].getSuspiciousEvents()
             vulns = self.body[version].getVulns()
+            shellcode = self.body[version].getShellcode()
             elements = self.body[version].getSuspiciousElements()
             urls = self.body[version].getURLs()
             if len(events) > 0:
@@ -6050,6 +6352,11 @@ class PDFFile :
                 statsVersion['Vulns'] = vulns
             else:
                 statsVersion['Vulns'] = None
+            shellcode = dict([(finding, shellcode[finding]) for finding in shellcode if shellcode[finding] != []])
+            if len(shellcode) > 0:
+                statsVersion['Shellcode'] = shellcode
+            else:
+                statsVersion['Shellcode'] = None
             if len(elements) > 0:
                 statsVersion['Elements'] = elements
             else:
@@ -6159,6 +6466,55 @@ class PDFFile :
     def getVersion(self):
         return self.version
 
+    def getVersionObjectsHashes(self, version):
+        '''
+            Gets the objects which are present in the given version of the document, applying every update up to it
+            
+            @param version: The version of the document
+            @return: A dictionary with the object ids as keys and the hashes of their content as values
+        '''
+        objects = {}
+        for i in range(version + 1):
+            actualVersionHashes = self.body[i].getObjectsHashes()
+            if i != 0:
+                xrefNewObjects, xrefFreeObjects = self.getXrefObjectIds(i)
+                for id in xrefFreeObjects - set(actualVersionHashes):
+                    objects.pop(id, None)
+            objects.update(actualVersionHashes)
+        return objects
+
+    def getVersionsDiff(self, oldVersion, newVersion):
+        '''
+            Compares the objects of two versions of the document by their content, in linear time
+            
+            @param oldVersion: The version to compare with
+            @param newVersion: The version to compare
+            @return: A list [addedObjects,modifiedObjects,removedObjects] with the sorted ids of the objects
+        '''
+        oldObjects = self.getVersionObjectsHashes(oldVersion)
+        newObjects = self.getVersionObjectsHashes(newVersion)
+        addedObjects = sorted(set(newObjects) - set(oldObjects))
+        removedObjects = sorted(set(oldObjects) - set(newObjects))
+        modifiedObjects = sorted([id for id in newObjects if id in oldObjects and newObjects[id] != oldObjects[id]])
+        return [addedObjects,modifiedObjects,removedObjects]
+
+    def getXrefObjectIds(self, version):
+        '''
+            Gets the ids of the objects declared in use and free in the cross reference section and stream of the given version
+            
+            @param version: The version of the document
+            @return: A tuple (newObjectIds,freeObjectIds) with the ids in sets
+        '''
+        newObjectIds = set()
+        freeObjectIds = set()
+        xrefArray = self.crossRefTable[version]
+        if xrefArray != None:
+            for section in xrefArray:
+                if section != None:
+                    newObjectIds.update(section.getNewObjectIds())
+                    freeObjectIds.update(section.getFreeObjectIds())
+        return (newObjectIds,freeObjectIds)
+
     def getXrefSection (self, version = None) :
         if version == None:
             for i in range(self.updates,-1,-1):
@@ -6549,6 +6905,9 @@ class PDFFile :
     def setPath(self, path):
         self.path = path
 
+    def setProfile(self, profile):
+        self.profile = profile
+
     def setSHA1(self, sha1):
         self.sha1 = sha1
 
@@ -6625,6 +6984,155 @@ class PDFFile :
         pass
 
 
+def enableProfiling(enabled = True, numOutliers = 10):
+    '''
+        Records the time, number of calls and bytes processed by each phase of the parsing process, for the whole document and for each object. The results of each document are stored in its PDFFile (getProfile).
+
+        @param enabled: Boolean to enable or disable the profiling. By default: True.
+        @param numOutliers: Number of slowest objects shown in the reports. By default: 10.
+    '''
+    global profilingEnabled, profileOutliers
+    profilingEnabled = enabled
+    profileOutliers = numOutliers
+
+
+class PDFProfile :
+    '''
+        Timings of the parsing phases of a document. The time of a phase does not include the time of the phases run inside it (stream decoding while tokenizing an object, for instance), so the phases add up to the total time.
+    '''
+    def __init__(self, fileName, size = 0):
+        '''
+            Constructor of a PDFProfile
+
+            @param fileName: The name of the parsed file
+            @param size: The size of the file
+        '''
+        self.fileName = fileName
+        self.size = size
+        self.version = 0
+        self.phases = {} # phase: [time, calls, bytes]
+        self.objects = {} # (version, id): [size, {phase: time}]
+        self.stack = [] # [phase, startTime, bytes, innerTime, {phase: unassignedTime}]
+        self.startTime = time.time()
+        self.totalTime = 0
+
+    def start(self, phase, size = 0):
+        '''
+            Starts the measure of a phase
+
+            @param phase: The name of the phase
+            @param size: The number of bytes processed in this phase. By default: 0.
+        '''
+        self.stack.append([phase, time.time(), size, 0.0, {}])
+
+    def stop(self, phase, objectId = None, version = None):
+        '''
+            Ends the measure of the last started phase with the given name. The time of the phase, and the one of the phases run inside it which were not assigned to any object, is assigned to the given object, or to the object of the enclosing phase.
+
+            @param phase: The name of the phase
+            @param objectId: The id of the object processed in this phase. By default: None (unknown).
+            @param version: The version of the object. By default: None (the version being parsed).
+        '''
+        now = time.time()
+        while self.stack != []:
+            frame = self.stack.pop()
+            if frame[0] == phase:
+                break
+        else:
+            return
+        startTime, size, innerTime, unassignedTimes = frame[1:]
+        elapsed = now - startTime
+        phaseTime = elapsed - innerTime
+        phaseStats = self.phases.setdefault(phase, [0.0, 0, 0])
+        phaseStats[0] += phaseTime
+        phaseStats[1] += 1
+        phaseStats[2] += size
+        unassignedTimes[phase] = unassignedTimes.get(phase, 0) + phaseTime
+        if objectId != None:
+            if version == None:
+                version = self.version
+            objectStats = self.objects.setdefault((version, objectId), [0, {}])
+            objectStats[0] = max(objectStats[0], size)
+            for unassignedPhase in unassignedTimes:
+                objectStats[1][unassignedPhase] = objectStats[1].get(unassignedPhase, 0) + unassignedTimes[unassignedPhase]
+            unassignedTimes = {}
+        if self.stack != []:
+            parentFrame = self.stack[-1]
+            parentFrame[3] += elapsed
+            for unassignedPhase in unassignedTimes:
+                parentFrame[4][unassignedPhase] = parentFrame[4].get(unassignedPhase, 0) + unassignedTimes[unassignedPhase]
+
+    def finish(self):
+        '''
+            Ends the profiling of the document
+        '''
+        self.totalTime = time.time() - self.startTime
+        self.stack = []
+
+    def getOutliers(self, numOutliers = None):
+        '''
+            Gets the objects which took more time to be processed
+
+            @param numOutliers: The number of objects. By default: None (the number set with enableProfiling).
+            @return: A list of tuples (version, id, time, bytes, {phase: time}), the slowest first
+        '''
+        if numOutliers == None:
+            numOutliers = profileOutliers
+        outliers = []
+        for (version, id), (size, times) in self.objects.items():
+            outliers.append((version, id, sum(times.values()), size, times))
+        outliers.sort(key = lambda outlier: outlier[2], reverse = True)
+        return outliers[:numOutliers]
+
+    def getStats(self, numOutliers = None):
+        '''
+            Gets the profiling results in a dictionary, ready to be exported to JSON
+
+            @param numOutliers: The number of slowest objects included. By default: None (the number set with enableProfiling).
+            @return: A dictionary with the file, total time, phases and outliers
+        '''
+        phases = []
+        for phase in sorted(self.phases, key = lambda phase: self.phases[phase][0], reverse = True):
+            phaseTime, calls, size = self.phases[phase]
+            phases.append({'phase': phase, 'time': phaseTime, 'calls': calls, 'bytes': size})
+        otherTime = self.totalTime - sum([phaseStats[0] for phaseStats in self.phases.values()])
+        phases.append({'phase': 'other', 'time': max(otherTime, 0), 'calls': 0, 'bytes': 0})
+        outliers = []
+        for version, id, objectTime, size, times in self.getOutliers(numOutliers):
+            outliers.append({'version': version, 'id': id, 'time': objectTime, 'bytes': size, 'phases': dict(times)})
+        return {'file': self.fileName, 'size': self.size, 'time': self.totalTime, 'objects': len(self.objects), 'phases': phases, 'outliers': outliers}
+
+    def getTable(self, numOutliers = None):
+        '''
+            Gets the profiling results as a text table
+
+            @param numOutliers: The number of slowest objects shown. By default: None (the number set with enableProfiling).
+            @return: A string
+        '''
+        stats = self.getStats(numOutliers)
+        totalTime = max(stats['time'], 0.000001)
+        table = 'File: %s (%d bytes, %.3f s)%s%s' % (stats['file'], stats['size'], stats['time'], newLine, newLine)
+        table += '%-14s %10s %7s %10s %12s%s' % ('Phase', 'Time (s)', '%', 'Calls', 'Bytes', newLine)
+        for phaseStats in stats['phases']:
+            table += '%-14s %10.3f %7.1f %10d %12d%s' % (phaseStats['phase'], phaseStats['time'], 100 * phaseStats['time'] / totalTime, phaseStats['calls'], phaseStats['bytes'], newLine)
+        if stats['outliers'] != []:
+            table += newLine + 'Slowest objects (of %d):%s%s' % (stats['objects'], newLine, newLine)
+            table += '%-8s %10s %10s %12s  %s%s' % ('Version', 'Object', 'Time (s)', 'Bytes', 'Phases', newLine)
+            for outlier in stats['outliers']:
+                phases = ', '.join(['%s %.3f' % (phase, outlier['phases'][phase]) for phase in sorted(outlier['phases'], key = lambda phase: outlier['phases'][phase], reverse = True)])
+                table += '%-8d %10d %10.3f %12d  %s%s' % (outlier['version'], outlier['id'], outlier['time'], outlier['bytes'], phases, newLine)
+        return table
+
+    def toJSON(self, numOutliers = None):
+        '''
+            Gets the profiling results in JSON format
+
+            @param numOutliers: The number of slowest objects included. By default: None (the number set with enableProfiling).
+            @return: A JSON string
+        '''
+        return json.dumps(self.getStats(numOutliers), indent = 2, sort_keys = True)
+
+
 class PDFParser :
     def __init__(self) :
         self.commentChar = '%'
@@ -6633,15 +7141,28 @@ class PDFParser :
         self.fileParts = []
         self.charCounter = 0    
     
-    def parse (self, fileName, forceMode = False, looseMode = False, manualAnalysis = False) :
+    def parse (self, fileName, forceMode = False, looseMode = False, manualAnalysis = False, jsPool = None) :
         '''
             Main method to parse a PDF document
             @param fileName The name of the file to be parsed
             @param forceMode Boolean to specify if ignore errors or not. Default value: False.
             @param looseMode Boolean to set the loose mode when parsing objects. Default value: False.
+            @param jsPool JSAnalysisPool used to analyse the Javascript code asynchronously. Default value: None (in-process analysis).
             @return A PDFFile instance
         '''
-        global isForceMode, pdfFile, isManualAnalysis
+        global jsAnalysisPool, profiler
+        try:
+            return self.parseFile(fileName, forceMode, looseMode, manualAnalysis, jsPool)
+        finally:
+            # The error paths leave with sys.exit, the following parsing must not go on recording in the same profile
+            jsAnalysisPool = None
+            profiler = None
+
+    def parseFile (self, fileName, forceMode = False, looseMode = False, manualAnalysis = False, jsPool = None) :
+        '''
+            Parses a PDF document, see parse
+        '''
+        global isForceMode, pdfFile, isManualAnalysis, jsAnalysisPool, pendingJSAnalysis, profiler
         isFirstBody = True
         linearizedFound = False
         errorMessage = ''
@@ -6654,6 +7175,12 @@ class PDFParser :
         pdfFile.setFileName(os.path.basename(fileName))
         isForceMode = forceMode
         isManualAnalysis = manualAnalysis
+        jsAnalysisPool = jsPool
+        pendingJSAnalysis = []
+        profiler = None
+        if profilingEnabled:
+            profiler = PDFProfile(fileName, os.path.getsize(fileName))
+            profiler.start('read', profiler.size)
         
         # Reading the file header
         file = open(fileName,'rb')
@@ -6721,9 +7248,17 @@ class PDFParser :
         # Reading the rest of the file
         fileContent = open(fileName,'rb').read()
         pdfFile.setSize(len(fileContent))
-        pdfFile.setMD5(hashlib.md5(fileContent).hexdigest())
-        pdfFile.setSHA1(hashlib.sha1(fileContent).hexdigest())
-        pdfFile.setSHA256(hashlib.sha256(fileContent).hexdigest())
+        if profiler != None:
+            profiler.stop('read')
+            profiler.start('hash', len(fileContent))
+        ret, digests = hashContent(fileContent, ['md5','sha1','sha256'])
+        pdfFile.setMD5(digests['md5'])
+        pdfFile.setSHA1(digests['sha1'])
+        pdfFile.setSHA256(digests['sha256'])
+        if profiler != None:
+            profiler.stop('hash')
+            # The bytes are counted when each part is split in sections
+            profiler.start('sections')
         
         # Getting the number of updates in the file
         while fileContent.find(b'%%EOF') != -1:
@@ -6741,6 +7276,8 @@ class PDFParser :
                 else:
                     sys.exit(errorMessage)
         pdfFile.setUpdates(len(self.fileParts) - 1)
+        if profiler != None:
+            profiler.stop('sections')
         
         # Getting the body, cross reference table and trailer of each part of the file
         for i in range(len(self.fileParts)):
@@ -6769,7 +7306,12 @@ class PDFParser :
                 bodyOffset = len(self.fileParts[i-1])
                 
             # Getting the content for each section
+            if profiler != None:
+                profiler.version = i
+                profiler.start('sections', len(content))
             bodyContent,xrefContent,trailerContent = self.parsePDFSections(content,forceMode,looseMode)
+            if profiler != None:
+                profiler.stop('sections')
             if xrefContent != None:    
                 xrefOffset = bodyOffset + len(bodyContent)
                 trailerOffset = xrefOffset + len(xrefContent)
@@ -6794,26 +7336,33 @@ class PDFParser :
                     
             # Converting the body content in PDFObjects
             body = PDFBody()
+            if profiler != None:
+                profiler.start('extraction', len(bodyContent))
             rawIndirectObjects = self.getIndirectObjects(bodyContent, looseMode)
+            if profiler != None:
+                profiler.stop('extraction')
             if rawIndirectObjects != []:
+                # Offset of the first occurrence of each object header not preceded by a digit, found with a single scan of the body
+                headerOffsets = {}
+                if profiler != None:
+                    profiler.start('offsets')
+                for match in reObjectHeader.finditer(bodyContent):
+                    headerOffsets.setdefault(match.group(0), match.start())
+                if profiler != None:
+                    profiler.stop('offsets')
                 for j in range(len(rawIndirectObjects)):
-                    relativeOffset = 0
-                    auxContent = str(bodyContent)
+                    if profiler != None:
+                        profiler.start('offsets')
                     rawObject = rawIndirectObjects[j][0]
                     objectHeader = rawIndirectObjects[j][1]
-                    while True:
-                        index = auxContent.find(objectHeader)
-                        if index == -1:
-                            relativeOffset = index
-                            break
-                        relativeOffset += index
-                        checkHeader = bodyContent[relativeOffset-1:relativeOffset+len(objectHeader)]
-                        if not re.match('\d{1,10}'+objectHeader,checkHeader):
-                            break
-                        else:
-                            auxContent = auxContent[index+len(objectHeader):]
-                            relativeOffset += len(objectHeader)
+                    relativeOffset = headerOffsets.get(objectHeader, -1)
+                    if profiler != None:
+                        objectId = int(objectHeader.split()[0])
+                        profiler.stop('offsets', objectId)
+                        profiler.start('tokenization', len(rawObject))
                     ret = self.createPDFIndirectObject(rawObject, forceMode, looseMode)
+                    if profiler != None:
+                        profiler.stop('tokenization', objectId)
                     if ret[0] != -1:
                         pdfIndirectObject = ret[1]
                         if pdfIndirectObject != None:
@@ -6821,7 +7370,11 @@ class PDFParser :
                                 pdfIndirectObject.setOffset(relativeOffset)
                             else:
                                 pdfIndirectObject.setOffset(bodyOffset + relativeOffset)
+                            if profiler != None:
+                                profiler.start('registration')
                             ret = body.registerObject(pdfIndirectObject)
+                            if profiler != None:
+                                profiler.stop('registration', objectId)
                             if ret[0] == -1:
                                 pdfFile.addError(ret[1])
                             type = ret[1]
@@ -6835,7 +7388,11 @@ class PDFParser :
                                             linearizedFound = True
                                 elif objectType == 'stream' and type == '/XRef':
                                     xrefObject = pdfIndirectObject
+                                    if profiler != None:
+                                        profiler.start('xref')
                                     ret = self.createPDFCrossRefSectionFromStream(pdfIndirectObject)
+                                    if profiler != None:
+                                        profiler.stop('xref', objectId)
                                     if ret[0] != -1:
                                         xrefStreamSection = ret[1]    
                             else:
@@ -6857,7 +7414,11 @@ class PDFParser :
                 pdfFile.addError('No indirect objects found in the body')
             if pdfIndirectObject != None:
                 body.setNextOffset(pdfIndirectObject.getOffset())
+            if profiler != None:
+                profiler.start('update')
             ret = body.updateObjects()
+            if profiler != None:
+                profiler.stop('update')
             if ret[0] == -1:
                 pdfFile.addError(ret[1])
             pdfFile.addBody(body)
@@ -6868,6 +7429,8 @@ class PDFParser :
             isFirstBody = False
             
             # Converting the cross reference table content in PDFObjects
+            if profiler != None:
+                profiler.start('xref')
             if xrefContent != None:
                 ret = self.createPDFCrossRefSection(xrefContent,xrefOffset)
                 if ret[0] != -1:
@@ -6901,6 +7464,8 @@ class PDFParser :
                     if encryptDict != None:
                         pdfFile.setEncrypted(True)
                     fileId = trailer.getDictEntry('/ID')
+            if profiler != None:
+                profiler.stop('xref')
             if pdfFile.getEncryptDict() == None and encryptDict != None:
                 objectType = encryptDict.getType()
                 if objectType == 'reference':
@@ -6928,11 +7493,51 @@ class PDFParser :
                             pdfFile.setFileId(fileId)
             pdfFile.addTrailer([trailer, streamTrailer])
         if pdfFile.isEncrypted() and pdfFile.getEncryptDict() != None:
+            if profiler != None:
+                profiler.start('decrypt')
             ret = pdfFile.decrypt()
+            if profiler != None:
+                profiler.stop('decrypt')
             if ret[0] == -1:
                 pdfFile.addError(ret[1])
+        if pendingJSAnalysis != []:
+            if profiler != None:
+                profiler.start('js')
+            self.collectJSAnalysis()
+            if profiler != None:
+                profiler.stop('js')
+        jsAnalysisPool = None
+        if profiler != None:
+            profiler.finish()
+            pdfFile.setProfile(profiler)
+            profiler = None
         return (0,pdfFile)
 
+    def collectJSAnalysis(self):
+        '''
+            Waits for the Javascript analysis queued in the JSAnalysisPool and updates the objects and the statistics of the bodies with the results
+        '''
+        global pendingJSAnalysis
+        analysedObjects = {}
+        for pdfObject, code, job in pendingJSAnalysis:
+            result = job.getResult()
+            if result == None:
+                continue
+            cacheJSAnalysis(code, result)
+            pdfObject.JSCode, pdfObject.unescapedBytes, pdfObject.urlsFound, jsErrors = result
+            for jsError in jsErrors:
+                pdfObject.addError('Error analysing Javascript: '+jsError)
+            analysedObjects[id(pdfObject)] = pdfObject
+        pendingJSAnalysis = []
+        for body in pdfFile.body:
+            for objectId in body.objects:
+                pdfObject = body.objects[objectId].getObject()
+                if pdfObject != None and id(pdfObject) in analysedObjects:
+                    body.updateStats(objectId, pdfObject)
+                    for error in pdfObject.getErrors():
+                        if error not in body.errors:
+                            body.errors.append(error)
+
     def parsePDFSections(self, content, forceMode = False, looseMode = False):
         '''
             Method to parse the different sections of a version of a PDF document.
@@ -6999,8 +7604,7 @@ class PDFParser :
             ret = self.readSymbol(rawIndirectObject, 'obj')
             if ret[0] == -1:
                 return ret
-            rawObject = rawIndirectObject[self.charCounter:]
-            ret = self.readObject(rawObject, forceMode = forceMode, looseMode = looseMode)
+            ret = self.readNextObject(rawIndirectObject, forceMode = forceMode, looseMode = looseMode)
             if ret[0] == -1:
                 return ret
             object = ret[1]
@@ -7024,7 +7628,7 @@ class PDFParser :
         realCounter = self.charCounter
         self.charCounter = 0
         elements = []
-        ret = self.readObject(rawContent)
+        ret = self.readNextObject(rawContent)
         if ret[0] == -1:
             if ret[1] != 'Empty content reading object':
                 if isForceMode:
@@ -7038,7 +7642,7 @@ class PDFParser :
             pdfObject = ret[1]
         while pdfObject != None:
             elements.append(pdfObject)
-            ret = self.readObject(rawContent[self.charCounter:])
+            ret = self.readNextObject(rawContent)
             if ret[0] == -1:
                 if ret[1] != 'Empty content reading object':
                     if isForceMode:
@@ -7070,7 +7674,7 @@ class PDFParser :
         self.charCounter = 0
         elements = {}
         rawNames = {}
-        ret = self.readObject(rawContent[self.charCounter:], 'name')
+        ret = self.readNextObject(rawContent, 'name')
         if ret[0] == -1:
             if ret[1] != 'Empty content reading object':
                 if isForceMode:
@@ -7085,14 +7689,14 @@ class PDFParser :
         while name != None:
             key = name.getValue()
             rawNames[key] = name
-            rawValue = rawContent[self.charCounter:]
-            ret = self.readObject(rawValue)
+            valueCounter = self.charCounter
+            ret = self.readNextObject(rawContent)
             if ret[0] == -1:
                 if isForceMode:
                     pdfFile.addError('Bad object for '+str(key)+' key')
                     ret = self.readUntilSymbol(rawContent, '/')
                     if ret[0] == -1:
-                        elements[key] = PDFString(rawValue)
+                        elements[key] = PDFString(rawContent[valueCounter:])
                     else:
                         elements[key] = PDFString(ret[1])
                     self.readSpaces(rawContent)
@@ -7101,7 +7705,7 @@ class PDFParser :
             else:
                 value = ret[1]
                 elements[key] = value
-            ret = self.readObject(rawContent[self.charCounter:], 'name')
+            ret = self.readNextObject(rawContent, 'name')
             if ret[0] == -1:
                 if ret[1] != 'Empty content reading object':
                     if isForceMode:
@@ -7141,7 +7745,7 @@ class PDFParser :
         self.charCounter = 0
         elements = {}
         rawNames = {}
-        ret = self.readObject(dict[self.charCounter:], 'name')
+        ret = self.readNextObject(dict, 'name')
         if ret[0] == -1:
             if ret[1] != 'Empty content reading object':
                 if isForceMode:
@@ -7156,7 +7760,7 @@ class PDFParser :
         while name != None:
             key = name.getValue()
             rawNames[key] = name
-            ret = self.readObject(dict[self.charCounter:])
+            ret = self.readNextObject(dict)
             if ret[0] == -1:
                 if ret[1] != 'Empty content reading object':
                     if isForceMode:
@@ -7169,7 +7773,7 @@ class PDFParser :
             else:
                 value = ret[1]
             elements[key] = value
-            ret = self.readObject(dict[self.charCounter:], 'name')
+            ret = self.readNextObject(dict, 'name')
             if ret[0] == -1:
                 if ret[1] != 'Empty content reading object':
                     if isForceMode:
@@ -7420,7 +8024,7 @@ class PDFParser :
         if not isinstance(rawContent,str):
             return (-1,'Empty trailer content')
         self.readSymbol(rawContent, 'trailer')    
-        ret = self.readObject(rawContent[self.charCounter:],'dictionary')
+        ret = self.readNextObject(rawContent,'dictionary')
         if ret[0] == -1:
             dict = PDFDictionary('')
             dict.addError('Error creating the trailer dictionary')
@@ -7586,12 +8190,26 @@ class PDFParser :
             @param looseMode
             @return A tuple (status,statusContent), where statusContent is a PDFObject instance in case status = 0 or an error in case status = -1
         '''
+        oldCounter = self.charCounter
+        self.charCounter = 0
+        ret = self.readNextObject(content, objectType, forceMode, looseMode)
+        self.charCounter += oldCounter
+        return ret
+
+    def readNextObject(self, content, objectType = None, forceMode = False, looseMode = False):
+        '''
+            Method to parse the PDF object found at the current position of the content, without copying the rest of the content
+            @param content
+            @param objectType
+            @param forceMode
+            @param looseMode
+            @return A tuple (status,statusContent), where statusContent is a PDFObject instance in case status = 0 or an error in case status = -1
+        '''
         global pdfFile
-        if len(content) == 0 or content[:6] == 'endobj':
+        startCounter = self.charCounter
+        if startCounter >= len(content) or content.startswith('endobj', startCounter):
             return (-1,'Empty content reading object')
         pdfObject = None
-        oldCounter = self.charCounter
-        self.charCounter = 0
         if objectType != None:
             objectsTypeArray = [self.delimiters[i][2] for i in range(len(self.delimiters))]
             index = objectsTypeArray.index(objectType)
@@ -7614,13 +8232,11 @@ class PDFParser :
                         dictContent = ''
                     else:
                         dictContent = ret[1]
-                    nonDictContent = content[self.charCounter:]
-                    streamFound = re.findall('[>\s]stream', nonDictContent)
+                    streamFound = reStreamKeyword.search(content, self.charCounter)
                     if streamFound:
                         ret = self.readUntilSymbol(content, 'stream')
                         if ret[0] == -1:
                             return ret
-                        auxDict = ret[1]
                         self.readSymbol(content, 'stream', False)
                         self.readUntilEndOfLine(content)
                         self.readSymbol(content, '\r', False)
@@ -7644,7 +8260,7 @@ class PDFParser :
                                 return ret
                             pdfObject = ret[1]
                         else:
-                            pdfObject = PDFDictionary(content)
+                            pdfObject = PDFDictionary(content[startCounter:])
                             pdfObject.addError('Closing delimiter not found in dictionary object')
                         break
                 elif delim[2] == 'string':
@@ -7654,7 +8270,7 @@ class PDFParser :
                         self.readSymbol(content, delim[1])
                         pdfObject = PDFString(stringContent)
                     else:
-                        pdfObject = PDFString(content)
+                        pdfObject = PDFString(content[startCounter:])
                         pdfObject.addError('Closing delimiter not found in string object')
                     break
                 elif delim[2] == 'hexadecimal':
@@ -7664,7 +8280,7 @@ class PDFParser :
                         self.readSymbol(content, delim[1])
                         pdfObject = PDFHexString(hexContent)
                     else:
-                        pdfObject = PDFHexString(content)
+                        pdfObject = PDFHexString(content[startCounter:])
                         pdfObject.addError('Closing delimiter not found in hexadecimal object')
                     break
                 elif delim[2] == 'array':
@@ -7677,7 +8293,7 @@ class PDFParser :
                             return ret
                         pdfObject = ret[1]
                     else:
-                        pdfObject = PDFArray(content)
+                        pdfObject = PDFArray(content[startCounter:])
                         pdfObject.addError('Closing delimiter not found in array object')
                     break
                 elif delim[2] == 'name':
@@ -7689,31 +8305,29 @@ class PDFParser :
                     if ret[0] == 0:
                         self.comments.append(ret[1])
                         self.readSpaces(content)
-                        pdfObject = self.readObject(content[self.charCounter:],objectType)
+                        return self.readNextObject(content, objectType)
                     else:
                         return ret
-                    break
         else:
-            if content[0] == 't' or content[0] == 'f':
+            firstChar = content[startCounter]
+            if firstChar == 't' or firstChar == 'f':
                 ret,raw = self.readUntilNotRegularChar(content)
                 pdfObject = PDFBool(raw)
-            elif content[0] == 'n':
+            elif firstChar == 'n':
                 ret,raw = self.readUntilNotRegularChar(content)
                 pdfObject = PDFNull(raw)
-            elif re.findall('^(\d{1,10}\s{1,3}\d{1,10}\s{1,3}R)', content, re.DOTALL) != []:
+            elif reReference.match(content, startCounter):
                 ret,id = self.readUntilNotRegularChar(content)
                 ret,genNumber = self.readUntilNotRegularChar(content)
                 ret = self.readSymbol(content, 'R')
                 if ret[0] == -1:
                     return ret
                 pdfObject = PDFReference(id, genNumber)
-            elif re.findall('^([-+]?\.?\d{1,15}\.?\d{0,15})', content, re.DOTALL) != []:
+            elif reNumber.match(content, startCounter):
                 ret,num = self.readUntilNotRegularChar(content)
                 pdfObject = PDFNum(num)
             else:
-                self.charCounter += oldCounter
                 return (-1,'Object not found')
-        self.charCounter += oldCounter
         return (0,pdfObject)
 
     def readSpaces(self, string):
@@ -7725,10 +8339,7 @@ class PDFParser :
         if not isinstance(string,str):
             return (-1,'Bad string')
         spacesCounter = self.charCounter
-        for i in range(self.charCounter,len(string)):
-            if string[i] not in spacesChars:
-                break
-            self.charCounter += 1
+        self.charCounter = reSpaces.match(string, self.charCounter).end()
         spacesCounter -= self.charCounter
         return (0,spacesCounter)
 
@@ -7754,8 +8365,7 @@ class PDFParser :
                 return ret
             self.comments.append(ret[1])
             self.readSpaces(string)
-        symbolToRead = string[self.charCounter:self.charCounter+len(symbol)]
-        if symbolToRead != symbol:
+        if not string.startswith(symbol, self.charCounter):
             errorMessage = 'Symbol "'+symbol+'" not found while parsing'
             #pdfFile.addError(errorMessage)
             return (-1, errorMessage)
@@ -7772,70 +8382,54 @@ class PDFParser :
             @return A tuple (status,statusContent), where statusContent is the characters read in case status = 0 or an error in case status = -1
         '''
         global pdfFile
-        output = ''
         if not isinstance(content,str):
             return (-1,'Bad string')
-        newContent = content[self.charCounter:]
-        numOpeningDelims = newContent.count(delim[0]) + 1
-        numClosingDelims = newContent.count(delim[1])
-        if numClosingDelims == 0:
-            errorMessage = 'No closing delimiter found'
-            pdfFile.addError(errorMessage)
-            return (-1, errorMessage)
-        elif numClosingDelims == 1:
-            index = newContent.rfind(delim[1])
-            self.charCounter += index
-            return (0,newContent[:index])
-        else:
-            indexChar = 0
-            prevChar = ''
-            while indexChar != len(newContent):
-                char = newContent[indexChar]
-                if indexChar == len(newContent) - 1:
-                    nextChar = ''
-                else:
-                    nextChar = newContent[indexChar+1]
-                if char == delim[1] or (char + nextChar) == delim[1]:
-                    if char != ')' or indexChar == 0 or newContent[indexChar-1] != '\\':
-                        return (0,output)
-                    else:
-                        output += char
-                        indexChar += 1
-                        self.charCounter += 1
-                elif (char == '(' and prevChar != '\\') or (char in ['[','<'] and delim[0] != '('):
-                    if (char + nextChar) != '<<':
-                        delimIndex = delimiterChars.index(char)
-                        self.charCounter += 1
-                        ret = self.readUntilClosingDelim(content, self.delimiters[delimIndex])
-                        if ret[0] != -1:
-                            tempObject = char + ret[1]
-                        else:
-                            return ret
-                    else:
-                        delimIndex = delimiterChars.index(char + nextChar)
-                        self.charCounter += 2
-                        ret = self.readUntilClosingDelim(content, self.delimiters[delimIndex])
-                        if ret[0] != -1:
-                            tempObject = char + nextChar + ret[1]
-                        else:
-                            return ret
-                    ret = self.readSymbol(content, self.delimiters[delimIndex][1], False)
-                    if ret[0] != -1:
-                        tempObject += self.delimiters[delimIndex][1]
-                    else:
-                        return ret
-                    indexChar += len(tempObject)
-                    output += tempObject
+        startCounter = self.charCounter
+        delimitedChars = reDelimitedChars[delim[0]]
+        # Single scan of the delimiters, the nested objects continue it from their own closing delimiter
+        match = delimitedChars.search(content, self.charCounter)
+        while match != None:
+            indexChar = match.start()
+            self.charCounter = indexChar
+            char = content[indexChar]
+            if content.startswith(delim[1], indexChar):
+                if char != ')' or not self.isEscaped(content, indexChar, startCounter):
+                    return (0,content[startCounter:indexChar])
                 else:
-                    indexChar += 1
                     self.charCounter += 1
-                    output += char
-                    prevChar = char            
+            elif (char == '(' and not self.isEscaped(content, indexChar, startCounter)) or (char in ['[','<'] and delim[0] != '('):
+                if content.startswith('<<', indexChar):
+                    nestedDelim = self.delimiters[0]
+                else:
+                    nestedDelim = self.delimiters[delimiterChars.index(char)]
+                self.charCounter += len(nestedDelim[0])
+                ret = self.readUntilClosingDelim(content, nestedDelim)
+                if ret[0] == -1:
+                    return ret
+                ret = self.readSymbol(content, nestedDelim[1], False)
+                if ret[0] == -1:
+                    return ret
             else:
-                errorMessage = 'No closing delimiter found'
-                pdfFile.addError(errorMessage)
-                return (-1, errorMessage)
+                self.charCounter += 1
+            match = delimitedChars.search(content, self.charCounter)
+        self.charCounter = len(content)
+        errorMessage = 'No closing delimiter found'
+        pdfFile.addError(errorMessage)
+        return (-1, errorMessage)
     
+    def isEscaped(self, content, index, startCounter = 0):
+        '''
+            Checks if the character at the given position is escaped, preceded by an odd number of backslashes
+            @param content
+            @param index The position of the character
+            @param startCounter The position where the backslashes stop being counted. Default value: 0.
+            @return A boolean
+        '''
+        numBackslashes = 0
+        while index - numBackslashes > startCounter and content[index - numBackslashes - 1] == '\\':
+            numBackslashes += 1
+        return numBackslashes % 2 == 1
+
     def readUntilEndOfLine(self, content):
         '''
             This function reads characters until the end of line
@@ -7845,17 +8439,15 @@ class PDFParser :
         global pdfFile
         if not isinstance(content,str):
             return (-1,'Bad string')
-        errorMessage = []
         oldCharCounter = self.charCounter
-        tmpContent = content[self.charCounter:]
-        for char in tmpContent:
-            if char == '\r' or char == '\n':
-                return (0,content[oldCharCounter:self.charCounter])
-            self.charCounter += 1
-        else:
+        match = reEndOfLine.search(content, oldCharCounter)
+        if match == None:
+            self.charCounter = max(oldCharCounter, len(content))
             errorMessage = 'EOL not found'
             pdfFile.addError(errorMessage)
             return (-1, errorMessage)
+        self.charCounter = match.start()
+        return (0,content[oldCharCounter:self.charCounter])
 
     def readUntilLastSymbol(self, string, symbol):
         '''
@@ -7867,14 +8459,14 @@ class PDFParser :
         global pdfFile
         if not isinstance(string,str):
             return (-1,'Bad string')
-        newString = string[self.charCounter:]
-        index = newString.rfind(symbol)
+        oldCharCounter = self.charCounter
+        index = string.rfind(symbol, oldCharCounter)
         if index == -1:
             errorMessage = 'Symbol "'+symbol+'" not found'
             pdfFile.addError(errorMessage)
             return (-1, errorMessage)
-        self.charCounter += index
-        return (0,newString[:index])
+        self.charCounter = index
+        return (0,string[oldCharCounter:index])
             
     def readUntilNotRegularChar(self, string):
         '''
@@ -7882,17 +8474,12 @@ class PDFParser :
             @param string 
             @return A tuple (status,statusContent), where statusContent is the number of characters read in case status = 0 or an error in case status = -1
         '''
-        readChars = ''
         if not isinstance(string,str):
             return (-1,'Bad string')
-        notRegChars = spacesChars + delimiterChars
-        for i in range(self.charCounter,len(string)):
-            if string[i] in notRegChars:
-                self.readSpaces(string)
-                break
-            readChars += string[i]
-            self.charCounter += 1
-        return (0,readChars)
+        match = reRegularChars.match(string, self.charCounter)
+        self.charCounter = match.end()
+        self.readSpaces(string)
+        return (0,match.group())
             
     def readUntilSymbol(self, string, symbol):
         '''
@@ -7904,10 +8491,10 @@ class PDFParser :
         global pdfFile
         if not isinstance(string,str):
             return (-1,'Bad string')
-        newString = string[self.charCounter:]
-        index = newString.find(symbol)
+        oldCharCounter = self.charCounter
+        index = string.find(symbol, oldCharCounter)
         if index == -1:
             errorMessage = 'Symbol "'+symbol+'" not found'
             return (-1, errorMessage)
-        self.charCounter += index
-        return (0,newString[:index])
+        self.charCounter = index
+        return (0,string[oldCharCounter:index])
@@ -71,9 +71,25 @@
     Module to manage encoding/decoding in PDF files
 '''
 
-import sys, zlib, lzw, struct
-from PDFUtils import getNumsFromBytes, getBytesFromBits, getBitsFromNum
-from ccitt import CCITTFax
+import sys, re, zlib, struct, binascii
+from PDFUtils import isModuleAvailable
+try:
+    # Python 3.4+
+    from base64 import a85decode, a85encode
+except:
+    a85decode = a85encode = None
+
+# NumPy is imported by loadNumpy the first time a predictor is removed
+NUMPY_MODULE = isModuleAvailable('numpy')
+numpy = None
+
+numpyMinRowSize = 64
+ascii85Chars = [chr(33 + i) for i in range(85)]
+ascii85Pairs = [first + second for first in ascii85Chars for second in ascii85Chars]
+ascii85Offset = 33 * (85**4 + 85**3 + 85**2 + 85 + 1)
+reWhitespaces = re.compile('[\x00\x09\x0a\x0b\x0c\x0d\x20]+')
+reNotAscii85Chars = re.compile('[^!-u]')
+reRepeatedBytes = re.compile('(.)\\1{2,}', re.DOTALL)
 
 def decodeStream(stream, filter, parameters = {}):
     '''
@@ -178,38 +194,51 @@ def ascii85Decode(stream):
         @param stream: A PDF stream
         @return: A tuple (status,statusContent), where statusContent is the decoded PDF stream in case status = 0 or an error in case status = -1
     '''
-    n = b = 0 
-    decodedStream = ''
+    stream = reWhitespaces.sub('', stream)
+    if stream.startswith('<~'):
+        stream = stream[2:]
+    eod = stream.find('~')
+    if eod != -1:
+        stream = stream[:eod]
     try:
-        for c in stream:
-            if '!' <= c and c <= 'u':
-                n += 1
-                b = b*85+(ord(c)-33)
-                if n == 5:
-                    decodedStream += struct.pack('>L',b)
-                    n = b = 0
-            elif c == 'z':
-                assert n == 0
-                decodedStream += '\0\0\0\0'
-            elif c == '~':
-                if n:
-                    for _ in range(5-n):
-                        b = b*85+84
-                    decodedStream += struct.pack('>L',b)[:n-1]
-                break
+        if a85decode != None:
+            return (0,a85decode(stream))
+        groups = stream.split('z')
+        for group in groups[:-1]:
+            if len(group) % 5 != 0:
+                return (-1,'Unspecified error')
+        stream = '!!!!!'.join(groups)
+        if reNotAscii85Chars.search(stream):
+            return (-1,'Unspecified error')
+        padding = -len(stream) % 5
+        digits = bytearray(stream + 'u' * padding)
+        words = [(((a*85 + b)*85 + c)*85 + d)*85 + e - ascii85Offset for a, b, c, d, e in zip(digits[0::5], digits[1::5], digits[2::5], digits[3::5], digits[4::5])]
+        decodedStream = struct.pack('>%dL' % len(words), *words)
     except:
         return (-1,'Unspecified error')
+    if padding:
+        decodedStream = decodedStream[:-padding]
     return (0,decodedStream)
 
 def ascii85Encode(stream):
     '''
-        Method to encode streams using ASCII85 (NOT SUPPORTED YET)
+        Method to encode streams using ASCII85
     
         @param stream: A PDF stream
         @return: A tuple (status,statusContent), where statusContent is the encoded PDF stream in case status = 0 or an error in case status = -1
     '''
-    encodedStream = ''
-    return (-1,'Ascii85Encode not supported yet')
+    try:
+        if a85encode != None:
+            return (0,a85encode(stream) + b'~>')
+        padding = -len(stream) % 4
+        words = struct.unpack('>%dL' % ((len(stream) + padding) // 4), stream + '\0' * padding)
+        encodedStream = ['z' if word == 0 else ascii85Pairs[word // 614125] + ascii85Pairs[word // 85 % 7225] + ascii85Chars[word % 85] for word in words]
+        if padding:
+            lastWord = words[-1]
+            encodedStream[-1] = (ascii85Pairs[lastWord // 614125] + ascii85Pairs[lastWord // 85 % 7225] + ascii85Chars[lastWord % 85])[:5-padding]
+    except:
+        return (-1,'Error in ASCII85 conversion')
+    return (0,''.join(encodedStream) + '~>')
 
 def asciiHexDecode(stream):
     '''
@@ -218,31 +247,16 @@ def asciiHexDecode(stream):
         @param stream: A PDF stream
         @return: A tuple (status,statusContent), where statusContent is the decoded PDF stream in case status = 0 or an error in case status = -1
     '''
-    eod = '>'
-    decodedStream = ''
-    char = ''
-    index = 0
-    while index < len(stream):
-        c = stream[index]
-        if c == eod:
-            if len(decodedStream) % 2 != 0:
-                char += '0'
-                try:
-                    decodedStream += chr(int(char, base=16))
-                except:
-                    return (-1,'Error in hexadecimal conversion')
-            break
-        elif c.isspace():
-            index += 1
-            continue
-        char += c
-        if len(char) == 2:
-            try:
-                decodedStream += chr(int(char, base=16))
-            except:
-                return (-1,'Error in hexadecimal conversion')
-            char = ''
-        index += 1
+    eod = stream.find('>')
+    if eod != -1:
+        stream = stream[:eod]
+    stream = reWhitespaces.sub('', stream)
+    if len(stream) % 2 != 0:
+        stream += '0'
+    try:
+        decodedStream = binascii.unhexlify(stream)
+    except:
+        return (-1,'Error in hexadecimal conversion')
     return (0,decodedStream)
 
 def asciiHexEncode(stream):
@@ -253,7 +267,7 @@ def asciiHexEncode(stream):
         @return: A tuple (status,statusContent), where statusContent is the encoded PDF stream in case status = 0 or an error in case status = -1
     '''
     try:
-        encodedStream = stream.encode('hex')    
+        encodedStream = binascii.hexlify(stream) + b'>'
     except:
         return (-1,'Error in hexadecimal conversion')
     return (0,encodedStream)
@@ -359,9 +373,14 @@ def lzwDecode(stream, parameters):
         @param stream: A PDF stream
         @return: A tuple (status,statusContent), where statusContent is the decoded PDF stream in case status = 0 or an error in case status = -1
     '''
+    import lzw
     decodedStream = ''
+    if parameters != None and parameters.has_key('/EarlyChange'):
+        earlyChange = parameters['/EarlyChange'].getRawValue()
+    else:
+        earlyChange = 1
     try:
-        decodedStream = lzw.lzwdecode(stream)
+        decodedStream = lzw.lzwdecode(stream, earlyChange)
     except:
         return (-1,'Error decompressing string')
     
@@ -391,10 +410,6 @@ def lzwDecode(stream, parameters):
                 bits = 8
         else:
             bits = 8
-        if parameters.has_key('/EarlyChange'):
-            earlyChange = parameters['/EarlyChange'].getRawValue()
-        else:
-            earlyChange = 1
         if predictor != None and predictor != 1:
             ret = post_prediction(decodedStream, predictor, columns, colors, bits)
             return ret
@@ -408,12 +423,11 @@ def lzwEncode(stream, parameters):
         @param stream: A PDF stream
         @return: A tuple (status,statusContent), where statusContent is the encoded PDF stream in case status = 0 or an error in case status = -1
     '''
+    import lzw
     encodedStream = ''
     if parameters == None or parameters == {}:
         try:
-            generator = lzw.compress(stream)
-            for c in generator:
-                encodedStream += c
+            encodedStream = lzw.lzwencode(stream)
             return (0,encodedStream)
         except:
             return (-1,'Error compressing string')
@@ -453,12 +467,10 @@ def lzwEncode(stream, parameters):
         else:
             output = stream
         try:
-            generator = lzw.compress(output)
-            for c in generator:
-                encodedStream += c
+            encodedStream = lzw.lzwencode(output, earlyChange)
             return (0,encodedStream)
         except:
-            return (-1,'Error decompressing string')
+            return (-1,'Error compressing string')
 
 def pre_prediction(stream, predictor, columns, colors, bits):
     '''
@@ -502,7 +514,7 @@ def pre_prediction(stream, predictor, columns, colors, bits):
 def post_prediction(decodedStream, predictor, columns, colors, bits):
     '''
         Predictor function to obtain the real stream, removing the prediction (PDF Specification)
-    
+
         @param decodedStream: The decoded stream to be modified
         @param predictor: The type of predictor to apply
         @param columns: Number of samples per row
@@ -510,103 +522,204 @@ def post_prediction(decodedStream, predictor, columns, colors, bits):
         @param bits: Number of bits per color
         @return: A tuple (status,statusContent), where statusContent is the modified decoded stream in case status = 0 or an error in case status = -1
     '''
-    
-    output = ''
-    bytesPerRow = (colors * bits * columns + 7) / 8
-    
+    bytesPerRow = (colors * bits * columns + 7) // 8
+    loadNumpy()
+
     # TIFF - 2
     # http://www.gnupdf.org/PNG_and_TIFF_Predictors_Filter#TIFF
     if predictor == 2:
-        numRows = len(decodedStream) / bytesPerRow
-        bitmask = 2 ** bits - 1
-        outputBitsStream = ''
-        for rowIndex in range(numRows):
-            row = decodedStream[rowIndex*bytesPerRow:rowIndex*bytesPerRow+bytesPerRow]
-            ret,colorNums = getNumsFromBytes(row, bits)
-            if ret == -1:
-                return (ret,colorNums)
-            pixel = [0 for x in range(colors)]
-            for i in range(columns):
-                for j in range(colors):
-                    diffPixel = colorNums[i+j]
-                    pixel[j] = (pixel[j] + diffPixel) & bitmask
-                    ret, outputBits = getBitsFromNum(pixel[j],bits)
-                    if ret == -1:
-                        return (ret,outputBits)
-                    outputBitsStream += outputBits
-        output = getBytesFromBits(outputBitsStream)
-        return output
+        return tiffPostPrediction(decodedStream, bytesPerRow, columns, colors, bits)
     # PNG prediction
     # http://www.libpng.org/pub/png/spec/1.2/PNG-Filters.html
     # http://www.gnupdf.org/PNG_and_TIFF_Predictors_Filter#TIFF
     elif predictor >= 10 and predictor <= 15:
-        bytesPerRow += 1
-        numRows = (len(decodedStream) + bytesPerRow -1) / bytesPerRow
-        numSamplesPerRow = columns + 1
-        bytesPerSample = (colors * bits + 7) / 8
-        upRowdata = (0,) * numSamplesPerRow
-        for row in xrange(numRows):
-            rowdata = [ord(x) for x in decodedStream[(row*bytesPerRow):((row+1)*bytesPerRow)]]
-            # PNG prediction can vary from row to row
-            filterByte = rowdata[0]
-            rowdata[0] = 0
-                
-            if filterByte == 0:
-                # None
-                pass
-            elif filterByte == 1:
-                # Sub - 11
-                for i in range(1, numSamplesPerRow):
-                    if i < bytesPerSample:
-                        prevSample = 0
-                    else:
-                        prevSample = rowdata[i-bytesPerSample]
-                    rowdata[i] = (rowdata[i] + prevSample) % 256
-            elif filterByte == 2:
-                # Up - 12
-                for i in range(1, numSamplesPerRow):
-                    upSample = upRowdata[i]
-                    rowdata[i] = (rowdata[i] + upSample) % 256
-            elif filterByte == 3:
-                # Average - 13
-                for i in range(1, numSamplesPerRow):
-                    upSample = upRowdata[i]
-                    if i < bytesPerSample:
-                        prevSample = 0
-                    else:
-                        prevSample = rowdata[i-bytesPerSample]
-                    rowdata[i] = (rowdata[i] + ((prevSample+upSample)/2)) % 256                        
-            elif filterByte == 4:
-                # Paeth - 14
-                for i in range(1, numSamplesPerRow):
-                    upSample = upRowdata[i]
-                    if i < bytesPerSample:
-                        prevSample = 0
-                        upPrevSample = 0
-                    else:
-                        prevSample = rowdata[i-bytesPerSample]
-                        upPrevSample = upRowdata[i-bytesPerSample]
-                    p = prevSample + upSample - upPrevSample
-                    pa = abs(p - prevSample)
-                    pb = abs(p - upSample)
-                    pc = abs(p - upPrevSample)
-                    if pa <= pb and pa <= pc:
-                        nearest = prevSample
-                    elif pb <= pc:
-                        nearest = upSample
-                    else:
-                        nearest = upPrevSample
-                    rowdata[i] = (rowdata[i] + nearest) % 256                        
-            else:
-                # Optimum - 15
-                #return (-1,'Unsupported predictor')
-                pass
-            upRowdata = rowdata
-            output += (''.join([chr(x) for x in rowdata[1:]]))
-        return (0,output)
+        bytesPerPixel = (colors * bits + 7) // 8
+        return pngPostPrediction(decodedStream, bytesPerRow, bytesPerPixel)
     else:
         return (-1,'Wrong value for predictor')
 
+def loadNumpy():
+    '''
+        Imports NumPy the first time it is needed
+
+        @return: A boolean, False if NumPy is not installed or can't be loaded
+    '''
+    global NUMPY_MODULE, numpy
+    if numpy == None and NUMPY_MODULE:
+        try:
+            import numpy as numpyModule
+            numpy = numpyModule
+        except:
+            NUMPY_MODULE = False
+    return NUMPY_MODULE
+
+def pngPostPrediction(decodedStream, bytesPerRow, bytesPerPixel):
+    '''
+        Removes the PNG prediction of the stream, row by row. The filter type can change in every row.
+
+        @param decodedStream: The decoded stream to be modified
+        @param bytesPerRow: Number of bytes per row, without the filter type byte
+        @param bytesPerPixel: Number of bytes per pixel, rounded up to 1
+        @return: A tuple (status,statusContent), where statusContent is the modified decoded stream in case status = 0 or an error in case status = -1
+    '''
+    data = bytearray(decodedStream)
+    dataView = memoryview(data)
+    output = bytearray()
+    rowLength = bytesPerRow + 1
+    upRow = bytearray(bytesPerRow)
+    for offset in xrange(0, len(data), rowLength):
+        filterByte = data[offset]
+        row = bytearray(dataView[offset+1:offset+rowLength])
+        if len(row) < len(upRow):
+            upRow = upRow[:len(row)]
+        if filterByte == 0:
+            # None
+            pass
+        elif filterByte == 1:
+            # Sub - 11
+            pngSub(row, bytesPerPixel)
+        elif filterByte == 2:
+            # Up - 12
+            pngUp(row, upRow)
+        elif filterByte == 3:
+            # Average - 13
+            pngAverage(row, upRow, bytesPerPixel)
+        elif filterByte == 4:
+            # Paeth - 14
+            pngPaeth(row, upRow, bytesPerPixel)
+        else:
+            # Optimum - 15
+            #return (-1,'Unsupported predictor')
+            pass
+        output += row
+        upRow = row
+    return (0,bytes(output))
+
+def pngSub(row, bytesPerPixel):
+    '''
+        Removes the Sub PNG filter of a row: each byte is the difference with the corresponding byte of the previous pixel
+
+        @param row: The row to be modified in place (bytearray)
+        @param bytesPerPixel: Number of bytes per pixel
+    '''
+    if NUMPY_MODULE and len(row) >= numpyMinRowSize and len(row) % bytesPerPixel == 0:
+        pixels = numpy.frombuffer(row, dtype = numpy.uint8).reshape(-1, bytesPerPixel)
+        row[:] = numpy.cumsum(pixels, axis = 0, dtype = numpy.uint8).tobytes()
+    else:
+        for i in xrange(bytesPerPixel, len(row)):
+            row[i] = (row[i] + row[i-bytesPerPixel]) & 0xff
+
+def pngUp(row, upRow):
+    '''
+        Removes the Up PNG filter of a row: each byte is the difference with the byte above
+
+        @param row: The row to be modified in place (bytearray)
+        @param upRow: The previous row, already decoded (bytearray)
+    '''
+    if NUMPY_MODULE and len(row) >= numpyMinRowSize:
+        row[:] = (numpy.frombuffer(row, dtype = numpy.uint8) + numpy.frombuffer(upRow, dtype = numpy.uint8)).tobytes()
+    else:
+        row[:] = bytearray([(sample + upSample) & 0xff for sample, upSample in zip(row, upRow)])
+
+def pngAverage(row, upRow, bytesPerPixel):
+    '''
+        Removes the Average PNG filter of a row: each byte is the difference with the mean of the previous pixel and the byte above
+
+        @param row: The row to be modified in place (bytearray)
+        @param upRow: The previous row, already decoded (bytearray)
+        @param bytesPerPixel: Number of bytes per pixel
+    '''
+    for i in xrange(min(bytesPerPixel, len(row))):
+        row[i] = (row[i] + (upRow[i] >> 1)) & 0xff
+    for i in xrange(bytesPerPixel, len(row)):
+        row[i] = (row[i] + ((row[i-bytesPerPixel] + upRow[i]) >> 1)) & 0xff
+
+def pngPaeth(row, upRow, bytesPerPixel):
+    '''
+        Removes the Paeth PNG filter of a row: each byte is the difference with the nearest of the previous pixel, the byte above and the previous pixel above
+
+        @param row: The row to be modified in place (bytearray)
+        @param upRow: The previous row, already decoded (bytearray)
+        @param bytesPerPixel: Number of bytes per pixel
+    '''
+    for i in xrange(min(bytesPerPixel, len(row))):
+        row[i] = (row[i] + upRow[i]) & 0xff
+    for i in xrange(bytesPerPixel, len(row)):
+        prevSample = row[i-bytesPerPixel]
+        upSample = upRow[i]
+        upPrevSample = upRow[i-bytesPerPixel]
+        pa = abs(upSample - upPrevSample)
+        pb = abs(prevSample - upPrevSample)
+        pc = abs(prevSample + upSample - 2*upPrevSample)
+        if pa <= pb and pa <= pc:
+            nearest = prevSample
+        elif pb <= pc:
+            nearest = upSample
+        else:
+            nearest = upPrevSample
+        row[i] = (row[i] + nearest) & 0xff
+
+def tiffPostPrediction(decodedStream, bytesPerRow, columns, colors, bits):
+    '''
+        Removes the TIFF prediction of the stream: each color component is the difference with the same component of the previous sample in the row
+
+        @param decodedStream: The decoded stream to be modified
+        @param bytesPerRow: Number of bytes per row
+        @param columns: Number of samples per row
+        @param colors: Number of colors per sample
+        @param bits: Number of bits per color
+        @return: A tuple (status,statusContent), where statusContent is the modified decoded stream in case status = 0 or an error in case status = -1
+    '''
+    if bits not in [1,2,4,8,16]:
+        return (-1,'Unsupported number of bits per component')
+    numRows = len(decodedStream) // bytesPerRow
+    numSamples = columns * colors
+    data = bytearray(decodedStream[:numRows*bytesPerRow])
+    if numRows == 0:
+        return (0,bytes(data))
+    if NUMPY_MODULE:
+        if bits == 8:
+            samples = numpy.frombuffer(data, dtype = numpy.uint8).reshape(numRows, columns, colors)
+            return (0,numpy.cumsum(samples, axis = 1, dtype = numpy.uint8).tobytes())
+        elif bits == 16:
+            samples = numpy.frombuffer(data, dtype = '>u2').reshape(numRows, columns, colors)
+            samples = numpy.cumsum(samples, axis = 1, dtype = numpy.uint16)
+            return (0,samples.astype('>u2').tobytes())
+        else:
+            rowBits = numpy.unpackbits(numpy.frombuffer(data, dtype = numpy.uint8).reshape(numRows, bytesPerRow), axis = 1)
+            sampleBits = rowBits[:, :numSamples*bits].reshape(numRows, columns, colors, bits)
+            weights = (1 << numpy.arange(bits-1, -1, -1)).astype(numpy.uint8)
+            samples = (sampleBits * weights).sum(axis = 3, dtype = numpy.uint8)
+            samples = numpy.cumsum(samples, axis = 1, dtype = numpy.uint8) & ((1 << bits) - 1)
+            sampleBits = (samples[..., numpy.newaxis] >> numpy.arange(bits-1, -1, -1).astype(numpy.uint8)) & 1
+            rowBits[:] = 0
+            rowBits[:, :numSamples*bits] = sampleBits.reshape(numRows, numSamples*bits)
+            return (0,numpy.packbits(rowBits, axis = 1).tobytes())
+    for rowOffset in xrange(0, len(data), bytesPerRow):
+        if bits == 8:
+            for i in xrange(rowOffset+colors, rowOffset+bytesPerRow):
+                data[i] = (data[i] + data[i-colors]) & 0xff
+        elif bits == 16:
+            samples = list(struct.unpack('>%dH' % numSamples, bytes(data[rowOffset:rowOffset+bytesPerRow])))
+            for i in xrange(colors, numSamples):
+                samples[i] = (samples[i] + samples[i-colors]) & 0xffff
+            data[rowOffset:rowOffset+bytesPerRow] = struct.pack('>%dH' % numSamples, *samples)
+        else:
+            bitmask = (1 << bits) - 1
+            samplesPerByte = 8 // bits
+            shifts = range(8-bits, -1, -bits)
+            samples = [(byte >> shift) & bitmask for byte in data[rowOffset:rowOffset+bytesPerRow] for shift in shifts]
+            for i in xrange(colors, numSamples):
+                samples[i] = (samples[i] + samples[i-colors]) & bitmask
+            for i in xrange(numSamples, len(samples)):
+                samples[i] = 0
+            for i in xrange(bytesPerRow):
+                byte = 0
+                for sample in samples[i*samplesPerByte:(i+1)*samplesPerByte]:
+                    byte = (byte << bits) | sample
+                data[rowOffset+i] = byte
+    return (0,bytes(data))
+
 def runLengthDecode(stream):
     '''
         Method to decode streams using the Run-Length algorithm
@@ -614,40 +727,64 @@ def runLengthDecode(stream):
         @param stream: A PDF stream
         @return: A tuple (status,statusContent), where statusContent is the decoded PDF stream in case status = 0 or an error in case status = -1
     '''
-    decodedStream = ''
+    data = bytearray(stream)
+    decodedStream = bytearray()
     index = 0
-    try:
-        while index < len(stream):
-            length = ord(stream[index]) 
-            if length >= 0 and length < 128:
-                decodedStream += stream[index+1:index+length+2]
-                index += length+2
-            elif length > 128 and length < 256:
-                decodedStream += stream[index+1] * (257 - length)
-                index += 2
-            else:
-                break
-    except:
-        return (-1,'Error decoding string')
-    return (0,decodedStream)
+    while index < len(data):
+        length = data[index]
+        if length < 128:
+            decodedStream += data[index+1:index+length+2]
+            index += length+2
+        elif length > 128:
+            if index+1 >= len(data):
+                return (-1,'Error decoding string')
+            decodedStream += data[index+1:index+2] * (257 - length)
+            index += 2
+        else:
+            break
+    return (0,bytes(decodedStream))
 
 def runLengthEncode(stream):
     '''
-        Method to encode streams using the Run-Length algorithm (NOT IMPLEMENTED YET)
+        Method to encode streams using the Run-Length algorithm. Runs of 3 or more equal bytes are encoded as repetitions, the rest as literals.
     
         @param stream: A PDF stream
         @return: A tuple (status,statusContent), where statusContent is the encoded PDF stream in case status = 0 or an error in case status = -1
     '''
-    encodedStream = ''
-    return (-1,'RunLengthEncode not supported yet')
+    data = bytearray(stream)
+    encodedStream = bytearray()
+    literalStart = 0
+    try:
+        for run in reRepeatedBytes.finditer(stream):
+            runStart, runEnd = run.span()
+            for chunkStart in xrange(literalStart, runStart, 128):
+                chunkEnd = min(chunkStart+128, runStart)
+                encodedStream.append(chunkEnd - chunkStart - 1)
+                encodedStream += data[chunkStart:chunkEnd]
+            runLength = runEnd - runStart
+            while runLength > 1:
+                chunkLength = min(runLength, 128)
+                encodedStream.append(257 - chunkLength)
+                encodedStream.append(data[runStart])
+                runLength -= chunkLength
+            literalStart = runEnd - runLength
+        for chunkStart in xrange(literalStart, len(data), 128):
+            chunkEnd = min(chunkStart+128, len(data))
+            encodedStream.append(chunkEnd - chunkStart - 1)
+            encodedStream += data[chunkStart:chunkEnd]
+        encodedStream.append(128)
+    except:
+        return (-1,'Error encoding string')
+    return (0,bytes(encodedStream))
 
 def ccittFaxDecode(stream, parameters):
     '''
-        Method to decode streams using the CCITT facsimile standard (NOT IMPLEMENTED YET)
+        Method to decode streams using the CCITT facsimile standard (Group 3 and Group 4)
     
         @param stream: A PDF stream
         @return: A tuple (status,statusContent), where statusContent is the decoded PDF stream in case status = 0 or an error in case status = -1
     '''
+    from ccitt import CCITTFax
     decodedStream = ''
 
     if parameters == None or parameters == {}:
@@ -662,10 +799,6 @@ def ccittFaxDecode(stream, parameters):
             k = parameters['/K'].getRawValue()
             if type(k) != int:
                 k = 0
-            else:
-                if k != 0:
-                    # Only supported "Group 3, 1-D" encoding (Pure one-dimensional encoding)
-                    return (-1,'CCITT encoding scheme not supported')
         else:
             k = 0
         # EndOfLine = A flag indicating whether end-of-line bit patterns are required to be present in the encoding.
@@ -0,0 +1,422 @@
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    This module contains the analysis service (daemon mode): a pool of warm worker processes which parse the documents received through a Unix socket or an HTTP port and return their statistics in JSON format
+
+    Requests (HTTP, also over the Unix socket):
+        POST /analyse[?name=file.pdf]   The body is the PDF document
+        GET /analyse?file=/path/to/file.pdf   The document is read by the workers from the given path, only allowed inside the directory set as fileRoot
+        GET /status   Workers, pending and running jobs and counters of the service
+'''
+
+import os, sys, stat, json, time, tempfile, threading, multiprocessing, traceback
+from PDFCore import PDFParser
+try:
+    import Queue
+except:
+    import queue as Queue
+try:
+    import resource
+except:
+    resource = None
+try:
+    import SocketServer
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from urlparse import urlparse, parse_qs
+except:
+    import socketserver as SocketServer
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+
+errorsFile = 'errors.txt'
+chunkSize = 64*1024
+
+
+def analysisWorker(jobQueue, resultQueue, memoryLimit = 0, forceMode = False, looseMode = False, manualAnalysis = False):
+    '''
+        Main loop of an analysis worker process. The modules are imported by the parent before forking, so the worker is ready to parse from the first job.
+
+        @param jobQueue: Queue where the jobs (jobId,fileName,displayName) are received. None stops the worker.
+        @param resultQueue: Queue where the results (jobId,(status,statusContent)) are sent, with the statistics in JSON format as content
+        @param memoryLimit: Maximum size of the address space of the worker in bytes. By default: 0 (no limit).
+        @param forceMode: Boolean to specify if ignore errors or not. By default: False.
+        @param looseMode: Boolean to set the loose mode when parsing objects. By default: False.
+        @param manualAnalysis: Boolean to avoid the automatic Javascript analysis. By default: False.
+    '''
+    if memoryLimit > 0 and resource != None:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memoryLimit, memoryLimit))
+        except:
+            pass
+    while True:
+        job = jobQueue.get()
+        if job == None:
+            break
+        jobId, fileName, displayName = job
+        pdf = None
+        try:
+            ret, pdf = PDFParser().parse(fileName, forceMode, looseMode, manualAnalysis)
+            statsDict = pdf.getStats()
+            if displayName != None:
+                statsDict['File'] = displayName
+            try:
+                result = (0, json.dumps(statsDict, sort_keys = True, default = str))
+            except UnicodeDecodeError:
+                # Names and strings with bytes which are not UTF-8
+                result = (0, json.dumps(statsDict, sort_keys = True, default = str, encoding = 'latin-1'))
+        except MemoryError:
+            result = (-1, 'Memory limit exceeded while parsing the file')
+        except:
+            traceback.print_exc(file=open(errorsFile,'a'))
+            result = (-1, 'Exception while parsing the file: ' + str(sys.exc_info()[1]))
+        pdf = None
+        resultQueue.put((jobId, result))
+
+
+class PDFAnalysisJob :
+    '''
+        Pending analysis sent to a PDFAnalysisPool
+    '''
+    def __init__(self, jobId, fileName, displayName = None, callback = None):
+        self.id = jobId
+        self.fileName = fileName
+        self.displayName = displayName
+        self.callback = callback
+        self.result = None
+        self.timedOut = False
+        self.event = threading.Event()
+
+    def getResult(self, timeout = None):
+        '''
+            Waits for the analysis to finish and returns its result
+
+            @param timeout: Maximum number of seconds to wait. By default: None (wait forever).
+            @return: A tuple (status,statusContent), where statusContent is the JSON statistics of the file or an error message, or None if the timeout expires
+        '''
+        self.event.wait(timeout)
+        return self.result
+
+    def isReady(self):
+        return self.event.is_set()
+
+    def setResult(self, result, timedOut = False):
+        self.result = result
+        self.timedOut = timedOut
+        self.event.set()
+        if self.callback != None:
+            try:
+                self.callback(self)
+            except:
+                traceback.print_exc(file=open(errorsFile,'a'))
+
+
+class PDFAnalysisPool :
+    '''
+        Pool of warm worker processes which parse PDF files, with a bounded queue of pending jobs and time and memory limits per job
+    '''
+    def __init__(self, numWorkers = None, maxPending = None, timeout = 60, memoryLimit = 1024*1024*1024, forceMode = False, looseMode = False, manualAnalysis = False):
+        '''
+            Constructor of a PDFAnalysisPool
+
+            @param numWorkers: Number of worker processes, that is, the maximum number of files parsed at the same time. By default: None (number of CPUs).
+            @param maxPending: Maximum number of jobs waiting for a worker, new jobs are rejected when it is reached. By default: None (twice the number of workers).
+            @param timeout: Maximum number of seconds of wall time per job, the worker is killed and replaced after it. By default: 60.
+            @param memoryLimit: Maximum size of the address space of each worker in bytes. By default: 1GB.
+            @param forceMode: Boolean to specify if ignore errors or not. By default: False.
+            @param looseMode: Boolean to set the loose mode when parsing objects. By default: False.
+            @param manualAnalysis: Boolean to avoid the automatic Javascript analysis. By default: False.
+        '''
+        if numWorkers == None:
+            try:
+                numWorkers = multiprocessing.cpu_count()
+            except:
+                numWorkers = 1
+        self.numWorkers = max(1, numWorkers)
+        if maxPending == None:
+            maxPending = 2*self.numWorkers
+        self.maxPending = max(0, maxPending)
+        self.timeout = timeout
+        self.memoryLimit = memoryLimit
+        self.workerOptions = (forceMode, looseMode, manualAnalysis)
+        self.nextJobId = 0
+        self.pendingJobs = []
+        self.runningJobs = {}
+        self.workers = []
+        self.counters = {'completed': 0, 'failed': 0, 'rejected': 0, 'timed out': 0, 'restarts': 0}
+        self.lock = threading.Lock()
+        self.resultQueue = multiprocessing.Queue()
+        self.closed = False
+        for i in range(self.numWorkers):
+            self.workers.append(self.startWorker())
+        self.dispatcher = threading.Thread(target = self.dispatch)
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+
+    def close(self):
+        '''
+            Stops the workers once the pending jobs have finished
+        '''
+        while True:
+            self.lock.acquire()
+            busy = self.pendingJobs != [] or self.runningJobs != {}
+            self.lock.release()
+            if not busy:
+                break
+            time.sleep(0.05)
+        self.closed = True
+        for worker in self.workers:
+            worker[1].put(None)
+        for worker in self.workers:
+            worker[0].join(1)
+            if worker[0].is_alive():
+                worker[0].terminate()
+
+    def dispatch(self):
+        '''
+            Loop run by the dispatcher thread: assigns pending jobs to idle workers, collects the results and kills the workers exceeding the time limit or dying
+        '''
+        while not self.closed:
+            try:
+                jobId, result = self.resultQueue.get(True, 0.05)
+            except Queue.Empty:
+                jobId = None
+            except:
+                jobId = None
+            self.lock.acquire()
+            try:
+                finishedJobs = []
+                if jobId != None and jobId in self.runningJobs:
+                    job, workerIndex, startTime = self.runningJobs.pop(jobId)
+                    finishedJobs.append((job, result, False))
+                    if result[0] == -1:
+                        self.counters['failed'] += 1
+                    else:
+                        self.counters['completed'] += 1
+                now = time.time()
+                for runningId in list(self.runningJobs.keys()):
+                    job, workerIndex, startTime = self.runningJobs[runningId]
+                    process = self.workers[workerIndex][0]
+                    timedOut = self.timeout > 0 and now - startTime > self.timeout
+                    if timedOut:
+                        errorMessage = 'Analysis timed out after '+str(self.timeout)+' seconds'
+                        self.counters['timed out'] += 1
+                    elif not process.is_alive():
+                        errorMessage = 'Analysis worker died (exit code '+str(process.exitcode)+')'
+                        self.counters['failed'] += 1
+                    else:
+                        continue
+                    if process.is_alive():
+                        process.terminate()
+                    process.join()
+                    self.workers[workerIndex] = self.startWorker()
+                    self.counters['restarts'] += 1
+                    del(self.runningJobs[runningId])
+                    finishedJobs.append((job, (-1, errorMessage), timedOut))
+                busyWorkers = [running[1] for running in self.runningJobs.values()]
+                for workerIndex in range(len(self.workers)):
+                    if self.pendingJobs == []:
+                        break
+                    if workerIndex not in busyWorkers:
+                        job = self.pendingJobs.pop(0)
+                        self.workers[workerIndex][1].put((job.id, job.fileName, job.displayName))
+                        self.runningJobs[job.id] = (job, workerIndex, time.time())
+            finally:
+                self.lock.release()
+            for job, result, timedOut in finishedJobs:
+                job.setResult(result, timedOut)
+
+    def getStatus(self):
+        '''
+            Gets the state of the pool
+
+            @return: A dictionary with the number of workers, the running and pending jobs, the limits and the counters of finished jobs
+        '''
+        self.lock.acquire()
+        try:
+            status = {'workers': self.numWorkers, 'running': len(self.runningJobs), 'pending': len(self.pendingJobs),
+                      'max pending': self.maxPending, 'timeout': self.timeout}
+            status.update(self.counters)
+        finally:
+            self.lock.release()
+        return status
+
+    def startWorker(self):
+        jobQueue = multiprocessing.Queue()
+        process = multiprocessing.Process(target = analysisWorker, args = (jobQueue, self.resultQueue, self.memoryLimit) + self.workerOptions)
+        process.daemon = True
+        process.start()
+        return [process, jobQueue]
+
+    def submit(self, fileName, displayName = None, callback = None):
+        '''
+            Queues the given file to be parsed by the workers, unless all the workers are busy and the queue of pending jobs is full
+
+            @param fileName: The path of the file
+            @param displayName: The file name shown in the statistics instead of the path. By default: None.
+            @param callback: Function called with the PDFAnalysisJob as argument when the analysis finishes. By default: None.
+            @return: A PDFAnalysisJob instance to retrieve the result asynchronously or None if the job has been rejected
+        '''
+        self.lock.acquire()
+        try:
+            if self.closed or len(self.runningJobs) + len(self.pendingJobs) >= self.numWorkers + self.maxPending:
+                self.counters['rejected'] += 1
+                return None
+            job = PDFAnalysisJob(self.nextJobId, fileName, displayName, callback)
+            self.nextJobId += 1
+            self.pendingJobs.append(job)
+        finally:
+            self.lock.release()
+        return job
+
+
+class PDFServiceHandler(BaseHTTPRequestHandler):
+    '''
+        Handler of the requests of the analysis service
+    '''
+    server_version = 'ParanoiDF'
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/status':
+            self.sendResponse(200, json.dumps(self.server.pool.getStatus(), sort_keys = True))
+        elif url.path == '/analyse':
+            fileName = parse_qs(url.query).get('file', [None])[0]
+            if fileName == None:
+                self.sendError(400, 'Missing "file" parameter')
+            elif self.server.fileRoot == None:
+                self.sendError(403, 'The analysis of local files is disabled')
+            else:
+                filePath = os.path.realpath(os.path.join(self.server.fileRoot, fileName))
+                if not filePath.startswith(os.path.join(self.server.fileRoot, '')):
+                    self.sendError(403, 'The file "'+fileName+'" is outside the allowed directory')
+                elif not os.path.isfile(filePath):
+                    self.sendError(404, 'The file "'+fileName+'" does not exist')
+                else:
+                    self.analyse(filePath, None)
+        else:
+            self.sendError(404, 'Unknown request')
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/analyse':
+            self.sendError(404, 'Unknown request')
+            return
+        try:
+            length = int(self.headers.get('Content-Length'))
+        except:
+            self.sendError(411, 'Missing "Content-Length" header')
+            return
+        if self.server.maxSize > 0 and length > self.server.maxSize:
+            self.sendError(413, 'The file is bigger than '+str(self.server.maxSize)+' bytes')
+            return
+        displayName = parse_qs(url.query).get('name', ['upload.pdf'])[0]
+        # The body is spooled to disk, the workers read it from there
+        fileDescriptor, fileName = tempfile.mkstemp(suffix = '.pdf')
+        try:
+            tempFile = os.fdopen(fileDescriptor, 'wb')
+            try:
+                while length > 0:
+                    chunk = self.rfile.read(min(chunkSize, length))
+                    if not chunk:
+                        break
+                    tempFile.write(chunk)
+                    length -= len(chunk)
+            finally:
+                tempFile.close()
+            if length > 0:
+                self.sendError(400, 'Incomplete request body')
+            else:
+                self.analyse(fileName, os.path.basename(displayName))
+        finally:
+            os.remove(fileName)
+
+    def analyse(self, fileName, displayName):
+        job = self.server.pool.submit(fileName, displayName)
+        if job == None:
+            self.sendError(503, 'All the workers are busy, try again later', {'Retry-After': '1'})
+            return
+        status, statusContent = job.getResult()
+        if status == 0:
+            self.sendResponse(200, statusContent)
+        elif job.timedOut:
+            self.sendError(504, statusContent)
+        else:
+            self.sendError(500, statusContent)
+
+    def sendError(self, code, message, headers = {}):
+        self.sendResponse(code, json.dumps({'Error': message}), headers)
+
+    def sendResponse(self, code, content, headers = {}):
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for header in headers:
+            self.send_header(header, headers[header])
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class PDFServiceHTTPServer(SocketServer.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class PDFServiceUnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def startService(address, pool, maxSize = 0, verbose = False, fileRoot = None):
+    '''
+        Creates the server of the analysis service, listening on a Unix socket or an HTTP port
+
+        @param address: The path of the Unix socket, or the port ([host:]port) to listen on. The host is 127.0.0.1 by default.
+        @param pool: The PDFAnalysisPool which parses the files
+        @param maxSize: Maximum size of the files sent in the requests in bytes. By default: 0 (no limit).
+        @param verbose: Boolean to log the requests in the standard error. By default: False.
+        @param fileRoot: Directory whose files can be analysed by path (GET /analyse?file=), relative paths are resolved inside it. By default: None (disabled).
+        @return: A tuple (status,statusContent), where statusContent is the server, ready to serve_forever(), or an error message
+    '''
+    host, separator, port = address.rpartition(':')
+    try:
+        if port.isdigit():
+            server = PDFServiceHTTPServer((host or '127.0.0.1', int(port)), PDFServiceHandler)
+        else:
+            # Stale socket of a previous run
+            if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+                os.remove(address)
+            server = PDFServiceUnixServer(address, PDFServiceHandler)
+            os.chmod(address, 0o660)
+    except Exception as e:
+        return (-1, 'Unable to listen on "'+address+'": '+str(e))
+    server.pool = pool
+    server.maxSize = maxSize
+    server.verbose = verbose
+    if fileRoot != None:
+        fileRoot = os.path.realpath(fileRoot)
+    server.fileRoot = fileRoot
+    return (0, server)
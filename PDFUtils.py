@@ -40,7 +40,24 @@
     Module with some misc functions
 '''
 
-import os, re, html, json, urllib, urllib3, html_parser
+import os, re, html, json, threading, time, hashlib
+from collections import OrderedDict, deque
+try:
+    from importlib.util import find_spec
+except:
+    import imp
+    find_spec = None
+
+try:
+    import ssdeep
+    SSDEEP_MODULE = True
+except:
+    SSDEEP_MODULE = False
+
+hashAlgorithms = ['md5','sha1','sha256']
+hashChunkSize = 1024 * 1024
+vtReportUrl = 'https://www.virustotal.com/vtapi/v2/file/report'
+vtService = None
 
 def clearScreen():
 	'''
@@ -304,6 +321,76 @@ def getBytesFromFile(filename, offset, numBytes):
     else:
         return (-1,'File does not exist')
 
+def hashContent(content, algorithms = hashAlgorithms):
+    '''
+        Computes several digests of a content in one read, feeding each chunk to all the hash functions while it is in the cache
+        
+        @param content: The content to be hashed (string)
+        @param algorithms: List of algorithms supported by hashlib, plus 'ssdeep' if the ssdeep module is installed. By default: MD5, SHA1 and SHA256.
+        @return: A tuple (status,statusContent), where statusContent is a dictionary with the algorithms as keys and the hexadecimal digests as values in case status = 0 or an error in case status = -1
+    '''
+    hashes = []
+    for algorithm in algorithms:
+        if algorithm == 'ssdeep':
+            if not SSDEEP_MODULE:
+                return (-1,'The ssdeep module is not installed')
+            hashes.append((algorithm, ssdeep.Hash()))
+        else:
+            try:
+                hashes.append((algorithm, hashlib.new(algorithm)))
+            except ValueError:
+                return (-1,'Unsupported hash algorithm "'+str(algorithm)+'"')
+    if not isinstance(content, bytes):
+        # Text is hashed as UTF-8, the bytes are hashed as they are
+        content = content.encode('utf-8')
+    if len(content) <= hashChunkSize:
+        for algorithm, hashObject in hashes:
+            hashObject.update(content)
+    else:
+        contentView = memoryview(content)
+        for offset in range(0, len(content), hashChunkSize):
+            chunk = contentView[offset:offset+hashChunkSize]
+            for algorithm, hashObject in hashes:
+                if algorithm == 'ssdeep':
+                    hashObject.update(chunk.tobytes())
+                else:
+                    hashObject.update(chunk)
+    digests = {}
+    for algorithm, hashObject in hashes:
+        digests[algorithm] = hashObject.digest() if algorithm == 'ssdeep' else hashObject.hexdigest()
+    return (0,digests)
+
+def hashContents(contents, algorithms = hashAlgorithms, numThreads = 4):
+    '''
+        Computes several digests of a list of contents with a pool of threads (hashlib releases the GIL for big contents)
+        
+        @param contents: List of contents to be hashed (strings), or functions returning them, which are called by the threads so only the contents being hashed are kept in memory
+        @param algorithms: List of algorithms, see hashContent. By default: MD5, SHA1 and SHA256.
+        @param numThreads: Number of threads. By default: 4.
+        @return: A tuple (status,statusContent), where statusContent is a list with the digests dictionaries of the contents (in the same order) in case status = 0 or an error in case status = -1
+    '''
+    results = [None] * len(contents)
+    
+    def hashWorker(first, step):
+        for i in range(first, len(contents), step):
+            content = contents[i]
+            if callable(content):
+                content = content()
+            results[i] = hashContent(content, algorithms)
+    
+    if numThreads <= 1 or len(contents) <= 1:
+        hashWorker(0, 1)
+    else:
+        threads = [threading.Thread(target = hashWorker, args = (first, numThreads)) for first in range(numThreads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    for ret in results:
+        if ret[0] == -1:
+            return ret
+    return (0,[ret[1] for ret in results])
+
 def hexToString(hexString):
 	'''
 		Simple method to convert an hexadecimal string to ascii string
@@ -321,6 +408,21 @@ def hexToString(hexString):
 		return (-1,'Error in hexadecimal conversion')
 	return (0,string)
 
+def isModuleAvailable(moduleName):
+    '''
+        Checks if a module is installed without importing it, so heavy optional modules can be loaded only when they are needed
+        
+        @param moduleName: The name of a top level module
+        @return: A boolean
+    '''
+    if find_spec != None:
+        return find_spec(moduleName) != None
+    try:
+        imp.find_module(moduleName)
+        return True
+    except ImportError:
+        return False
+
 def numToHex(num, numBytes):
     '''
         Given a number returns its hexadecimal format with the specified length, adding '\0' if necessary
@@ -432,23 +534,329 @@ def unescapeString(string):
     
 def vtcheck(md5, vtKey):
     '''
-        Function to check a hash on VirusTotal and get the report summary
+        Function to check a hash on VirusTotal and get the report summary. The lookup goes through the shared VTLookupService, so it is cached and rate limited.
         
         @param md5: The MD5 to check (hexdigest)
         @param vtKey: The VirusTotal API key needed to perform the request
         @return: A dictionary with the result of the request
     '''
-    vtUrl = 'https://www.virustotal.com/vtapi/v2/file/report'
-    parameters = {'resource':md5,'apikey':vtKey}
+    return getVTLookupService(vtKey).submit(md5).getResult()
+
+def vtRequest(resources, vtKey, url = vtReportUrl, timeout = 30):
+    '''
+        Function to request the report summaries of several hashes to VirusTotal in a single request
+        
+        @param resources: List of hashes (hexdigest)
+        @param vtKey: The VirusTotal API key needed to perform the request
+        @param url: The URL of the VirusTotal file report API. By default: vtReportUrl.
+        @param timeout: Maximum number of seconds to wait for the response. By default: 30.
+        @return: A tuple (status,statusContent), where statusContent is a list with the dictionary of each resource in case status = 0, the string 'Rate limit exceeded' in case status = 1 or an error message in case status = -1
+    '''
+    # The HTTP stack is only loaded when VirusTotal is queried
+    import urllib
+    try:
+        import urllib2
+    except:
+        import urllib.request as urllib2
+    parameters = {'resource':','.join(resources),'apikey':vtKey}
     try:
         data = urllib.urlencode(parameters)
-        req = urllib3.Request(vtUrl, data)
-        response = urllib3.urlopen(req)
+        response = urllib2.urlopen(url, data, timeout)
+        responseCode = response.getcode()
         jsonResponse = response.read()
+    except urllib2.HTTPError as error:
+        if error.code == 204:
+            return (1, 'Rate limit exceeded')
+        return (-1, 'The request to VirusTotal has not been successful')
     except:
         return (-1, 'The request to VirusTotal has not been successful')
+    if responseCode == 204:
+        return (1, 'Rate limit exceeded')
     try:
-        jsonDict = json.loads(jsonResponse)
+        jsonResponse = json.loads(jsonResponse)
     except:
         return (-1, 'An error has occurred while parsing the JSON response from VirusTotal')
-    return (0, jsonDict)
+    if isinstance(jsonResponse, dict):
+        jsonResponse = [jsonResponse]
+    if not isinstance(jsonResponse, list) or len(jsonResponse) != len(resources):
+        return (-1, 'Bad response from VirusTotal')
+    return (0, jsonResponse)
+
+def getVTLookupService(vtKey):
+    '''
+        Gets the VTLookupService shared by the whole process, creating it with the default settings if it does not exist (or with the same settings if it uses another API key)
+        
+        @param vtKey: The VirusTotal API key
+        @return: The VTLookupService instance
+    '''
+    global vtService
+    if vtService == None:
+        enableVTLookupService(vtKey)
+    elif vtService.vtKey != vtKey:
+        enableVTLookupService(vtKey, vtService.cacheDir, vtService.cacheTTL, vtService.requestsPerMinute, vtService.batchSize, vtService.url)
+    return vtService
+
+def enableVTLookupService(vtKey, cacheDir = None, cacheTTL = 86400, requestsPerMinute = 4, batchSize = 4, url = vtReportUrl):
+    '''
+        Creates the VTLookupService shared by the whole process, replacing the existing one
+        
+        @param vtKey: The VirusTotal API key
+        @param cacheDir: Directory where the reports are also stored to be reused between executions. By default: None (memory only).
+        @param cacheTTL: Number of seconds a report is reused before asking VirusTotal again. By default: 86400 (one day).
+        @param requestsPerMinute: Maximum number of requests sent to VirusTotal per minute, 0 for no limit. By default: 4 (public API quota).
+        @param batchSize: Maximum number of hashes per request. By default: 4 (public API limit).
+        @param url: The URL of the VirusTotal file report API, it can point to a local server for testing. By default: vtReportUrl.
+        @return: The VTLookupService instance
+    '''
+    global vtService
+    if vtService != None:
+        vtService.close()
+    vtService = VTLookupService(vtKey, cacheDir, cacheTTL, requestsPerMinute, batchSize, url)
+    return vtService
+
+
+class VTLookupJob :
+    '''
+        Pending VirusTotal lookup of a hash sent to a VTLookupService
+    '''
+    def __init__(self, resource, callback = None):
+        self.resource = resource
+        self.callback = callback
+        self.result = None
+        self.event = threading.Event()
+    
+    def getResult(self, timeout = None):
+        '''
+            Waits for the lookup to finish and returns its result
+            
+            @param timeout: Maximum number of seconds to wait. By default: None (wait forever).
+            @return: A tuple (status,statusContent), where statusContent is the dictionary returned by VirusTotal in case status = 0 or an error message in case status = -1. None if the timeout expires.
+        '''
+        self.event.wait(timeout)
+        return self.result
+    
+    def isReady(self):
+        return self.event.is_set()
+    
+    def setResult(self, result):
+        self.result = result
+        self.event.set()
+        if self.callback != None:
+            try:
+                self.callback(self)
+            except:
+                pass
+
+
+class VTLookupService :
+    '''
+        Asynchronous VirusTotal lookups: the hashes are queued, sent in batches by a background thread within a requests per minute budget, and the reports are cached in memory and on disk with a time to live
+    '''
+    def __init__(self, vtKey, cacheDir = None, cacheTTL = 86400, requestsPerMinute = 4, batchSize = 4, url = vtReportUrl, batchDelay = 0.1, maxRetries = 3):
+        '''
+            Constructor of a VTLookupService
+            
+            @param vtKey: The VirusTotal API key
+            @param cacheDir: Directory where the reports are also stored. By default: None (memory only).
+            @param cacheTTL: Number of seconds a report is reused. By default: 86400 (one day).
+            @param requestsPerMinute: Maximum number of requests per minute, 0 for no limit. By default: 4.
+            @param batchSize: Maximum number of hashes per request. By default: 4.
+            @param url: The URL of the VirusTotal file report API. By default: vtReportUrl.
+            @param batchDelay: Number of seconds to wait for more hashes before sending an incomplete batch. By default: 0.1.
+            @param maxRetries: Number of times a batch is sent again when VirusTotal answers that the quota is exceeded. By default: 3.
+        '''
+        self.vtKey = vtKey
+        self.cacheDir = cacheDir
+        self.cacheTTL = cacheTTL
+        self.requestsPerMinute = requestsPerMinute
+        self.batchSize = max(1, batchSize)
+        self.url = url
+        self.batchDelay = batchDelay
+        self.maxRetries = maxRetries
+        self.cache = {}
+        self.pendingJobs = OrderedDict()
+        self.requestTimes = deque()
+        self.numRequests = 0
+        self.hits = 0
+        self.misses = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        if cacheDir != None and not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        self.thread = threading.Thread(target = self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def close(self):
+        '''
+            Stops the background thread once the pending lookups have finished
+        '''
+        self.condition.acquire()
+        self.closed = True
+        self.condition.notify()
+        self.condition.release()
+        self.thread.join()
+    
+    def getCachedReport(self, resource):
+        '''
+            Gets the stored report of a hash if it has not expired
+            
+            @param resource: The hash (hexdigest)
+            @return: The dictionary returned by VirusTotal or None if it is not cached
+        '''
+        entry = self.cache.get(resource)
+        if entry == None and self.cacheDir != None:
+            try:
+                cacheFile = open(os.path.join(self.cacheDir, resource + '.json'), 'rb')
+                entry = json.loads(cacheFile.read())
+                cacheFile.close()
+                self.cache[resource] = entry
+            except:
+                entry = None
+        if entry == None or time.time() - entry['time'] > self.cacheTTL:
+            return None
+        return entry['report']
+    
+    def getRateLimitDelay(self):
+        '''
+            Gets the number of seconds to wait before sending the next request within the requests per minute budget
+        '''
+        if self.requestsPerMinute <= 0:
+            return 0
+        now = time.time()
+        while self.requestTimes and now - self.requestTimes[0] >= 60:
+            self.requestTimes.popleft()
+        if len(self.requestTimes) < self.requestsPerMinute:
+            return 0
+        return 60 - (now - self.requestTimes[0])
+    
+    def lookup(self, resources, timeout = None):
+        '''
+            Looks up several hashes, sending them in as few requests as possible
+            
+            @param resources: List of hashes (hexdigest)
+            @param timeout: Maximum number of seconds to wait for all the results. By default: None (wait forever).
+            @return: A dictionary with the hashes as keys and the (status,statusContent) tuples as values (None for the lookups not finished before the timeout)
+        '''
+        jobs = [self.submit(resource) for resource in resources]
+        if timeout != None:
+            deadline = time.time() + timeout
+        results = {}
+        for job in jobs:
+            if timeout != None:
+                results[job.resource] = job.getResult(max(0, deadline - time.time()))
+            else:
+                results[job.resource] = job.getResult()
+        return results
+    
+    def run(self):
+        '''
+            Loop run by the background thread: groups the pending hashes in batches, sends them when the rate limit allows it and delivers the results
+        '''
+        retries = 0
+        while True:
+            self.condition.acquire()
+            try:
+                while not self.pendingJobs and not self.closed:
+                    self.condition.wait(1)
+                if not self.pendingJobs:
+                    return
+                numPending = len(self.pendingJobs)
+            finally:
+                self.condition.release()
+            delay = self.getRateLimitDelay()
+            if delay > 0:
+                time.sleep(min(delay, 1))
+                continue
+            if numPending < self.batchSize and self.batchDelay > 0:
+                time.sleep(self.batchDelay)
+            self.condition.acquire()
+            try:
+                resources = list(self.pendingJobs.keys())[:self.batchSize]
+            finally:
+                self.condition.release()
+            self.requestTimes.append(time.time())
+            self.numRequests += 1
+            ret = vtRequest(resources, self.vtKey, self.url)
+            if ret[0] == 1 and retries < self.maxRetries:
+                # Quota exceeded, the batch stays queued until the next minute
+                retries += 1
+                self.requestTimes.clear()
+                self.requestTimes.extend([time.time()] * max(1, self.requestsPerMinute))
+                continue
+            retries = 0
+            finishedJobs = []
+            self.condition.acquire()
+            try:
+                for i in range(len(resources)):
+                    jobs = self.pendingJobs.pop(resources[i])
+                    if ret[0] == 0:
+                        result = (0, ret[1][i])
+                    elif ret[0] == 1:
+                        result = (-1, 'The VirusTotal quota has been exceeded')
+                    else:
+                        result = (-1, ret[1])
+                    finishedJobs.append((jobs, result))
+            finally:
+                self.condition.release()
+            for jobs, result in finishedJobs:
+                if result[0] == 0 and isinstance(result[1], dict) and result[1].get('response_code') in [0, 1]:
+                    self.storeReport(jobs[0].resource, result[1])
+                for job in jobs:
+                    job.setResult(result)
+    
+    def storeReport(self, resource, report):
+        '''
+            Stores the report of a hash in memory and on disk
+            
+            @param resource: The hash (hexdigest)
+            @param report: The dictionary returned by VirusTotal
+        '''
+        entry = {'time':time.time(), 'report':report}
+        self.cache[resource] = entry
+        if self.cacheDir != None:
+            cachePath = os.path.join(self.cacheDir, resource + '.json')
+            tempPath = cachePath + '.' + str(os.getpid()) + '.tmp'
+            try:
+                cacheFile = open(tempPath, 'wb')
+                cacheFile.write(json.dumps(entry))
+                cacheFile.close()
+                os.rename(tempPath, cachePath)
+            except:
+                if os.path.exists(tempPath):
+                    os.remove(tempPath)
+    
+    def submit(self, resource, callback = None):
+        '''
+            Queues the lookup of a hash, answering from the cache if possible
+            
+            @param resource: The hash (hexdigest)
+            @param callback: Function called with the VTLookupJob as argument when the lookup finishes. By default: None.
+            @return: A VTLookupJob instance to retrieve the result asynchronously
+        '''
+        resource = resource.lower()
+        job = VTLookupJob(resource, callback)
+        if not re.match('^[0-9a-f]+$', resource):
+            job.setResult((-1, 'The resource is not a valid hash'))
+            return job
+        report = self.getCachedReport(resource)
+        if report != None:
+            self.hits += 1
+            job.setResult((0, report))
+            return job
+        self.misses += 1
+        self.condition.acquire()
+        try:
+            closed = self.closed
+            if closed:
+                pass
+            elif resource in self.pendingJobs:
+                self.pendingJobs[resource].append(job)
+            else:
+                self.pendingJobs[resource] = [job]
+                self.condition.notify()
+        finally:
+            self.condition.release()
+        if closed:
+            job.setResult((-1, 'The VirusTotal lookup service has been closed'))
+        return job
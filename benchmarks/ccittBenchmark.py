@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Benchmark of the CCITT decoder (ccitt.CCITTFax) over a corpus of synthetic fax pages, compared with the former pdfminer decoder.
+    Pages are encoded as Group 4 and, to check the other schemes, as Group 3 one-dimensional and mixed; every page must decode back to the original bitmap.
+
+    Usage: python benchmarks/ccittBenchmark.py [pages] [columns] [rows]
+'''
+
+import os, random, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ccitt import CCITTFax
+from pdfminer.ccitt import CCITTFaxDecoder
+
+EOL = (1, 12)
+
+def makePage(columns, rows):
+    '''
+        Builds a page looking like a scanned document: lines of text made of random black strokes, with some noise
+
+        @param columns: Width of the page in pixels
+        @param rows: Height of the page in pixels
+        @return: A list of rows, each one a list of changing elements (the position where each run ends, beginning with a white run)
+    '''
+    page = []
+    strokes = []
+    for y in range(rows):
+        if y % 40 == 0:
+            strokes = []
+            x = random.randint(20, 200)
+            while x < columns - 200 and random.random() > 0.01:
+                end = x + random.randint(10, 120)
+                while x < end:
+                    length = random.randint(1, 6)
+                    top = random.randint(0, 20)
+                    strokes.append((x, min(x + length, end), top, top + random.randint(2, 20)))
+                    x += length + random.randint(1, 4)
+                x += random.randint(4, 40)
+        runs = [(start, end) for start, end, top, bottom in strokes if top <= y % 40 < bottom]
+        line = []
+        for start, end in sorted(runs):
+            if line and start <= line[-1]:
+                line[-1] = max(line[-1], end)
+            else:
+                line += [start, end]
+        page.append(line + [columns])
+    return page
+
+def encodeRun(codes, run, table):
+    '''
+        Appends the makeup and terminating codes of a run
+    '''
+    while run > 2560:
+        codes.append(CCITTFax.WHITE_CONFIGURATION_ENCODE_TABLE[2560])
+        run -= 2560
+    if run >= 64:
+        codes.append(table[0][run - run % 64])
+        run %= 64
+    codes.append(table[1][run])
+
+def encode1DLine(codes, line):
+    '''
+        Appends the codes of a line with one-dimensional coding
+    '''
+    tables = [(CCITTFax.WHITE_CONFIGURATION_ENCODE_TABLE, CCITTFax.WHITE_TERMINAL_ENCODE_TABLE), (CCITTFax.BLACK_CONFIGURATION_ENCODE_TABLE, CCITTFax.BLACK_TERMINAL_ENCODE_TABLE)]
+    start = 0
+    for i, end in enumerate(line):
+        encodeRun(codes, end - start, tables[i & 1])
+        start = end
+
+def encode2DLine(codes, line, refLine, columns):
+    '''
+        Appends the codes of a line with two-dimensional coding, using the previous line as reference
+    '''
+    tables = [(CCITTFax.WHITE_CONFIGURATION_ENCODE_TABLE, CCITTFax.WHITE_TERMINAL_ENCODE_TABLE), (CCITTFax.BLACK_CONFIGURATION_ENCODE_TABLE, CCITTFax.BLACK_TERMINAL_ENCODE_TABLE)]
+    modes = CCITTFax.MODE_ENCODE_TABLE
+    line = line + [columns, columns]
+    ref = refLine + [columns, columns, columns]
+    a0, color = -1, 0
+    while a0 < columns:
+        a = 0
+        while line[a] <= a0 or a & 1 != color:
+            a += 1
+        b = 0
+        while ref[b] <= a0 or b & 1 != color:
+            b += 1
+        a1, a2, b1, b2 = line[a], line[a + 1], ref[b], ref[b + 1]
+        if b2 < a1:
+            codes.append(modes[CCITTFax.MODE_PASS])
+            a0 = b2
+        elif abs(a1 - b1) <= 3:
+            codes.append(modes[a1 - b1])
+            a0 = a1
+            color ^= 1
+        else:
+            codes.append(modes[CCITTFax.MODE_HORIZONTAL])
+            encodeRun(codes, a1 - max(a0, 0), tables[color])
+            encodeRun(codes, a2 - a1, tables[color ^ 1])
+            a0 = a2
+
+def packCodes(codes):
+    '''
+        Packs a list of (code, length) tuples in a stream, padding the last byte with zeros
+    '''
+    output = bytearray()
+    bitBuffer, bitCount = 0, 0
+    for code, length in codes:
+        bitBuffer = (bitBuffer << length) | code
+        bitCount += length
+        while bitCount >= 8:
+            bitCount -= 8
+            output.append((bitBuffer >> bitCount) & 0xff)
+        bitBuffer &= (1 << bitCount) - 1
+    if bitCount:
+        output.append((bitBuffer << (8 - bitCount)) & 0xff)
+    return bytes(output)
+
+def encodePage(page, columns, k):
+    '''
+        Encodes a page with the given CCITT scheme (the K parameter of /CCITTFaxDecode)
+
+        @param page: A list of rows returned by makePage
+        @param columns: Width of the page in pixels
+        @param k: The encoding scheme, < 0 for Group 4, 0 for Group 3 one-dimensional and > 0 for Group 3 mixed
+        @return: The encoded page (string)
+    '''
+    codes = []
+    refLine = [columns]
+    for y, line in enumerate(page):
+        if k < 0:
+            encode2DLine(codes, line, refLine, columns)
+        else:
+            codes.append(EOL)
+            if k > 0:
+                codes.append((0 if y % k else 1, 1))
+            if k > 0 and y % k:
+                encode2DLine(codes, line, refLine, columns)
+            else:
+                encode1DLine(codes, line)
+        refLine = line
+    if k < 0:
+        codes += [EOL, EOL]
+    else:
+        codes += [EOL] * 6
+    return packCodes(codes)
+
+def renderPage(page, columns):
+    '''
+        Builds the bitmap of a page, as returned by the decoders (white pixels are 1)
+    '''
+    output = bytearray()
+    for line in page:
+        bits = ''
+        start = 0
+        for i, end in enumerate(line):
+            bits += ('1' if i & 1 == 0 else '0') * (end - start)
+            start = end
+        bits += '0' * (-columns % 8)
+        output += bytearray([int(bits[i:i + 8], 2) for i in range(0, len(bits), 8)])
+    return bytes(output)
+
+def legacyCCITTDecode(stream, columns):
+    '''
+        Former Group 4 decoder of pdfminer (pdfminer.ccitt.CCITTFaxDecoder), kept as reference
+    '''
+    parser = CCITTFaxDecoder(columns)
+    parser.feedbytes(stream)
+    return parser.close()
+
+def timeIt(function, *args):
+    start = time.time()
+    ret = function(*args)
+    return time.time() - start, ret
+
+if __name__ == '__main__':
+    numPages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 1728
+    rows = int(sys.argv[3]) if len(sys.argv) > 3 else 2200
+    random.seed(0)
+    pages = [makePage(columns, rows) for i in range(numPages)]
+    bitmaps = [renderPage(page, columns) for page in pages]
+    print('%8s %6s %12s %11s %11s %11s' % ('scheme', 'pages', 'encoded (KB)', 'decode (s)', 'legacy (s)', 'speedup'))
+    for name, k in [('G4', -1), ('G3 1D', 0), ('G3 2D', 4)]:
+        streams = [encodePage(page, columns, k) for page in pages]
+        decodeTime = 0
+        for stream, bitmap in zip(streams, bitmaps):
+            pageTime, decoded = timeIt(CCITTFax().decode, stream, k, False, False, columns, rows)
+            if decoded != bitmap:
+                sys.exit('Error: wrong decoded page with K = '+str(k)+'!!')
+            decodeTime += pageTime
+        legacyTime = '-'
+        speedup = '-'
+        if k < 0:
+            legacyTime = 0
+            for stream, bitmap in zip(streams, bitmaps):
+                pageTime, decoded = timeIt(legacyCCITTDecode, stream, columns)
+                if decoded != bitmap:
+                    sys.exit('Error: wrong decoded page with the former decoder!!')
+                legacyTime += pageTime
+            speedup = '%.1fx' % (legacyTime / decodeTime)
+            legacyTime = '%.3f' % legacyTime
+        encodedSize = sum(len(stream) for stream in streams) / 1024.0
+        print('%8s %6d %12.1f %11.3f %11s %11s' % (name, numPages, encodedSize, decodeTime, legacyTime, speedup))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Benchmark of the LZW codec (lzw.lzwdecode and lzw.lzwencode) over streams of several megabytes.
+    Every stream is also checked to round trip with both values of /EarlyChange.
+
+    Usage: python benchmarks/lzwBenchmark.py [megabytes ...]
+'''
+
+import os, random, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import lzw
+
+def makeStream(size, alphabetSize):
+    '''
+        Builds a stream with a given level of redundancy, mixing random words of a small alphabet
+
+        @param size: Size of the stream in bytes
+        @param alphabetSize: Number of different bytes in the stream
+        @return: The stream (string)
+    '''
+    alphabet = [chr(i) for i in random.sample(range(256), alphabetSize)]
+    words = [''.join(random.choice(alphabet) for i in range(random.randint(1, 12))) for j in range(512)]
+    chunks = []
+    length = 0
+    while length < size:
+        word = random.choice(words)
+        chunks.append(word)
+        length += len(word)
+    return ''.join(chunks)[:size]
+
+def timeIt(function, *args):
+    start = time.time()
+    ret = function(*args)
+    return time.time() - start, ret
+
+if __name__ == '__main__':
+    megabytes = [float(size) for size in sys.argv[1:]] or [1, 4]
+    print('%6s %9s %9s %11s %11s' % ('MB', 'alphabet', 'ratio', 'encode (s)', 'decode (s)'))
+    for size in megabytes:
+        for alphabetSize in [4, 64, 256]:
+            stream = makeStream(int(size * 1024 * 1024), alphabetSize)
+            for earlyChange in [0, 1]:
+                encoded = lzw.lzwencode(stream, earlyChange)
+                if lzw.lzwdecode(encoded, earlyChange) != stream:
+                    sys.exit('Error: wrong round trip with /EarlyChange '+str(earlyChange)+'!!')
+            encodeTime, encoded = timeIt(lzw.lzwencode, stream)
+            decodeTime, decoded = timeIt(lzw.lzwdecode, encoded)
+            ratio = float(len(encoded)) / len(stream)
+            print('%6.1f %9d %9.3f %11.3f %11.3f' % (size, alphabetSize, ratio, encodeTime, decodeTime))
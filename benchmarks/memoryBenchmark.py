@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Benchmark of the memory used by the PDF objects (PDFCore), compared with the former objects with a dictionary of attributes.
+    The former objects are rebuilt from the current ones with the same attributes they used to have, so both graphs hold the same content.
+
+    Usage: python benchmarks/memoryBenchmark.py [num_objects]
+'''
+
+import os, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import PDFCore
+
+class LegacyObject:
+    '''
+        Former PDF object, with all its attributes in a dictionary, kept as reference
+    '''
+    pass
+
+def copyString(string):
+    '''
+        Gets a new copy of a string, like the ones created by the former parser for each name
+    '''
+    if isinstance(string, str) and len(string) > 1:
+        return string[:1] + string[1:]
+    return string
+
+def toLegacy(pdfObject):
+    '''
+        Rebuilds a compact object (and its elements) with the attributes the former implementation stored for it
+
+        @param pdfObject: A PDFObject
+        @return: The equivalent LegacyObject, or the same object if it was not compact
+    '''
+    objectType = pdfObject.getType()
+    if objectType in ['array', 'dictionary', 'stream']:
+        legacyObject = LegacyObject()
+        legacyObject.__dict__.update(pdfObject.__dict__)
+        if objectType == 'array':
+            legacyObject.elements = [toLegacy(element) for element in pdfObject.getElements()]
+        else:
+            legacyObject.elements = dict([(key, toLegacy(element)) for key, element in pdfObject.getElements().items()])
+        return legacyObject
+    if not isinstance(pdfObject, PDFCore.PDFCompactObject):
+        return pdfObject
+    legacyObject = LegacyObject()
+    legacyObject.type = objectType
+    legacyObject.errors = list(pdfObject.errors)
+    legacyObject.JSCode = list(pdfObject.JSCode)
+    legacyObject.references = list(pdfObject.references)
+    legacyObject.referencesInElements = dict(pdfObject.referencesInElements)
+    legacyObject.compressedIn = pdfObject.compressedIn
+    legacyObject.encrypted = pdfObject.encrypted
+    legacyObject.updateNeeded = pdfObject.updateNeeded
+    legacyObject.containsJScode = pdfObject.containsJScode
+    if objectType in ['integer', 'real']:
+        legacyObject.value = pdfObject.value
+        legacyObject.rawValue = pdfObject.rawValue
+        legacyObject.encryptedValue = str(pdfObject.rawValue)
+    elif objectType == 'reference':
+        legacyObject.value = legacyObject.rawValue = legacyObject.encryptedValue = copyString(pdfObject.rawValue)
+        legacyObject.id = pdfObject.id
+        legacyObject.genNumber = pdfObject.genNumber
+    else:
+        legacyObject.value = legacyObject.rawValue = legacyObject.encryptedValue = copyString(pdfObject.rawValue)
+        if objectType == 'name':
+            legacyObject.encryptionKey = ''
+        elif objectType == 'string':
+            legacyObject.unescapedBytes = list(pdfObject.unescapedBytes)
+            legacyObject.urlsFound = list(pdfObject.urlsFound)
+    return legacyObject
+
+def getDeepSize(root):
+    '''
+        Computes the memory used by an object graph, counting each object once
+
+        @param root: The root object
+        @return: The number of bytes
+    '''
+    seen = set()
+    pending = [root]
+    size = 0
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, (list, tuple)):
+            pending.extend(item)
+        elif isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (LegacyObject, PDFCore.PDFObject)):
+            if hasattr(item, '__dict__'):
+                pending.append(item.__dict__)
+            for objectClass in type(item).__mro__:
+                for slot in objectClass.__dict__.get('__slots__', ()):
+                    if hasattr(item, slot):
+                        pending.append(getattr(item, slot))
+    return size
+
+def makeDocument(numObjects):
+    '''
+        Builds a document with many small dictionaries, like the page trees and annotations of big documents
+
+        @param numObjects: Number of indirect objects
+        @return: The content of the document (string)
+    '''
+    objects = []
+    for id in range(1, numObjects + 1):
+        objects.append('%d 0 obj\n<< /Type /Annot /Subtype /Link /Rect [%d.5 %d 120 %d] /Border [0 0 0] /P %d 0 R /Open false /Parent null /Contents (Link number %d) >>\nendobj\n' % (id, id % 500, id % 700, id % 900, max(1, id - 1), id))
+    content = '%PDF-1.4\n'
+    offsets = []
+    for object in objects:
+        offsets.append(len(content))
+        content += object
+    xrefOffset = len(content)
+    content += 'xref\n0 %d\n0000000000 65535 f \n' % (numObjects + 1)
+    content += ''.join(['%010d 00000 n \n' % offset for offset in offsets])
+    content += 'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (numObjects + 1, xrefOffset)
+    return content
+
+if __name__ == '__main__':
+    numObjects = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print('%-12s %13s %13s %7s' % ('object', 'legacy (B)', 'compact (B)', 'ratio'))
+    samples = [('bool', lambda: PDFCore.PDFBool('true')),
+               ('null', lambda: PDFCore.PDFNull('null')),
+               ('integer', lambda: PDFCore.PDFNum('1234')),
+               ('real', lambda: PDFCore.PDFNum('12.5')),
+               ('name', lambda: PDFCore.PDFName('Subtype')),
+               ('reference', lambda: PDFCore.PDFReference('1234', '0')),
+               ('string', lambda: PDFCore.PDFString('Link number 1234'))]
+    for name, makeObject in samples:
+        objects = [makeObject() for i in range(numObjects)]
+        legacySize = getDeepSize([toLegacy(object) for object in objects])
+        compactSize = getDeepSize(objects)
+        print('%-12s %13.1f %13.1f %7.2f' % (name, float(legacySize) / numObjects, float(compactSize) / numObjects, float(legacySize) / compactSize))
+
+    fileName = tempfile.mktemp(suffix = '.pdf')
+    open(fileName, 'wb').write(makeDocument(numObjects))
+    try:
+        start = time.time()
+        ret, pdf = PDFCore.PDFParser().parse(fileName, True)
+        parsingTime = time.time() - start
+    finally:
+        os.remove(fileName)
+    objects = [pdf.getObject(objectId) for objectId in pdf.body[0].getObjectsIds()]
+    legacySize = getDeepSize([toLegacy(object) for object in objects])
+    compactSize = getDeepSize(objects)
+    print('%-12s %13.1f %13.1f %7.2f' % ('document', float(legacySize) / len(objects), float(compactSize) / len(objects), float(legacySize) / compactSize))
+    print('Parsed %d objects in %.3f seconds' % (len(objects), parsingTime))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Benchmark of the parser (PDFCore) over the synthetic corpus of pdfCorpus, measuring the parse, decode, decrypt, Javascript analysis and save phases separately.
+    The time of each phase excludes the time of the phases called inside it (the parse time doesn't include decoding, decryption or Javascript analysis).
+    The results are written to a JSON file and can be compared with the ones of a previous run to spot regressions.
+
+    Usage: python benchmarks/parserBenchmark.py [-o results.json] [-c previous.json] [-r repeats] [-k corpus_dir] [-t tolerance] [profile ...]
+'''
+
+import json, optparse, os, platform, shutil, subprocess, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import JSAnalysis, PDFCore, pdfCorpus
+
+phases = ['parse', 'decode', 'decrypt', 'js', 'save']
+
+class PhaseTimer:
+    '''
+        Accumulates the exclusive time spent in the wrapped functions of each phase
+    '''
+    def __init__(self):
+        self.times = dict([(phase, 0.0) for phase in phases])
+        self.stack = []
+        self.originals = []
+
+    def wrap(self, owner, name, phase):
+        '''
+            Replaces owner.name by a function which adds its time to the given phase
+
+            @param owner: The module or class of the function
+            @param name: The name of the function
+            @param phase: The name of the phase
+        '''
+        function = owner.__dict__[name]
+        timer = self
+        def timedFunction(*args, **kwargs):
+            start = time.time()
+            timer.stack.append(0.0)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.time() - start
+                innerTime = timer.stack.pop()
+                timer.times[phase] += elapsed - innerTime
+                if timer.stack:
+                    timer.stack[-1] += elapsed
+        self.originals.append((owner, name, function))
+        setattr(owner, name, timedFunction)
+
+    def reset(self):
+        for phase in phases:
+            self.times[phase] = 0.0
+
+    def restore(self):
+        for owner, name, function in reversed(self.originals):
+            setattr(owner, name, function)
+        self.originals = []
+
+def runDocument(fileName, timer):
+    '''
+        Parses, decrypts (when needed, by the parser itself), analyses and saves a document
+
+        @param fileName: The document
+        @param timer: The PhaseTimer with the core functions already wrapped
+        @return: A tuple (numObjects, numErrors)
+    '''
+    # Each run analyses the Javascript code and the shellcode again instead of reusing the results of the previous runs
+    JSAnalysis.jsCache = None
+    JSAnalysis.shellcodeCache.clear()
+    ret, pdf = PDFCore.PDFParser().parse(fileName, True)
+    numObjects = sum([len(body.getObjectsIds()) for body in pdf.body])
+    outputFile = tempfile.mktemp(suffix = '.pdf')
+    try:
+        pdf.save(outputFile)
+    finally:
+        if os.path.exists(outputFile):
+            os.remove(outputFile)
+    return numObjects, len(pdf.errors)
+
+def getRevision():
+    try:
+        process = subprocess.Popen(['git', 'rev-parse', 'HEAD'], cwd = os.path.dirname(os.path.abspath(__file__)), stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+        output = process.communicate()[0]
+        if process.returncode == 0:
+            return output.strip()
+    except OSError:
+        pass
+    return None
+
+def compareResults(results, previousResults, tolerance):
+    '''
+        Prints the ratio between the current and previous times of each phase
+
+        @param results: The current results
+        @param previousResults: The results of a previous run
+        @param tolerance: The maximum ratio considered as noise (1.2 = 20% slower)
+        @return: A list of (profile, phase, ratio) regressions
+    '''
+    regressions = []
+    print('')
+    print('%-16s' % 'ratio' + ''.join(['%10s' % phase for phase in phases + ['total']]))
+    for name in sorted(results['profiles']):
+        if name not in previousResults['profiles']:
+            continue
+        current = results['profiles'][name]['phases']
+        previous = previousResults['profiles'][name]['phases']
+        line = '%-16s' % name
+        for phase in phases + ['total']:
+            # Phases faster than 10ms are too noisy to be compared
+            if previous.get(phase, 0) < 0.01 and current[phase] < 0.01:
+                line += '%10s' % '-'
+                continue
+            ratio = current[phase] / max(previous.get(phase, 0), 0.001)
+            line += '%10.2f' % ratio
+            if ratio > tolerance:
+                regressions.append((name, phase, ratio))
+        print(line)
+    return regressions
+
+if __name__ == '__main__':
+    argsParser = optparse.OptionParser(usage = 'Usage: python benchmarks/parserBenchmark.py [options] [profile ...]\n\nProfiles: ' + ', '.join([name for name, options in pdfCorpus.profiles]))
+    argsParser.add_option('-o', '--output', action = 'store', type = 'string', dest = 'output', help = 'Writes the results to the given JSON file')
+    argsParser.add_option('-c', '--compare', action = 'store', type = 'string', dest = 'compare', help = 'Compares the results with the ones stored in the given JSON file')
+    argsParser.add_option('-r', '--repeats', action = 'store', type = 'int', dest = 'repeats', default = 3, help = 'Number of runs per document, keeping the fastest one (default: 3)')
+    argsParser.add_option('-k', '--keep-corpus', action = 'store', type = 'string', dest = 'corpusDir', help = 'Generates the corpus in the given directory and keeps it')
+    argsParser.add_option('-t', '--tolerance', action = 'store', type = 'float', dest = 'tolerance', default = 1.2, help = 'Ratio from which a phase is reported as a regression (default: 1.2)')
+    (options, args) = argsParser.parse_args()
+    profileNames = [name for name, profileOptions in pdfCorpus.profiles]
+    for name in args:
+        if name not in profileNames:
+            sys.exit('Error: unknown profile "' + name + '"!!')
+
+    corpusDir = options.corpusDir or tempfile.mkdtemp()
+    timer = PhaseTimer()
+    timer.wrap(PDFCore.PDFParser, 'parse', 'parse')
+    timer.wrap(PDFCore, 'decodeStream', 'decode')
+    timer.wrap(PDFCore.PDFFile, 'decrypt', 'decrypt')
+    timer.wrap(PDFCore, 'analyseJS', 'js')
+    timer.wrap(PDFCore.PDFFile, 'save', 'save')
+    results = {'python': platform.python_version(), 'platform': platform.platform(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+               'revision': getRevision(), 'repeats': options.repeats, 'profiles': {}}
+    print('%-16s %10s %8s %7s' % ('profile', 'size', 'objects', 'errors') + ''.join(['%10s' % phase for phase in phases + ['total']]))
+    try:
+        for name, fileName, profileOptions in pdfCorpus.makeCorpus(corpusDir, args):
+            bestTimes = None
+            for i in range(options.repeats):
+                timer.reset()
+                numObjects, numErrors = runDocument(fileName, timer)
+                times = dict(timer.times)
+                times['total'] = sum(times.values())
+                if bestTimes == None or times['total'] < bestTimes['total']:
+                    bestTimes = times
+            size = os.path.getsize(fileName)
+            results['profiles'][name] = {'options': profileOptions, 'size': size, 'objects': numObjects, 'errors': numErrors, 'phases': bestTimes}
+            print('%-16s %10d %8d %7d' % (name, size, numObjects, numErrors) + ''.join(['%10.3f' % bestTimes[phase] for phase in phases + ['total']]))
+    finally:
+        timer.restore()
+        if options.corpusDir == None:
+            shutil.rmtree(corpusDir)
+
+    if options.output != None:
+        open(options.output, 'w').write(json.dumps(results, indent = 2, sort_keys = True))
+    if options.compare != None:
+        previousResults = json.loads(open(options.compare, 'r').read())
+        regressions = compareResults(results, previousResults, options.tolerance)
+        if regressions:
+            sys.exit('Error: ' + ', '.join(['%s/%s (x%.2f)' % regression for regression in regressions]) + ' slower than the previous results!!')
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Generator of synthetic PDF documents to benchmark the parser, built on mPDF.cPDF.
+    The documents are parameterized by number of objects, incremental updates, object streams, cross reference streams, filter chains, RC4/AES encryption, Javascript and embedded file payloads (with the layouts of makeJavaScript and makeEmbedded) and several kinds of malformations.
+    The same options and seed always generate the same document.
+
+    Usage: python benchmarks/pdfCorpus.py output_dir [profile ...]
+'''
+
+import binascii, os, random, re, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import mPDF
+from PDFCrypto import computeOwnerPass, computeUserPass, computeEncryptionKey, computeObjectKey, RC4
+from PDFFilters import encodeStream
+from aespython import key_expander, aes_cipher, cbc_mode
+
+filterNames = {'f':'/FlateDecode', 'h':'/ASCIIHexDecode', 'a':'/ASCII85Decode', 'l':'/LZWDecode', 'r':'/RunLengthDecode'}
+malformations = ['garbage-header', 'truncated', 'bad-xref', 'missing-endobj', 'bad-length']
+defaultOptions = {'objects':300, 'updates':0, 'objectStreams':False, 'xrefStreams':False, 'filters':'f', 'encryption':None,
+                  'jsSize':0, 'embeddedSize':0, 'malformed':[], 'seed':0}
+# Corpus used by default by the benchmarks: each profile changes some of the default options
+profiles = [('plain', {}),
+            ('objects-5k', {'objects':5000}),
+            ('updates-10', {'updates':10}),
+            ('xref-streams', {'xrefStreams':True}),
+            ('object-streams', {'objectStreams':True, 'objects':3000}),
+            ('filter-chain', {'filters':'flah'}),
+            ('filter-rle', {'filters':'r'}),
+            ('rc4', {'encryption':'RC4', 'objects':1000}),
+            ('aes', {'encryption':'AES', 'objects':150}),
+            ('js-64k', {'jsSize':64*1024}),
+            ('embedded-1m', {'embeddedSize':1024*1024}),
+            ('malformed', {'malformed':malformations, 'updates':2})]
+catalogId, pagesId, fontId, actionId, jsId, fileSpecId, embeddedFileId, firstPageId = range(1, 9)
+permissions = -3904
+
+class CorpusPDF(mPDF.cPDF):
+    '''
+        cPDF with object and cross reference streams, encryption and incremental updates
+    '''
+    def __init__(self, fileName, encryption = None, randomGenerator = None, lengthDelta = 0, offsetDelta = 0):
+        '''
+            @param fileName: The output file
+            @param encryption: The encryption algorithm (RC4 or AES) or None
+            @param randomGenerator: The random.Random instance used for file ids and initialization vectors
+            @param lengthDelta: Number of bytes added to the real /Length of the streams (malformed documents)
+            @param offsetDelta: Number of bytes added to the real offsets of the cross reference sections (malformed documents)
+        '''
+        mPDF.cPDF.__init__(self, fileName, buffered = True)
+        self.random = randomGenerator or random.Random(0)
+        self.encryption = encryption
+        self.lengthDelta = lengthDelta
+        self.offsetDelta = offsetDelta
+        self.sectionEntries = {}
+        self.lastXref = None
+        self.maxId = 0
+        self.fileId = self.randomBytes(16)
+        if encryption != None:
+            revision = 3 if encryption == 'RC4' else 4
+            self.dictO = computeOwnerPass('owner', '', 128, revision)
+            self.dictU = computeUserPass('', self.dictO, self.fileId, permissions, 128, revision, True)[1]
+            self.key = computeEncryptionKey('', self.dictO, self.dictU, '', '', self.fileId, permissions, 128, revision, True, 'USER')[1]
+
+    def randomBytes(self, size):
+        return ''.join([chr(self.random.randint(0, 255)) for i in range(size)])
+
+    def encrypt(self, id, data):
+        '''
+            Encrypts a string or stream of the given object (RC4, or AES-CBC with PKCS#5 padding)
+        '''
+        if self.encryption == None:
+            return data
+        key = computeObjectKey(id, 0, self.key, 16, self.encryption)
+        if self.encryption == 'RC4':
+            return RC4(data, key)
+        padding = 16 - len(data) % 16
+        data += chr(padding) * padding
+        iv = self.randomBytes(16)
+        aesMode = cbc_mode.CBCMode(aes_cipher.AESCipher(key_expander.KeyExpander(128).expand(map(ord, key))), 16)
+        aesMode.set_iv(map(ord, iv))
+        blocks = [iv]
+        for i in range(0, len(data), 16):
+            blocks.append(''.join(map(chr, aesMode.encrypt_block(map(ord, data[i:i+16])))))
+        return ''.join(blocks)
+
+    def string(self, id, text, compressed = False):
+        '''
+            Gets a hexadecimal string for the given object, encrypted unless it's stored in an object stream
+        '''
+        if not compressed:
+            text = self.encrypt(id, text)
+        return '<' + binascii.hexlify(text) + '>'
+
+    def encryptDictionary(self):
+        if self.encryption == 'RC4':
+            cryptFilter = ' /V 2 /R 3 /Length 128'
+        else:
+            cryptFilter = ' /V 4 /R 4 /Length 128 /CF << /StdCF << /CFM /AESV2 /Length 16 /AuthEvent /DocOpen >> >> /StmF /StdCF /StrF /StdCF'
+        return '<< /Filter /Standard%s /P %d /O <%s> /U <%s> >>' % (cryptFilter, permissions, binascii.hexlify(self.dictO), binascii.hexlify(self.dictU))
+
+    def addObject(self, id, content):
+        self.indirectobject(id, 0, content)
+        self.sectionEntries[id] = (1, self.indirectObjects[id], 0)
+        self.maxId = max(self.maxId, id)
+
+    def addStream(self, id, data, entries = '', filters = '', encrypted = True):
+        '''
+            Adds a stream encoded with a chain of filters (see filterNames), applied from left to right
+        '''
+        filterArray = []
+        for letter in filters:
+            data = encodeStream(data, filterNames[letter])[1]
+            filterArray.insert(0, filterNames[letter])
+        if encrypted:
+            data = self.encrypt(id, data)
+        if filterArray != []:
+            entries += ' /Filter [%s]' % ' '.join(filterArray)
+        self.appendString('\n')
+        self.indirectObjects[id] = self.filesize()
+        self.appendString('%d 0 obj\n<< /Length %d%s >>\nstream\n' % (id, len(data) + self.lengthDelta, entries))
+        self.appendBinary(data)
+        self.appendString('\nendstream\nendobj\n')
+        self.sectionEntries[id] = (1, self.indirectObjects[id], 0)
+        self.maxId = max(self.maxId, id)
+
+    def addObjectStream(self, id, objects, filters = 'f'):
+        '''
+            Adds an object stream with the given list of (id, content) objects
+        '''
+        offsets = []
+        contents = []
+        offset = 0
+        for index, (objectId, content) in enumerate(objects):
+            offsets.append('%d %d' % (objectId, offset))
+            contents.append(content)
+            offset += len(content) + 1
+        header = ' '.join(offsets) + '\n'
+        self.addStream(id, header + '\n'.join(contents) + '\n', ' /Type /ObjStm /N %d /First %d' % (len(objects), len(header)), filters)
+        for index, (objectId, content) in enumerate(objects):
+            self.sectionEntries[objectId] = (2, id, index)
+            self.maxId = max(self.maxId, objectId)
+
+    def getSubsections(self, ids):
+        subsections = []
+        for id in sorted(ids):
+            if subsections != [] and subsections[-1][0] + len(subsections[-1][1]) == id:
+                subsections[-1][1].append(id)
+            else:
+                subsections.append((id, [id]))
+        return subsections
+
+    def trailerEntries(self, size, root):
+        entries = ' /Size %d /Root %s /ID [<%s> <%s>]' % (size, root, binascii.hexlify(self.fileId), binascii.hexlify(self.fileId))
+        if self.lastXref != None:
+            entries += ' /Prev %d' % self.lastXref
+        if self.encryption != None:
+            entries += ' /Encrypt ' + self.encryptDictionary()
+        return entries
+
+    def xrefTable(self, root):
+        '''
+            Ends a version of the document with a cross reference table of the objects added since the previous one
+        '''
+        self.appendString('\n')
+        startxref = self.filesize()
+        entries = dict(self.sectionEntries)
+        if self.lastXref == None:
+            entries[0] = (0, 0, 65535)
+        self.appendString('xref\n')
+        for firstId, ids in self.getSubsections(entries.keys()):
+            self.appendString('%d %d\n' % (firstId, len(ids)))
+            for id in ids:
+                if entries[id][0] == 0:
+                    self.appendString('0000000000 65535 f \n')
+                else:
+                    self.appendString('%010d 00000 n \n' % (entries[id][1] + self.offsetDelta))
+        self.appendString('trailer\n<<%s >>\nstartxref\n%d\n%%%%EOF\n' % (self.trailerEntries(self.maxId + 1, root), startxref))
+        self.lastXref = startxref
+        self.sectionEntries = {}
+
+    def xrefStream(self, root):
+        '''
+            Ends a version of the document with a cross reference stream of the objects added since the previous one
+        '''
+        id = self.maxId + 1
+        self.appendString('\n')
+        offset = self.filesize()
+        entries = dict(self.sectionEntries)
+        entries[id] = (1, offset + 1, 0)
+        if self.lastXref == None:
+            entries[0] = (0, 0, 65535)
+        rows = []
+        index = []
+        for firstId, ids in self.getSubsections(entries.keys()):
+            index.append('%d %d' % (firstId, len(ids)))
+            for entryId in ids:
+                entryType, field2, field3 = entries[entryId]
+                if entryType == 1:
+                    field2 += self.offsetDelta
+                rows.append(chr(entryType) + ('%08x' % field2).decode('hex') + ('%04x' % field3).decode('hex'))
+        self.maxId = id
+        self.addStream(id, ''.join(rows), ' /Type /XRef /W [1 4 2] /Index [%s]%s' % (' '.join(index), self.trailerEntries(id + 1, root)), 'f', False)
+        self.appendString('startxref\n%d\n%%%%EOF\n' % (self.indirectObjects[id] + self.offsetDelta))
+        self.lastXref = self.indirectObjects[id]
+        self.sectionEntries = {}
+
+def makeJavaScript(size, randomGenerator):
+    '''
+        Builds a Javascript payload like the ones found in malicious documents: an escaped shellcode, a heap spray loop and some noise
+    '''
+    shellcode = ''.join(['%%u%04x' % randomGenerator.randint(0, 0xffff) for i in range(256)])
+    code = 'var shellcode = unescape("%s");\nvar block = unescape("%%u0c0c%%u0c0c");\nwhile (block.length < 0x40000) block += block;\nvar spray = new Array();\nfor (var i = 0; i < 200; i++) spray[i] = block + shellcode;\n' % shellcode
+    lines = []
+    length = len(code)
+    while length < size:
+        line = 'var v%d = "%s";\n' % (len(lines), binascii.hexlify(''.join([chr(randomGenerator.randint(0, 255)) for i in range(24)])))
+        lines.append(line)
+        length += len(line)
+    return (code + ''.join(lines))[:max(size, len(code))]
+
+def makeDocument(fileName, **options):
+    '''
+        Generates a synthetic document
+
+        @param fileName: The output file
+        @param options: The generation options, see defaultOptions:
+            objects: Approximate number of indirect objects of the first version (three per page: page, contents and annotation)
+            updates: Number of incremental updates, each one modifying a tenth of the annotations
+            objectStreams: Boolean to store the dictionaries in object streams (implies xrefStreams)
+            xrefStreams: Boolean to use cross reference streams instead of tables
+            filters: Filter chain of the streams (f: Flate, h: ASCIIHex, a: ASCII85, l: LZW, r: RunLength)
+            encryption: RC4, AES or None
+            jsSize: Size of the Javascript payload run when the document is opened (0: no Javascript)
+            embeddedSize: Size of the embedded file (0: no embedded file)
+            malformed: List of malformations, see malformations
+            seed: Seed of the random contents
+        @return: The size of the document
+    '''
+    for option in options:
+        if option not in defaultOptions:
+            raise ValueError('Unknown option "%s"' % option)
+    settings = dict(defaultOptions)
+    settings.update(options)
+    malformed = settings['malformed']
+    if isinstance(malformed, str):
+        malformed = [malformation for malformation in malformed.split(',') if malformation != '']
+    for malformation in malformed:
+        if malformation not in malformations:
+            raise ValueError('Unknown malformation "%s"' % malformation)
+    randomGenerator = random.Random(settings['seed'])
+    objectStreams = settings['objectStreams']
+    xrefStreams = settings['xrefStreams'] or objectStreams
+    filters = settings['filters']
+    pdf = CorpusPDF(fileName, settings['encryption'], randomGenerator, 13 if 'bad-length' in malformed else 0, 7 if 'bad-xref' in malformed else 0)
+    numPages = max(1, settings['objects'] / 3)
+    pageIds = range(firstPageId, firstPageId + 3 * numPages, 3)
+    dictionaries = []
+
+    def annotation(pageId, version):
+        text = 'Annotation of page %d, version %d: %s' % (pageId, version, binascii.hexlify(pdf.randomBytes(8)))
+        return '<< /Type /Annot /Subtype /Text /Rect [72 72 144 144] /P %d 0 R /Contents %s >>' % (pageId, pdf.string(pageId + 2, text, objectStreams))
+
+    pdf.header()
+    pdf.binary()
+    catalog = '<< /Type /Catalog /Pages %d 0 R' % pagesId
+    if settings['jsSize'] > 0:
+        catalog += ' /OpenAction %d 0 R' % actionId
+    if settings['embeddedSize'] > 0:
+        catalog += ' /Names << /EmbeddedFiles << /Names [%s %d 0 R] >> >>' % (pdf.string(catalogId, 'payload.bin', objectStreams), fileSpecId)
+    dictionaries.append((catalogId, catalog + ' >>'))
+    dictionaries.append((pagesId, '<< /Type /Pages /Kids [%s] /Count %d >>' % (' '.join(['%d 0 R' % id for id in pageIds]), numPages)))
+    dictionaries.append((fontId, '<< /Type /Font /Subtype /Type1 /Name /F1 /BaseFont /Helvetica /Encoding /MacRomanEncoding >>'))
+    if settings['jsSize'] > 0:
+        dictionaries.append((actionId, '<< /Type /Action /S /JavaScript /JS %d 0 R >>' % jsId))
+        pdf.addStream(jsId, makeJavaScript(settings['jsSize'], randomGenerator), '', filters)
+    if settings['embeddedSize'] > 0:
+        dictionaries.append((fileSpecId, '<< /Type /Filespec /F %s /EF << /F %d 0 R >> >>' % (pdf.string(fileSpecId, 'payload.bin', objectStreams), embeddedFileId)))
+        embeddedFile = ''.join([chr(randomGenerator.randint(0, 255)) * randomGenerator.randint(1, 16) for i in range(settings['embeddedSize'] / 8)])[:settings['embeddedSize']]
+        pdf.addStream(embeddedFileId, embeddedFile, ' /Type /EmbeddedFile', filters)
+    for pageId in pageIds:
+        dictionaries.append((pageId, '<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R /Annots [%d 0 R] /Resources << /ProcSet [/PDF /Text] /Font << /F1 %d 0 R >> >> >>' % (pagesId, pageId + 1, pageId + 2, fontId)))
+        dictionaries.append((pageId + 2, annotation(pageId, 0)))
+        content = ''.join(['BT /F1 12 Tf 72 %d Td (Line %d of page %d) Tj ET\n' % (720 - 12 * line, line, pageId) for line in range(randomGenerator.randint(5, 40))])
+        pdf.addStream(pageId + 1, content, '', filters)
+
+    def addDictionaries(dictionaries):
+        if objectStreams:
+            pdf.maxId = max([pdf.maxId] + [id for id, content in dictionaries])
+            for i in range(0, len(dictionaries), 100):
+                pdf.addObjectStream(pdf.maxId + 1, dictionaries[i:i+100])
+        else:
+            for id, content in dictionaries:
+                pdf.addObject(id, content)
+
+    def endVersion():
+        if xrefStreams:
+            pdf.xrefStream('%d 0 R' % catalogId)
+        else:
+            pdf.xrefTable('%d 0 R' % catalogId)
+
+    addDictionaries(dictionaries)
+    endVersion()
+    for version in range(1, settings['updates'] + 1):
+        modifiedPages = randomGenerator.sample(pageIds, max(1, numPages / 10))
+        addDictionaries([(pageId + 2, annotation(pageId, version)) for pageId in sorted(modifiedPages)])
+        endVersion()
+    pdf.flush()
+
+    if 'missing-endobj' in malformed or 'garbage-header' in malformed or 'truncated' in malformed:
+        content = open(fileName, 'rb').read()
+        if 'missing-endobj' in malformed:
+            parts = content.split('\nendobj\n')
+            content = ''.join([part + ('\n' if i % 10 == 9 else '\nendobj\n') for i, part in enumerate(parts[:-1])]) + parts[-1]
+        if 'garbage-header' in malformed:
+            content = pdf.randomBytes(1024) + content
+        if 'truncated' in malformed:
+            content = content[:len(content) * 9 / 10]
+        open(fileName, 'wb').write(content)
+    return os.path.getsize(fileName)
+
+def makeCorpus(directory, profileNames = None):
+    '''
+        Generates the documents of the given profiles in a directory
+
+        @param directory: The output directory
+        @param profileNames: List of profile names, see profiles. By default: all of them.
+        @return: A list of (name, fileName, options) tuples
+    '''
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    corpus = []
+    for name, options in profiles:
+        if profileNames and name not in profileNames:
+            continue
+        fileName = os.path.join(directory, name + '.pdf')
+        makeDocument(fileName, **options)
+        corpus.append((name, fileName, options))
+    return corpus
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('Usage: python benchmarks/pdfCorpus.py output_dir [profile ...]')
+    for name, fileName, options in makeCorpus(sys.argv[1], sys.argv[2:]):
+        print('%-16s %10d bytes  %s' % (name, os.path.getsize(fileName), fileName))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Benchmark of PDFFilters.post_prediction (PNG and TIFF predictors) over images of several megapixels, compared with the former implementation.
+    The pure Python engines are always measured, the NumPy ones only if NumPy is installed.
+
+    Usage: python benchmarks/predictorBenchmark.py [megapixels ...]
+'''
+
+import os, random, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import PDFFilters
+from PDFUtils import getNumsFromBytes, getBytesFromBits, getBitsFromNum
+
+def legacyPNGPostPrediction(decodedStream, columns):
+    '''
+        Former implementation of the PNG predictors in PDFFilters.post_prediction (8 bits grayscale images), kept as reference
+    '''
+    output = ''
+    bytesPerRow = columns + 1
+    numRows = (len(decodedStream) + bytesPerRow -1) / bytesPerRow
+    numSamplesPerRow = columns + 1
+    bytesPerSample = 1
+    upRowdata = (0,) * numSamplesPerRow
+    for row in xrange(numRows):
+        rowdata = [ord(x) for x in decodedStream[(row*bytesPerRow):((row+1)*bytesPerRow)]]
+        filterByte = rowdata[0]
+        rowdata[0] = 0
+        if filterByte == 1:
+            for i in range(1, numSamplesPerRow):
+                if i < bytesPerSample:
+                    prevSample = 0
+                else:
+                    prevSample = rowdata[i-bytesPerSample]
+                rowdata[i] = (rowdata[i] + prevSample) % 256
+        elif filterByte == 2:
+            for i in range(1, numSamplesPerRow):
+                upSample = upRowdata[i]
+                rowdata[i] = (rowdata[i] + upSample) % 256
+        elif filterByte == 3:
+            for i in range(1, numSamplesPerRow):
+                upSample = upRowdata[i]
+                if i < bytesPerSample:
+                    prevSample = 0
+                else:
+                    prevSample = rowdata[i-bytesPerSample]
+                rowdata[i] = (rowdata[i] + ((prevSample+upSample)/2)) % 256
+        elif filterByte == 4:
+            for i in range(1, numSamplesPerRow):
+                upSample = upRowdata[i]
+                if i < bytesPerSample:
+                    prevSample = 0
+                    upPrevSample = 0
+                else:
+                    prevSample = rowdata[i-bytesPerSample]
+                    upPrevSample = upRowdata[i-bytesPerSample]
+                p = prevSample + upSample - upPrevSample
+                pa = abs(p - prevSample)
+                pb = abs(p - upSample)
+                pc = abs(p - upPrevSample)
+                if pa <= pb and pa <= pc:
+                    nearest = prevSample
+                elif pb <= pc:
+                    nearest = upSample
+                else:
+                    nearest = upPrevSample
+                rowdata[i] = (rowdata[i] + nearest) % 256
+        upRowdata = rowdata
+        output += (''.join([chr(x) for x in rowdata[1:]]))
+    return (0,output)
+
+def legacyTIFFPostPrediction(decodedStream, columns):
+    '''
+        Former implementation of the TIFF predictor in PDFFilters.post_prediction (8 bits grayscale images), kept as reference
+    '''
+    bytesPerRow = columns
+    numRows = len(decodedStream) / bytesPerRow
+    outputBitsStream = ''
+    for rowIndex in range(numRows):
+        row = decodedStream[rowIndex*bytesPerRow:rowIndex*bytesPerRow+bytesPerRow]
+        ret,colorNums = getNumsFromBytes(row, 8)
+        pixel = 0
+        for i in range(columns):
+            pixel = (pixel + colorNums[i]) & 0xff
+            ret, outputBits = getBitsFromNum(pixel, 8)
+            outputBitsStream += outputBits
+    return getBytesFromBits(outputBitsStream)
+
+def makeImage(width, height, bytesPerPixel, png):
+    '''
+        Builds the content of a predicted image with random samples (and random PNG filter types)
+
+        @param width: Number of columns
+        @param height: Number of rows
+        @param bytesPerPixel: Number of bytes per pixel
+        @param png: Boolean to add the filter type byte at the beginning of each row
+        @return: The predicted image (string)
+    '''
+    row = os.urandom(width * bytesPerPixel)
+    rows = []
+    for i in range(height):
+        if png:
+            rows.append(chr(random.randint(0, 4)))
+        rows.append(row)
+    return ''.join(rows)
+
+def timeIt(function, *args):
+    start = time.time()
+    ret = function(*args)
+    return time.time() - start, ret
+
+if __name__ == '__main__':
+    megapixels = [float(size) for size in sys.argv[1:]] or [1, 4]
+    numpyAvailable = PDFFilters.NUMPY_MODULE
+    print('%6s %10s %6s %5s %11s %11s %11s' % ('MP', 'predictor', 'colors', 'bits', 'legacy (s)', 'python (s)', 'numpy (s)'))
+    for size in megapixels:
+        width = 2048
+        height = max(1, int(size * 1024 * 1024) / width)
+        for predictor, colors, bits in [(12, 1, 8), (12, 3, 8), (2, 1, 8), (2, 3, 16), (2, 1, 1)]:
+            bytesPerPixel = (colors * bits + 7) / 8
+            rowBytes = (width * colors * bits + 7) / 8
+            image = makeImage(rowBytes / bytesPerPixel, height, bytesPerPixel, predictor != 2)
+            legacyTime = '-'
+            if colors == 1 and bits == 8:
+                if predictor == 2:
+                    legacyTime, legacyRet = timeIt(legacyTIFFPostPrediction, image, width)
+                else:
+                    legacyTime, legacyRet = timeIt(legacyPNGPostPrediction, image, width)
+            PDFFilters.NUMPY_MODULE = False
+            pythonTime, pythonRet = timeIt(PDFFilters.post_prediction, image, predictor, width, colors, bits)
+            if legacyTime != '-':
+                if legacyRet != pythonRet:
+                    sys.exit('Error: different output for predictor '+str(predictor)+'!!')
+                legacyTime = '%.3f' % legacyTime
+            numpyTime = '-'
+            if numpyAvailable:
+                PDFFilters.NUMPY_MODULE = True
+                numpyTime, numpyRet = timeIt(PDFFilters.post_prediction, image, predictor, width, colors, bits)
+                if numpyRet != pythonRet:
+                    sys.exit('Error: different output with NumPy for predictor '+str(predictor)+'!!')
+                numpyTime = '%.3f' % numpyTime
+            print('%6.1f %10d %6d %5d %11s %11.3f %11s' % (size, predictor, colors, bits, legacyTime, pythonTime, numpyTime))
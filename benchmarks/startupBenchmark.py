@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Benchmark of the startup time of the command line tool, each run in a new interpreter:
+        - python: the interpreter alone, as reference
+        - version: paranoiDF.py -v
+        - summary: loading the parser and getting the statistics of a small document, like the summary mode
+        - interactive: the same plus the interactive console (-i), leaving it with the exit command
+    The heavy optional modules loaded by each mode are also shown, they should only be loaded by the commands using them.
+
+    Usage: python benchmarks/startupBenchmark.py [-r repeats] [file.pdf]
+'''
+
+import json, optparse, os, subprocess, sys, tempfile, time
+rootDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, rootDir)
+from memoryBenchmark import makeDocument
+
+heavyModules = ['PyV8', 'jsbeautifier', 'pdfminer', 'redact', 'Image', 'PIL', 'bs4', 'numpy', 'apt', 'urllib3', 'urllib2', 'lxml']
+
+reportCode = '''
+import json, sys
+sys.stderr.write('\\nMODULES ' + json.dumps(sorted([name for name in %r if name in sys.modules])) + '\\n')
+''' % (heavyModules)
+
+modes = [('python', ''),
+         ('version', '''
+import runpy, sys
+sys.argv = ['paranoiDF.py', '-v']
+runpy.run_path('paranoiDF.py', run_name = '__main__')
+'''),
+         ('summary', '''
+import sys
+from PDFCore import PDFParser
+ret, pdf = PDFParser().parse(sys.argv[1])
+pdf.getStats()
+'''),
+         ('interactive', '''
+import sys
+from StringIO import StringIO
+from PDFCore import PDFParser
+from PDFConsole import PDFConsole
+ret, pdf = PDFParser().parse(sys.argv[1])
+PDFConsole(pdf, None, True, stdin = StringIO('exit\\n')).cmdloop()
+''')]
+
+def runMode(code, fileName):
+    '''
+        Runs the code of a mode in a new interpreter
+
+        @return: A tuple (seconds, heavyModulesLoaded)
+    '''
+    start = time.time()
+    process = subprocess.Popen([sys.executable, '-c', code + reportCode, fileName], cwd = rootDir, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+    output, errors = process.communicate()
+    elapsed = time.time() - start
+    if process.returncode != 0:
+        sys.exit('Error: ' + errors.strip())
+    loadedModules = None
+    for line in errors.splitlines():
+        if line.startswith('MODULES '):
+            loadedModules = json.loads(line[8:])
+    return elapsed, loadedModules
+
+if __name__ == '__main__':
+    argsParser = optparse.OptionParser(usage = 'Usage: python benchmarks/startupBenchmark.py [options] [file.pdf]')
+    argsParser.add_option('-r', '--repeats', action = 'store', type = 'int', dest = 'repeats', default = 10, help = 'Number of runs per mode (default: 10)')
+    (options, args) = argsParser.parse_args()
+    if args:
+        fileName = os.path.abspath(args[0])
+    else:
+        fileName = tempfile.mktemp(suffix = '.pdf')
+        open(fileName, 'wb').write(makeDocument(10))
+    try:
+        print('%-12s %10s %10s  %s' % ('mode', 'best (s)', 'median (s)', 'heavy modules'))
+        for name, code in modes:
+            times = []
+            for i in range(options.repeats):
+                elapsed, loadedModules = runMode(code, fileName)
+                times.append(elapsed)
+            times.sort()
+            print('%-12s %10.3f %10.3f  %s' % (name, times[0], times[len(times) // 2], ', '.join(loadedModules) or '-'))
+    finally:
+        if not args:
+            os.remove(fileName)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Benchmark of the token throughput of the pdfminer parsers, reading the same content stream:
+        - from a file, by fixed chunks of BUFSIZ bytes (as the parser used to do)
+        - from a file, by chunks growing up to MAXBUFSIZ bytes
+        - from a string and from a mmap, tokenized in place
+    The objects of a whole document are also parsed with PDFParser, reading the file by chunks and mapping it.
+
+    Usage: python benchmarks/tokenizerBenchmark.py [size_in_MB] [file.pdf]
+'''
+
+import mmap, os, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pdfminer.psparser import PSBaseParser, PSStackParser, PSEOF
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+
+class ContentParser(PSStackParser):
+    def flush(self):
+        self.add_results(*self.popall())
+
+def makeContent(size):
+    '''
+        Builds a page content stream with text, paths and images, like the ones of big documents
+
+        @param size: Approximate size in bytes
+        @return: The content (string)
+    '''
+    chunks = []
+    length = 0
+    i = 0
+    while length < size:
+        chunk = ('BT /F%d 12 Tf %d.5 %d Td [(Line number %d) -250 (of the \\(page\\)) 120 <48656c6c6f>] TJ ET\n'
+                 'q 1 0 0 1 %d %d cm 0.5 0.25 0 RG %d %d m %d %d l %.3f %.3f %d %d re S Q\n'
+                 '/Im%d Do %% comment %d\n') % (i % 8, i % 600, i % 800, i, i % 300, i % 400, i, i + 1, i + 2, i + 3, i / 7.0, i / 9.0, i % 50, i % 70, i % 16, i)
+        chunks.append(chunk)
+        length += len(chunk)
+        i += 1
+    return ''.join(chunks)
+
+def countTokens(parser, method):
+    '''
+        Reads all the tokens (or objects) of a parser
+
+        @param parser: The parser
+        @param method: 'nexttoken' or 'nextobject'
+        @return: The number of tokens (or objects)
+    '''
+    nextItem = getattr(parser, method)
+    count = 0
+    try:
+        while True:
+            nextItem()
+            count += 1
+    except PSEOF:
+        pass
+    return count
+
+def timeRun(function, repeats = 3):
+    '''
+        Runs a function several times, keeping the fastest run
+
+        @return: A tuple (result, seconds)
+    '''
+    bestTime = None
+    for i in range(repeats):
+        start = time.time()
+        result = function()
+        elapsed = time.time() - start
+        if bestTime == None or elapsed < bestTime:
+            bestTime = elapsed
+    return result, bestTime
+
+def parseDocument(fileName, mapped):
+    '''
+        Parses all the objects of a document
+
+        @return: The number of objects
+    '''
+    fp = open(fileName, 'rb')
+    try:
+        document = PDFDocument(PDFParser(fp, mapped = mapped), caching = False)
+        count = 0
+        for xref in document.xrefs:
+            for objectId in xref.get_objids():
+                try:
+                    document.getobj(objectId)
+                    count += 1
+                except Exception:
+                    pass
+        return count
+    finally:
+        fp.close()
+
+if __name__ == '__main__':
+    size = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    content = makeContent(int(size * 1024 * 1024))
+    fileName = tempfile.mktemp(suffix = '.ps')
+    open(fileName, 'wb').write(content)
+    try:
+        modes = [('file (fixed)', lambda klass: klass(open(fileName, 'rb')), True),
+                 ('file (adaptive)', lambda klass: klass(open(fileName, 'rb')), False),
+                 ('string', lambda klass: klass(content), False),
+                 ('mmap', lambda klass: klass(mmap.mmap(os.open(fileName, os.O_RDONLY), 0, access = mmap.ACCESS_READ)), False)]
+        print('Content stream of %d bytes' % len(content))
+        print('%-16s %9s %10s %12s %9s %10s %12s' % ('mode', 'tokens', 'seconds', 'tokens/s', 'objects', 'seconds', 'objects/s'))
+        for name, makeParser, fixed in modes:
+            if fixed:
+                PSBaseParser.MAXBUFSIZ = PSBaseParser.BUFSIZ
+            try:
+                numTokens, tokensTime = timeRun(lambda: countTokens(makeParser(PSBaseParser), 'nexttoken'))
+                numObjects, objectsTime = timeRun(lambda: countTokens(makeParser(ContentParser), 'nextobject'))
+            finally:
+                PSBaseParser.MAXBUFSIZ = 1024 * 1024
+            print('%-16s %9d %10.3f %12.0f %9d %10.3f %12.0f' % (name, numTokens, tokensTime, numTokens / tokensTime, numObjects, objectsTime, numObjects / objectsTime))
+    finally:
+        os.remove(fileName)
+
+    if len(sys.argv) > 2:
+        print('')
+        print('Document %s' % sys.argv[2])
+        print('%-16s %9s %10s' % ('mode', 'objects', 'seconds'))
+        for name, mapped in [('file', False), ('mmap', True)]:
+            numObjects, parsingTime = timeRun(lambda: parseDocument(sys.argv[2], mapped))
+            print('%-16s %9d %10.3f' % (name, numObjects, parsingTime))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Benchmark of JSAnalysis.unescape over heap spray payloads of several sizes, compared with the former fragment by fragment implementation
+    
+    Usage: python benchmarks/unescapeBenchmark.py [sizeInMB ...]
+'''
+
+import os, re, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from JSAnalysis import unescape, unescapeWithOffsets
+
+def legacyUnescape(escapedBytes, unicode = True):
+    '''
+        Former implementation of JSAnalysis.unescape, kept as reference
+    '''
+    unescapedBytes = ''
+    if unicode:
+        unicodePadding = '\x00'
+    else:
+        unicodePadding = ''
+    if escapedBytes.lower().find(r'\u') != -1:
+        splitBytes = escapedBytes.split('\\')
+    else:
+        splitBytes = escapedBytes.split('%')
+    for i in range(len(splitBytes)):
+        splitByte = splitBytes[i]
+        if splitByte == '':
+            continue
+        if len(splitByte) > 4 and re.match('u[0-9a-f]{4}',splitByte[:5],re.IGNORECASE):
+            unescapedBytes += chr(int(splitByte[3]+splitByte[4],16))+chr(int(splitByte[1]+splitByte[2],16))
+            for j in range(5,len(splitByte)):
+                unescapedBytes += splitByte[j] + unicodePadding
+        elif len(splitByte) > 1 and re.match('[0-9a-f]{2}',splitByte[:2],re.IGNORECASE):
+            unescapedBytes += chr(int(splitByte[0]+splitByte[1],16)) + unicodePadding
+            for j in range(2,len(splitByte)):
+                unescapedBytes += splitByte[j] + unicodePadding
+        else:
+            if i != 0:
+                unescapedBytes += '%' + unicodePadding
+            for j in range(len(splitByte)):
+                unescapedBytes += splitByte[j] + unicodePadding
+    return (0,unescapedBytes)
+
+def makeSpray(size):
+    '''
+        Builds a typical heap spray: a NOP sled, some shellcode and a long block of return addresses
+        
+        @param size: Approximate size of the escaped payload in bytes
+        @return: The escaped payload (string)
+    '''
+    shellcode = '%u4141%u4242%u4343%ue8fc%u0089%u0000%u8960%u31e5' * 4
+    block = '%u9090' * 512 + shellcode + '%u0c0c' * 1024
+    return block * max(1, size // len(block))
+
+def timeIt(function, payload):
+    start = time.time()
+    ret = function(payload)
+    return time.time() - start, ret
+
+if __name__ == '__main__':
+    sizes = [float(size) for size in sys.argv[1:]] or [1, 4, 16]
+    print('%10s %12s %12s %8s %10s' % ('size (MB)', 'legacy (s)', 'current (s)', 'speedup', 'regions'))
+    for size in sizes:
+        payload = makeSpray(int(size*1024*1024))
+        legacyTime, legacyRet = timeIt(legacyUnescape, payload)
+        currentTime, currentRet = timeIt(unescape, payload)
+        if legacyRet != currentRet:
+            sys.exit('Error: different output for a payload of '+str(size)+'MB!!')
+        regions = unescapeWithOffsets(payload)[1][1]
+        print('%10.1f %12.3f %12.3f %7.1fx %10d' % (size, legacyTime, currentTime, legacyTime/max(currentTime, 1e-6), len(regions)))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Benchmark of the VirusTotal lookups (PDFUtils.VTLookupService) against a local stub of the VirusTotal file report API, compared with one request per hash.
+    It also checks the batching, the memory and disk caches, the time to live of the reports and the handling of the quota errors (HTTP 204).
+
+    Usage: python benchmarks/vtBenchmark.py [num_hashes] [latency_ms]
+'''
+
+import hashlib, os, shutil, sys, tempfile, threading, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import json, urlparse
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+import PDFUtils
+
+class VTStubHandler(BaseHTTPRequestHandler):
+    '''
+        Answers like the VirusTotal file report API: a dictionary for one resource and a list for several ones, HTTP 204 when the quota is exceeded
+    '''
+    def do_POST(self):
+        server = self.server
+        parameters = urlparse.parse_qs(self.rfile.read(int(self.headers.getheader('content-length'))))
+        resources = parameters['resource'][0].split(',')
+        time.sleep(server.latency)
+        server.numRequests += 1
+        server.numResources += len(resources)
+        if server.quota != None:
+            if server.quota == 0:
+                self.send_response(204)
+                self.end_headers()
+                return
+            server.quota -= 1
+        reports = []
+        for resource in resources:
+            if int(resource[0], 16) % 2 == 0:
+                reports.append({'response_code':1, 'resource':resource, 'positives':int(resource[1], 16), 'total':50, 'scan_date':'2014-07-21 00:00:00', 'permalink':'https://www.virustotal.com/file/'+resource+'/analysis/', 'scans':{}})
+            else:
+                reports.append({'response_code':0, 'resource':resource, 'verbose_msg':'The requested resource is not among the finished, queued or pending scans'})
+        if len(reports) == 1:
+            reports = reports[0]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(reports))
+
+    def log_message(self, format, *args):
+        pass
+
+def startStubServer(latency):
+    '''
+        Starts the stub server in a background thread
+
+        @param latency: Number of seconds each request takes
+        @return: The HTTPServer instance, with the counters numRequests and numResources
+    '''
+    server = HTTPServer(('127.0.0.1', 0), VTStubHandler)
+    server.latency = latency
+    server.quota = None
+    server.numRequests = 0
+    server.numResources = 0
+    thread = threading.Thread(target = server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def legacyLookup(hashes, url):
+    '''
+        One request per hash, as done by the former PDFUtils.vtcheck
+    '''
+    return dict([(md5, PDFUtils.vtRequest([md5], 'key', url)) for md5 in hashes])
+
+def timeIt(function, *args):
+    start = time.time()
+    ret = function(*args)
+    return time.time() - start, ret
+
+def check(condition, message):
+    if not condition:
+        sys.exit('Error: '+message+'!!')
+
+if __name__ == '__main__':
+    numHashes = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000.0
+    server = startStubServer(latency)
+    url = 'http://127.0.0.1:%d/vtapi/v2/file/report' % server.server_port
+    hashes = [hashlib.md5(str(i)).hexdigest() for i in range(numHashes)]
+    # Repeated hashes, like the same stream found in several objects
+    hashes += hashes[:numHashes / 4]
+    cacheDir = tempfile.mkdtemp()
+    try:
+        print('%-28s %9s %10s %9s' % ('lookup', 'requests', 'time (s)', 'found'))
+
+        legacyTime, legacyResults = timeIt(legacyLookup, hashes, url)
+        print('%-28s %9d %10.3f %9d' % ('one request per hash', server.numRequests, legacyTime, len([r for r in legacyResults.values() if r[1][0]['response_code'] == 1])))
+
+        server.numRequests = 0
+        service = PDFUtils.VTLookupService('key', cacheDir, requestsPerMinute = 0, batchSize = 4, url = url)
+        lookupTime, results = timeIt(service.lookup, hashes)
+        check(server.numRequests == (numHashes + 3) / 4, 'the hashes have not been batched')
+        for md5 in hashes:
+            check(results[md5] == (0, legacyResults[md5][1][0]), 'different report for '+md5)
+        print('%-28s %9d %10.3f %9d' % ('batched', server.numRequests, lookupTime, len([r for r in results.values() if r[1]['response_code'] == 1])))
+
+        server.numRequests = 0
+        lookupTime, results = timeIt(service.lookup, hashes)
+        check(server.numRequests == 0, 'the memory cache has not been used')
+        print('%-28s %9d %10.3f %9d' % ('memory cache', server.numRequests, lookupTime, len([r for r in results.values() if r[1]['response_code'] == 1])))
+        service.close()
+
+        service = PDFUtils.VTLookupService('key', cacheDir, requestsPerMinute = 0, batchSize = 4, url = url)
+        lookupTime, results = timeIt(service.lookup, hashes)
+        check(server.numRequests == 0, 'the disk cache has not been used')
+        print('%-28s %9d %10.3f %9d' % ('disk cache', server.numRequests, lookupTime, len([r for r in results.values() if r[1]['response_code'] == 1])))
+        service.close()
+
+        service = PDFUtils.VTLookupService('key', cacheDir, cacheTTL = 0, requestsPerMinute = 0, batchSize = 4, url = url)
+        time.sleep(0.01)
+        lookupTime, results = timeIt(service.lookup, hashes)
+        check(server.numRequests == (numHashes + 3) / 4, 'the expired reports have been used')
+        print('%-28s %9d %10.3f %9d' % ('expired disk cache', server.numRequests, lookupTime, len([r for r in results.values() if r[1]['response_code'] == 1])))
+        service.close()
+
+        server.numRequests = 0
+        service = PDFUtils.VTLookupService('key', None, requestsPerMinute = 2, batchSize = 1, url = url)
+        lookupTime, results = timeIt(service.lookup, hashes[:3], 2)
+        check(server.numRequests == 2 and results[hashes[2]] == None, 'the requests per minute have not been limited')
+        print('%-28s %9d %10.3f %9d' % ('2 requests per minute', server.numRequests, lookupTime, len([r for r in results.values() if r != None and r[1]['response_code'] == 1])))
+        service.close()
+
+        server.quota = 0
+        service = PDFUtils.VTLookupService('key', None, requestsPerMinute = 0, url = url, maxRetries = 0)
+        ret = service.lookup(hashes[:1])[hashes[0]]
+        check(ret[0] == -1, 'the quota error has not been reported')
+        service.close()
+    finally:
+        shutil.rmtree(cacheDir)
+        server.shutdown()
@@ -182,6 +182,25 @@ def codeword(bits):
     return (int(bits, 2), len(bits))
 
 
+def lookup_table(codes, bits):
+    """
+    Builds a list indexed by the next `bits` bits of the stream, where each
+    code fills all the entries starting with it with (value, code length),
+    so a single probe replaces reading the code bit by bit.
+    """
+    table = [None] * (1 << bits)
+    for value, (code, length) in codes:
+        shift = bits - length
+        start = code << shift
+        for i in range(start, start + (1 << shift)):
+            table[i] = (value, length)
+    return table
+
+
+class CCITTFaxError(Exception):
+    pass
+
+
 class CCITTFax(object):
     """ """
 
@@ -366,7 +385,7 @@ class CCITTFax(object):
         2112: codeword("000000010100"),
         2176: codeword("000000010101"),
         2240: codeword("000000010110"),
-        2340: codeword("000000010111"),
+        2304: codeword("000000010111"),
         2368: codeword("000000011100"),
         2432: codeword("000000011101"),
         2496: codeword("000000011110"),
@@ -413,7 +432,7 @@ class CCITTFax(object):
         2112: codeword("000000010100"),
         2176: codeword("000000010101"),
         2240: codeword("000000010110"),
-        2340: codeword("000000010111"),
+        2304: codeword("000000010111"),
         2368: codeword("000000011100"),
         2432: codeword("000000011101"),
         2496: codeword("000000011110"),
@@ -424,11 +443,45 @@ class CCITTFax(object):
         (v, k) for k, v in BLACK_CONFIGURATION_ENCODE_TABLE.items()
     )
 
+    WHITE_RUN_BITS = 12
+    WHITE_RUN_TABLE = lookup_table(
+        list(WHITE_TERMINAL_ENCODE_TABLE.items())
+        + list(WHITE_CONFIGURATION_ENCODE_TABLE.items()),
+        WHITE_RUN_BITS,
+    )
+
+    BLACK_RUN_BITS = 13
+    BLACK_RUN_TABLE = lookup_table(
+        list(BLACK_TERMINAL_ENCODE_TABLE.items())
+        + list(BLACK_CONFIGURATION_ENCODE_TABLE.items()),
+        BLACK_RUN_BITS,
+    )
+
+    # two-dimensional modes: vertical modes are the offset a1 - b1
+    MODE_PASS = "p"
+    MODE_HORIZONTAL = "h"
+    MODE_ENCODE_TABLE = {
+        0: codeword("1"),
+        1: codeword("011"),
+        -1: codeword("010"),
+        MODE_HORIZONTAL: codeword("001"),
+        MODE_PASS: codeword("0001"),
+        2: codeword("000011"),
+        -2: codeword("000010"),
+        3: codeword("0000011"),
+        -3: codeword("0000010"),
+    }
+
+    MODE_BITS = 7
+    MODE_TABLE = lookup_table(list(MODE_ENCODE_TABLE.items()), MODE_BITS)
+
     def __init__(
         self,
     ):
         """ """
-        self._decoded = []
+        self._data = None
+        self._pos = 0
+        self._size = 0
 
     def decode(
         self,
@@ -442,108 +495,213 @@ class CCITTFax(object):
         blackIs1=False,
         damagedRowsBeforeError=0,
     ):
-        """ """
-        # FIXME seems not stick to the spec? default is false, but if not set as true, it won't decode 6cc2a162e08836f7d50d461a9fc136fe correctly
-        byteAlign = True
-
-        if blackIs1:
-            white, black = 0, 1
-        else:
-            white, black = 1, 0
-
-        bitr = BitReader(stream)
-        bitw = BitWriter()
-
-        while not (bitr.eod_p or rows == 0):
-
-            current_color = white
-            if byteAlign and bitr.pos % 8 != 0:
-                bitr.pos += 8 - (bitr.pos % 8)
-
-            if eob and bitr.peek(self.RTC[1]) == self.RTC[0]:
-                bitr.pos += self.RTC[1]
-                break
-
-            if bitr.peek(self.EOL[1]) != self.EOL[0]:
-                if eol:
-                    raise (
-                        Exception,
-                        "No end-of-line pattern found (at bit pos %d/%d)"
-                        % (bitr.pos, bitr.size),
-                    )
+        """
+        Decodes a CCITT stream: Group 3 one-dimensional (k = 0), Group 3
+        mixed (k > 0) or Group 4 two-dimensional (k < 0). Rows are kept as
+        lists of changing elements and written to a bytearray bitmap, one
+        byte aligned row each. Decoding stops after `rows` rows (if not 0),
+        at the end of block or end of data, or at the first damaged row
+        once some rows have been decoded.
+        """
+        self._data = bytearray(stream) + bytearray(8)
+        self._pos = 0
+        self._size = len(stream) << 3
+
+        output = bytearray()
+        row_size = (columns + 7) >> 3
+        ones = bytearray(b"\xff" * row_size)
+        first_one = 1 if blackIs1 else 0
+        ref_line = [columns]
+        decoded_rows = 0
+
+        while self._pos < self._size and (rows <= 0 or decoded_rows < rows):
+            if k < 0:
+                if byteAlign:
+                    self._align()
+                if self._peek(12) == 1:
+                    self._pos += 12
+                    if self._peek(12) == 1:
+                        break
             else:
-                bitr.pos += self.EOL[1]
-
-            line_length = 0
-            while line_length < columns:
-                if current_color == white:
-                    bit_length = self.get_white_bits(bitr)
+                eols = self._skip_eols(byteAlign)
+                if eols == 0 and byteAlign:
+                    self._align()
+                    eols = self._skip_eols(byteAlign)
+                if eols == 0:
+                    if eol:
+                        if decoded_rows == 0:
+                            raise CCITTFaxError(
+                                "No end-of-line pattern found (at bit pos %d/%d)"
+                                % (self._pos, self._size)
+                            )
+                        break
+                elif eob and eols > 1:
+                    break
+            if self._pos >= self._size:
+                break
+            try:
+                if k < 0:
+                    two_dimensional = True
+                elif k > 0:
+                    two_dimensional = not self._read(1)
                 else:
-                    bit_length = self.get_black_bits(bitr)
-                if bit_length == None:
-                    raise (
-                        Exception,
-                        "Unfinished line (at bit pos %d/%d), %s"
-                        % (bitr.pos, bitr.size, bitw.data),
-                    )
-
-                line_length += bit_length
-                if line_length > columns:
-                    raise (
-                        Exception,
-                        "Line is too long (at bit pos %d/%d)" % (bitr.pos, bitr.size),
-                    )
-
-                bitw.write((current_color << bit_length) - current_color, bit_length)
-
-                current_color ^= 1
-
-            rows -= 1
-        return bitw.data
-
-    def get_white_bits(self, bitr):
-        """ """
-        return self.get_color_bits(
-            bitr,
-            self.WHITE_CONFIGURATION_DECODE_TABLE,
-            self.WHITE_TERMINAL_DECODE_TABLE,
-        )
+                    two_dimensional = False
+                if two_dimensional:
+                    line = self._decode_2d_line(ref_line, columns)
+                else:
+                    line = self._decode_1d_line(columns)
+            except CCITTFaxError:
+                if decoded_rows == 0:
+                    raise
+                break
 
-    def get_black_bits(self, bitr):
+            row = bytearray(row_size)
+            start = 0
+            for i in range(len(line)):
+                end = line[i]
+                if i & 1 == first_one and start < end:
+                    first_byte, last_byte = start >> 3, (end - 1) >> 3
+                    first_mask = 0xFF >> (start & 7)
+                    last_mask = (0xFF << (7 - ((end - 1) & 7))) & 0xFF
+                    if first_byte == last_byte:
+                        row[first_byte] |= first_mask & last_mask
+                    else:
+                        row[first_byte] |= first_mask
+                        row[first_byte + 1 : last_byte] = ones[: last_byte - first_byte - 1]
+                        row[last_byte] |= last_mask
+                start = end
+            output += row
+            ref_line = line
+            decoded_rows += 1
+        return bytes(output)
+
+    def _peek(self, length):
+        """returns the next `length` (<= 16) bits without consuming them"""
+        pos = self._pos
+        i = pos >> 3
+        data = self._data
+        word = (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+        return (word >> (24 - (pos & 7) - length)) & ((1 << length) - 1)
+
+    def _read(self, length):
         """ """
-        return self.get_color_bits(
-            bitr,
-            self.BLACK_CONFIGURATION_DECODE_TABLE,
-            self.BLACK_TERMINAL_DECODE_TABLE,
-        )
+        bits = self._peek(length)
+        self._pos += length
+        return bits
 
-    def get_color_bits(self, bitr, config_words, term_words):
+    def _align(self):
         """ """
-        bits = 0
-        check_conf = True
-
-        while check_conf:
-            check_conf = False
-
-            for i in xrange(2, 14):
-                codeword = bitr.peek(i)
-                config_value = config_words.get((codeword, i), None)
-
-                if config_value is not None:
-                    bitr.pos += i
-                    bits += config_value
-                    if config_value == 2560:
-                        check_conf = True
-                    break
-
-            for i in xrange(2, 14):
-                codeword = bitr.peek(i)
-                term_value = term_words.get((codeword, i), None)
-
-                if term_value is not None:
-                    bitr.pos += i
-                    bits += term_value
-
-                    return bits
-
-        return None
+        self._pos = (self._pos + 7) & ~7
+
+    def _skip_eols(self, byteAlign=False):
+        """
+        skips fill bits and consecutive EOL codes, returning how many were
+        found. With byteAlign, EOL codes must begin or end on a byte boundary,
+        so the padding of a line and the first zeros of the next one are not
+        taken for an EOL.
+        """
+        eols = 0
+        pos = self._pos
+        while self._pos < self._size:
+            code = self._peek(12)
+            if code == 0:
+                self._pos += 1
+            elif code == 1 and (
+                not byteAlign or self._pos & 7 == 0 or (self._pos + 12) & 7 == 0
+            ):
+                self._pos += 12
+                eols += 1
+                pos = self._pos
+            else:
+                break
+        self._pos = pos
+        return eols
+
+    def _read_run(self, table, bits):
+        """reads makeup codes and one terminating code, returning the run length"""
+        run = 0
+        while True:
+            entry = table[self._peek(bits)]
+            if entry is None or self._pos > self._size:
+                raise CCITTFaxError(
+                    "Invalid run code (at bit pos %d/%d)" % (self._pos, self._size)
+                )
+            self._pos += entry[1]
+            run += entry[0]
+            if entry[0] < 64:
+                return run
+
+    def _decode_1d_line(self, columns):
+        """decodes a line of alternate white and black runs"""
+        line = []
+        a0 = 0
+        white = True
+        while a0 < columns:
+            if white:
+                a0 += self._read_run(self.WHITE_RUN_TABLE, self.WHITE_RUN_BITS)
+            else:
+                a0 += self._read_run(self.BLACK_RUN_TABLE, self.BLACK_RUN_BITS)
+            a0 = min(a0, columns)
+            line.append(a0)
+            white = not white
+        return line
+
+    def _decode_2d_line(self, ref_line, columns):
+        """decodes a line coded against the changing elements of the reference line"""
+        ref = ref_line + [columns, columns, columns]
+        data, size = self._data, self._size
+        mode_table, mode_shift = self.MODE_TABLE, 24 - self.MODE_BITS
+        line = []
+        a0 = -1
+        color = 0
+        b_index = 0
+        while a0 < columns:
+            # b1 is the first changing element of the reference line to the
+            # right of a0 and to the opposite color, b2 the next one
+            while b_index > 0 and ref[b_index - 1] > a0:
+                b_index -= 1
+            while ref[b_index] <= a0:
+                b_index += 1
+            if b_index & 1 != color:
+                b_index += 1
+            b1 = ref[b_index]
+
+            # inlined self._peek(self.MODE_BITS)
+            pos = self._pos
+            i = pos >> 3
+            word = (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+            entry = mode_table[((word << (pos & 7)) & 0xFFFFFF) >> mode_shift]
+            if entry is None or pos > size:
+                raise CCITTFaxError(
+                    "Invalid mode code (at bit pos %d/%d)" % (pos, size)
+                )
+            self._pos = pos + entry[1]
+            mode = entry[0]
+            if mode == self.MODE_PASS:
+                a0 = ref[b_index + 1]
+            elif mode == self.MODE_HORIZONTAL:
+                if color == 0:
+                    run1 = self._read_run(self.WHITE_RUN_TABLE, self.WHITE_RUN_BITS)
+                    run2 = self._read_run(self.BLACK_RUN_TABLE, self.BLACK_RUN_BITS)
+                else:
+                    run1 = self._read_run(self.BLACK_RUN_TABLE, self.BLACK_RUN_BITS)
+                    run2 = self._read_run(self.WHITE_RUN_TABLE, self.WHITE_RUN_BITS)
+                a1 = min(max(a0, 0) + run1, columns)
+                a0 = min(a1 + run2, columns)
+                line.append(a1)
+                line.append(a0)
+            else:
+                a1 = b1 + mode
+                if a1 < a0:
+                    a1 = a0
+                if a1 < 0:
+                    a1 = 0
+                elif a1 > columns:
+                    a1 = columns
+                line.append(a1)
+                a0 = a1
+                color ^= 1
+        if not line or line[-1] < columns:
+            # a pass mode ended the line, the last run goes to the end
+            line.append(columns)
+        return line
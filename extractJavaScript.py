@@ -49,7 +49,6 @@ Updated 2013-04-11 Thanks for the contributions from David Dorsey of visiblerisk
 from hashlib import md5, sha256
 import base64
 import binascii
-import cStringIO
 import Crypto.Cipher.ARC4 as ARC4
 import Crypto.Cipher.AES as AES
 import html
@@ -397,7 +396,7 @@ class pdfobj:
     @staticmethod
     def lzwdecode(input):
         try:
-            return ''.join(lzw.LZWDecoder(cStringIO.StringIO(input)).run())
+            return lzw.lzwdecode(input)
         except:
             return input
 
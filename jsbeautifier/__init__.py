@@ -2,6 +2,7 @@ import sys
 import getopt
 import re
 import string
+import math
 
 #
 # Originally written by Einar Lielmanis et al.,
@@ -29,6 +30,18 @@ import string
 #
 # Here are the available options: (read source)
 
+# Precompiled scanners used by the tokenizer, so long words, strings,
+# comments and whitespace runs are consumed in one step instead of one
+# character at a time.
+re_whitespace = re.compile('[\n\r\t ]*')
+re_word = re.compile('[a-zA-Z0-9_$]*')
+re_line_end = re.compile('[\r\n]')
+re_string_body = {
+    "'": re.compile(r"[^'\\]*(?:\\[\s\S][^'\\]*)*"),
+    '"': re.compile(r'[^"\\]*(?:\\[\s\S][^"\\]*)*'),
+    '/': re.compile(r'[^/\\\[]*(?:(?:\\[\s\S]|\[[^\]\\]*(?:\\[\s\S][^\]\\]*)*\])[^/\\\[]*)*'),
+}
+
 
 class BeautifierOptions:
     def __init__(self):
@@ -238,7 +251,7 @@ class Beautifier:
             self.last_type = token_type
             self.last_text = token_text
 
-        sweet_code = self.preindent_string + re.sub('[\n ]+$', '', ''.join(self.output))
+        sweet_code = self.preindent_string + ''.join(self.output).rstrip('\n ')
         return sweet_code
 
     def unpack(self, source, evalcode=False):
@@ -409,16 +422,17 @@ class Beautifier:
                         self.output.append(' ')
 
         else: # not keep_whitespace
-            while c in self.whitespace:
-                if c == '\n':
-                    if self.opts.max_preserve_newlines == 0 or self.opts.max_preserve_newlines > self.n_newlines:
-                        self.n_newlines += 1
+            if c in self.whitespace:
+                whitespace_end = re_whitespace.match(self.input, parser_pos).end()
+                self.n_newlines = self.input.count('\n', parser_pos - 1, whitespace_end)
+                if self.opts.max_preserve_newlines != 0:
+                    self.n_newlines = min(self.n_newlines, int(math.ceil(self.opts.max_preserve_newlines)))
 
-                if parser_pos >= len(self.input):
+                if whitespace_end >= len(self.input):
                     return '', 'TK_EOF'
 
-                c = self.input[parser_pos]
-                parser_pos += 1
+                c = self.input[whitespace_end]
+                parser_pos = whitespace_end + 1
 
             if self.opts.preserve_newlines and self.n_newlines > 1:
                 for i in range(self.n_newlines):
@@ -429,12 +443,9 @@ class Beautifier:
 
 
         if c in self.wordchar:
-            if parser_pos < len(self.input):
-                while self.input[parser_pos] in self.wordchar:
-                    c = c + self.input[parser_pos]
-                    parser_pos += 1
-                    if parser_pos == len(self.input):
-                        break
+            word_end = re_word.match(self.input, parser_pos).end()
+            c += self.input[parser_pos:word_end]
+            parser_pos = word_end
 
             # small and surprisingly unugly hack for 1E-10 representation
             if parser_pos != len(self.input) and self.input[parser_pos] in '+-' \
@@ -477,30 +488,24 @@ class Beautifier:
             comment = ''
             inline_comment = True
             comment_mode = 'TK_INLINE_COMMENT'
-            if self.input[parser_pos] == '*': # peek /* .. */ comment
+            if parser_pos < len(self.input) and self.input[parser_pos] == '*': # peek /* .. */ comment
                 parser_pos += 1
-                if parser_pos < len(self.input):
-                    while not (self.input[parser_pos] == '*' and \
-                               parser_pos + 1 < len(self.input) and \
-                               self.input[parser_pos + 1] == '/')\
-                          and parser_pos < len(self.input):
-                        c = self.input[parser_pos]
-                        comment += c
-                        if c in '\r\n':
-                            comment_mode = 'TK_BLOCK_COMMENT'
-                        parser_pos += 1
-                        if parser_pos >= len(self.input):
-                            break
-                parser_pos += 2
+                comment_end = self.input.find('*/', parser_pos)
+                if comment_end == -1:
+                    comment_end = len(self.input)
+                comment = self.input[parser_pos:comment_end]
+                if re_line_end.search(comment):
+                    comment_mode = 'TK_BLOCK_COMMENT'
+                parser_pos = comment_end + 2
                 return '/*' + comment + '*/', comment_mode
-            if self.input[parser_pos] == '/': # peek // comment
-                comment = c
-                while self.input[parser_pos] not in '\r\n':
-                    comment += self.input[parser_pos]
-                    parser_pos += 1
-                    if parser_pos >= len(self.input):
-                        break
-                parser_pos += 1
+            if parser_pos < len(self.input) and self.input[parser_pos] == '/': # peek // comment
+                line_end = re_line_end.search(self.input, parser_pos)
+                if line_end:
+                    comment_end = line_end.start()
+                else:
+                    comment_end = len(self.input)
+                comment = c + self.input[parser_pos:comment_end]
+                parser_pos = comment_end + 1
                 if self.wanted_newline:
                     self.append_newline()
                 return comment, 'TK_COMMENT'
@@ -517,46 +522,25 @@ class Beautifier:
              in_char_class = False
 
              if parser_pos < len(self.input):
-                if sep == '/':
-                    # handle regexp
-                    in_char_class = False
-                    while esc or in_char_class or self.input[parser_pos] != sep:
-                        resulting_string += self.input[parser_pos]
-                        if not esc:
-                            esc = self.input[parser_pos] == '\\'
-                            if self.input[parser_pos] == '[':
-                                in_char_class = True
-                            elif self.input[parser_pos] == ']':
-                                in_char_class = False
-                        else:
-                            esc = False
-                        parser_pos += 1
-                        if parser_pos >= len(self.input):
-                            # incomplete regex when end-of-file reached
-                            # bail out with what has received so far
-                            return resulting_string, 'TK_STRING'
-                else:
-                    # handle string
-                    while esc or self.input[parser_pos] != sep:
-                        resulting_string += self.input[parser_pos]
-                        if not esc:
-                            esc = self.input[parser_pos] == '\\'
-                        else:
-                            esc = False
-                        parser_pos += 1
-                        if parser_pos >= len(self.input):
-                            # incomplete string when end-of-file reached
-                            # bail out with what has received so far
-                            return resulting_string, 'TK_STRING'
+                # handle string or regexp (escaped chars and regexp char classes included)
+                string_end = re_string_body[sep].match(self.input, parser_pos).end()
+                if string_end >= len(self.input) or self.input[string_end] != sep:
+                    # incomplete string when end-of-file reached
+                    # bail out with what has received so far
+                    resulting_string += self.input[parser_pos:]
+                    parser_pos = len(self.input)
+                    return resulting_string, 'TK_STRING'
+                resulting_string += self.input[parser_pos:string_end]
+                parser_pos = string_end
 
 
              parser_pos += 1
              resulting_string += sep
              if sep == '/':
                  # regexps may have modifiers /regexp/MOD, so fetch those too
-                 while parser_pos < len(self.input) and self.input[parser_pos] in self.wordchar:
-                     resulting_string += self.input[parser_pos]
-                     parser_pos += 1
+                 modifiers_end = re_word.match(self.input, parser_pos).end()
+                 resulting_string += self.input[parser_pos:modifiers_end]
+                 parser_pos = modifiers_end
              return resulting_string, 'TK_STRING'
 
         if c == '#':
@@ -59,37 +59,74 @@ __author__ = 'Didier Stevens'
 __version__ = '0.1.4'
 __date__ = '2012/02/25'
 
+import os
 import sys
 import zlib
+import binascii
 import platform
 
 def SplitByLength(input, length):
-    result = []
-    while len(input) > length:
-        result.append(input[0:length] + '\n')
-        input = input[length:]
-    result.append(input + '>')
+    result = [input[i:i+length] + '\n' for i in range(0, len(input) - length, length)]
+    result.append(input[len(result)*length:] + '>')
     return result
 
 class cPDF:
-    def __init__(self, filename):
+    def __init__(self, filename, buffered=False):
+        """
+        With buffered=True the document is built in memory and written
+        with one write when xrefAndTrailer (or flush) is called, instead
+        of opening the file for every append
+        """
         self.filename = filename
         self.indirectObjects = {}
+        self.buffered = buffered
+        self.chunks = []
+        self.offset = None
+        self.truncate = False
     
     def appendString(self, str):
+        if self.buffered:
+            if self.IsWindows():
+                str = str.replace('\n', '\r\n')
+            if sys.version_info[0] != 2:
+                str = str.encode('latin-1')
+            self.appendChunk(str)
+            return
         fPDF = open(self.filename, 'a')
         fPDF.write(str)
         fPDF.close()
 
     def appendBinary(self, str):
+        if sys.version_info[0] != 2 and not isinstance(str, bytes):
+            str = bytes(str, 'ascii')
+        if self.buffered:
+            self.appendChunk(str)
+            return
         fPDF = open(self.filename, 'ab')
-        if sys.version_info[0] == 2:
-            fPDF.write(str)
+        fPDF.write(str)
+        fPDF.close()
+
+    def appendChunk(self, data):
+        if self.offset == None:
+            self.offset = self.filesize()
+        self.chunks.append(data)
+        self.offset += len(data)
+
+    def flush(self):
+        if self.truncate:
+            fPDF = open(self.filename, 'wb')
         else:
-            fPDF.write(bytes(str, 'ascii'))
+            fPDF = open(self.filename, 'ab')
+        fPDF.write(b''.join(self.chunks))
         fPDF.close()
+        self.chunks = []
+        self.truncate = False
 
     def filesize(self):
+        if self.offset != None:
+            return self.offset
+        if self.buffered and not os.path.exists(self.filename):
+            return 0
         fPDF = open(self.filename, 'rb')
         fPDF.seek(0, 2)
         size = fPDF.tell()
@@ -100,6 +137,12 @@ class cPDF:
         return platform.system() in ('Windows', 'Microsoft')
         
     def header(self):
+        if self.buffered:
+            self.chunks = []
+            self.offset = 0
+            self.truncate = True
+            self.appendString("%PDF-1.1\n")
+            return
         fPDF = open(self.filename, 'w')
         fPDF.write("%PDF-1.1\n")
         fPDF.close()
@@ -120,14 +163,10 @@ class cPDF:
         self.appendString("\nendstream\nendobj\n")
 
     def Data2HexStr(self, data):
-        hex = ''
         if sys.version_info[0] == 2:
-            for b in data:
-                hex += "%02x" % ord(b)
+            return binascii.hexlify(data)
         else:
-            for b in data:
-                hex += "%02x" % b
-        return hex
+            return binascii.hexlify(data).decode('ascii')
 
     def stream2(self, index, version, streamdata, entries="", filters=""):
         """
@@ -215,6 +254,8 @@ class cPDF:
     def xrefAndTrailer(self, root, info=None):
         xrefdata = self.xref()
         self.trailer(xrefdata[0], xrefdata[1], root, info)
+        if self.buffered:
+            self.flush()
 
     def template1(self):
         self.indirectobject(1, 0, "<<\n /Type /Catalog\n /Outlines 2 0 R\n /Pages 3 0 R\n>>")
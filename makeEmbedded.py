@@ -82,7 +82,7 @@ def CreatePDFWithEmbeddedFile(pdfFileName, embeddedFileName, embeddedFileContent
     """Create a PDF document with an embedded file
     """
     
-    oPDF = mPDF.cPDF(pdfFileName)
+    oPDF = mPDF.cPDF(pdfFileName, buffered=True)
 
     oPDF.header()
     
@@ -51,7 +51,7 @@
 import mPDF
 
 def main(option, outputFile):
-	oPDF = mPDF.cPDF(outputFile)
+	oPDF = mPDF.cPDF(outputFile, buffered=True)
 
 	oPDF.header()
 
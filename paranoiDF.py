@@ -43,15 +43,11 @@ import sys
 import os
 import optparse
 import re
-import urllib3
 import datetime
 import hashlib
 import traceback
 import subprocess
-import apt
 from datetime import datetime
-from PDFCore import PDFParser, vulnsDict
-from PDFUtils import vtcheck
 
 VT_KEY = '5fe2cd854c51a2b0a3beb07e3cb0ef3ab40590637a1c862f3c7728c9bbafa814'
 
@@ -65,6 +61,7 @@ def getRepPaths(url, path = ''):
     paths = []
     dumbReDirs = '<li><a[^>]*?>(.*?)/</a></li>'
     dumbReFiles = '<li><a[^>]*?>([^/]*?)</a></li>'
+    import urllib3
     
     try:
         browsingPage = urllib3.urlopen(url+path).read()
@@ -197,9 +194,10 @@ def getPeepXML(statsDict, version, revision):
         actions = statsVersion['Actions']
         events = statsVersion['Events']
         vulns = statsVersion['Vulns']
+        shellcode = statsVersion['Shellcode']
         elements = statsVersion['Elements']
         suspicious = etree.SubElement(versionInfo, 'suspicious_elements')
-        if events != None or actions != None or vulns != None or elements != None:
+        if events != None or actions != None or vulns != None or shellcode != None or elements != None:
             if events != None:
                 triggers = etree.SubElement(suspicious, 'triggers')
                 for event in events:
@@ -236,6 +234,12 @@ def getPeepXML(statsDict, version, revision):
                             cve.text = vulnCVE
                     for id in vulns[vuln]:
                         etree.SubElement(vulnInfo, 'container_object', id = str(id))
+            if shellcode != None:
+                shellcodeList = etree.SubElement(suspicious, 'shellcode')
+                for finding in shellcode:
+                    findingInfo = etree.SubElement(shellcodeList, 'finding', name = finding)
+                    for id in shellcode[finding]:
+                        etree.SubElement(findingInfo, 'container_object', id = str(id))
         urls = statsVersion['URLs']
         suspiciousURLs = etree.SubElement(versionInfo, 'suspicious_urls')
         if urls != None:
@@ -274,10 +278,23 @@ argsParser.add_option('-i', '--interactive', action='store_true', dest='isIntera
 argsParser.add_option('-t', '--text-display', action='store_true', dest='isTextDisplay', default=False, help='Renders the text of the PDF.')
 argsParser.add_option('-u', '--url', action='store_true', dest='isFetchUrl', default=False, help='Fetch PDF from URL.')
 argsParser.add_option('-s', '--load-script', action='store', type='string', dest='scriptFile', help='Loads the commands stored in the specified file and execute them.')
+argsParser.add_option('--script-threads', action='store', type='int', dest='scriptThreads', default=4, help='Number of threads running the independent read-only commands of the script (4 by default).')
 argsParser.add_option('-c', '--check-vt', action='store_true', dest='checkOnVT', default=False, help='Checks the hash of the PDF file on VirusTotal.')
+argsParser.add_option('--vt-cache', action='store', type='string', dest='vtCacheDir', help='Stores the VirusTotal reports in the specified directory to reuse them for one day.')
+argsParser.add_option('--vt-rate', action='store', type='int', dest='vtRate', default=4, help='Maximum number of requests per minute sent to VirusTotal (4 by default, the public API quota).')
 argsParser.add_option('-f', '--force-mode', action='store_true', dest='isForceMode', default=False, help='Sets force parsing mode to ignore errors.')
 argsParser.add_option('-l', '--loose-mode', action='store_true', dest='isLooseMode', default=False, help='Sets loose parsing mode to catch malformed objects.')
 argsParser.add_option('-m', '--manual-analysis', action='store_true', dest='isManualAnalysis', default=False, help='Avoids automatic Javascript analysis. Useful with eternal loops like heap spraying.')
+argsParser.add_option('-j', '--js-workers', action='store', type='int', dest='jsWorkers', default=0, help='Analyses the Javascript code in the specified number of sandboxed worker processes, with time and memory limits per job.')
+argsParser.add_option('--js-cache', action='store', type='string', dest='jsCacheDir', help='Stores the Javascript analysis results in the specified directory to reuse them for repeated payloads.')
+argsParser.add_option('--spill-streams', action='store', type='int', dest='spillThreshold', help='Keeps the streams bigger than the specified number of megabytes in temporary files instead of memory.')
+argsParser.add_option('--profile', action='store_true', dest='isProfiling', default=False, help='Measures the time spent in each parsing phase and shows the slowest objects.')
+argsParser.add_option('--profile-json', action='store', type='string', dest='profileFile', help='Stores the profiling results of the parsing phases in the specified JSON file.')
+argsParser.add_option('--serve', action='store', type='string', dest='serviceAddress', help='Starts the analysis service, listening on the specified Unix socket path or HTTP port ([host:]port), and parses the files sent to it in a pool of worker processes.')
+argsParser.add_option('--workers', action='store', type='int', dest='serviceWorkers', help='Number of worker processes of the analysis service (number of CPUs by default).')
+argsParser.add_option('--queue', action='store', type='int', dest='serviceQueue', help='Maximum number of files waiting for a worker in the analysis service, the rest are rejected (twice the number of workers by default).')
+argsParser.add_option('--serve-root', action='store', type='string', dest='serviceRoot', help='Allows the analysis service to parse the files inside the specified directory by path (GET /analyse?file=), disabled by default.')
+argsParser.add_option('--timeout', action='store', type='int', dest='serviceTimeout', default=60, help='Maximum number of seconds spent parsing a file in the analysis service (60 by default).')
 argsParser.add_option('-g', '--grinch-mode', action='store_true', dest='avoidColors', default=False, help='Avoids colorized output in the interactive console.')
 argsParser.add_option('-v', '--version', action='store_true', dest='version', default=False, help='Shows program\'s version number.')
 argsParser.add_option('-x', '--xml', action='store_true', dest='xmlOutput', default=False, help='Shows the document information in XML format.')
@@ -303,18 +320,47 @@ try:
         print(paranoiDFHeader)
           
     else:
+        # The parser (and the modules it needs) is only loaded when there is something to analyse
+        from PDFCore import PDFParser, vulnsDict, enableStreamSpilling, enableProfiling
+        from PDFUtils import enableVTLookupService, getVTLookupService
+        from JSAnalysis import JSAnalysisPool, enableJSCache
 
         if len(args) == 1:
             if not options.isFetchUrl:
                 fileName = args[0]
             if not os.path.exists(fileName):
                 sys.exit('Error: The file "'+fileName+'" does not exist!!')
-        elif len(args) > 1 or (len(args) == 0 and not options.isInteractive and not options.scriptFile):
+        elif len(args) > 1 or (len(args) == 0 and not options.isInteractive and not options.scriptFile and not options.serviceAddress):
             sys.exit(argsParser.print_help())
             
         if options.scriptFile != None:
             if not os.path.exists(options.scriptFile):
                 sys.exit('Error: The script file "'+options.scriptFile+'" does not exist!!')	         
+
+        if options.checkOnVT or options.vtCacheDir != None or options.vtRate != 4:
+            # Lookups of the -c option and the vtcheck command share the cache and the rate limit
+            enableVTLookupService(VT_KEY, options.vtCacheDir, requestsPerMinute = options.vtRate)
+
+        if options.serviceAddress != None:
+            from PDFService import PDFAnalysisPool, startService
+            if options.jsCacheDir != None:
+                enableJSCache(options.jsCacheDir)
+            if options.spillThreshold != None:
+                enableStreamSpilling(options.spillThreshold * 1024 * 1024)
+            pool = PDFAnalysisPool(options.serviceWorkers, options.serviceQueue, options.serviceTimeout, forceMode = options.isForceMode, looseMode = options.isLooseMode, manualAnalysis = options.isManualAnalysis)
+            ret = startService(options.serviceAddress, pool, fileRoot = options.serviceRoot)
+            if ret[0] == -1:
+                sys.exit('Error: ' + ret[1] + '!!')
+            server = ret[1]
+            print('Analysis service listening on ' + options.serviceAddress + ' with ' + str(pool.numWorkers) + ' workers')
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            server.server_close()
+            if not isinstance(server.server_address, tuple):
+                os.remove(server.server_address)
+            sys.exit()
 	  
 ##################################################################################################
 
@@ -343,11 +389,25 @@ try:
 
         if fileName != None:
             pdfParser = PDFParser()
-            ret,pdf = pdfParser.parse(fileName, options.isForceMode, options.isLooseMode, options.isManualAnalysis)
+            if options.jsCacheDir != None:
+                enableJSCache(options.jsCacheDir)
+            if options.spillThreshold != None:
+                enableStreamSpilling(options.spillThreshold * 1024 * 1024)
+            if options.isProfiling or options.profileFile != None:
+                enableProfiling()
+            jsPool = None
+            if options.jsWorkers > 0 and not options.isManualAnalysis:
+                jsPool = JSAnalysisPool(options.jsWorkers)
+            vtJob = None
             if options.checkOnVT:
-                # Checks the MD5 on VirusTotal
-                md5Hash = pdf.getMD5()
-                ret = vtcheck(md5Hash, VT_KEY)
+                # Checks the MD5 on VirusTotal while the file is parsed
+                md5Hash = hashlib.md5(open(fileName, 'rb').read()).hexdigest()
+                vtJob = getVTLookupService(VT_KEY).submit(md5Hash)
+            ret,pdf = pdfParser.parse(fileName, options.isForceMode, options.isLooseMode, options.isManualAnalysis, jsPool)
+            if jsPool != None:
+                jsPool.close()
+            if vtJob != None:
+                ret = vtJob.getResult()
                 if ret[0] == -1:
                     pdf.addError(ret[1])
                 else:
@@ -365,12 +425,17 @@ try:
                     else:
                         pdf.addError('Bad response from VirusTotal!!')
             statsDict = pdf.getStats()
+            if options.profileFile != None:
+                open(options.profileFile, 'w').write(pdf.getProfile().toJSON())
         
         if options.xmlOutput:
             try:
                 from lxml import etree
                 xml = getPeepXML(statsDict, version, revision)
                 sys.stdout.write(xml)
+                if options.isProfiling:
+                    # The standard output only holds the XML document
+                    sys.stderr.write(pdf.getProfile().getTable() + newLine)
             except:
                 errorMessage = '*** Error: Exception while generating the XML file!!'
                 traceback.print_exc(file=open(errorsFile,'a'))
@@ -382,11 +447,11 @@ try:
                 except:
                     COLORIZED_OUTPUT = False
             if options.scriptFile != None:
-                from PDFConsole import PDFConsole
+                from PDFConsole import PDFConsole, PDFScriptExecutor
                 scriptFileObject = open(options.scriptFile,'rb')
                 console = PDFConsole(pdf, VT_KEY, options.avoidColors, stdin=scriptFileObject)
                 try:
-                    console.cmdloop()
+                    PDFScriptExecutor(console, options.scriptThreads).run()
                 except:
                     errorMessage = '*** Error: using the batch mode!!'
                     scriptFileObject.close()
@@ -477,8 +542,9 @@ try:
                         actions = statsVersion['Actions']
                         events = statsVersion['Events']
                         vulns = statsVersion['Vulns']
+                        shellcode = statsVersion['Shellcode']
                         elements = statsVersion['Elements']
-                        if events != None or actions != None or vulns != None or elements != None:
+                        if events != None or actions != None or vulns != None or shellcode != None or elements != None:
                             stats += newLine + beforeStaticLabel + '\tSuspicious elements:' + resetColor + newLine
                             if events != None:
                                 for event in events:
@@ -497,6 +563,9 @@ try:
                                         stats = stats[:-1] + '): ' + resetColor + str(vulns[vuln]) + newLine
                                     else:
                                         stats += '\t\t' + beforeStaticLabel + vuln + ': ' + resetColor + str(vulns[vuln]) + newLine
+                            if shellcode != None:
+                                for finding in shellcode:
+                                    stats += '\t\t' + beforeStaticLabel + finding + ': ' + resetColor + str(shellcode[finding]) + newLine
                             if elements != None:
                                 for element in elements:
                                     if vulnsDict.has_key(element):
@@ -518,6 +587,8 @@ try:
                         stats += newLine * 2
                 if fileName != None:
                     print(stats)
+                    if options.isProfiling:
+                        print(pdf.getProfile().getTable())
                 if options.isInteractive:
                     from PDFConsole import PDFConsole
                     console = PDFConsole(pdf, VT_KEY, options.avoidColors)
@@ -41,7 +41,7 @@
 import sys
 from pdfminer.pdfdocument import PDFDocument
 from pdfminer.pdfparser import PDFParser
-from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter, PDFFontCache
 from pdfminer.pdfdevice import PDFDevice, TagExtractor
 from pdfminer.pdfpage import PDFPage
 from pdfminer.converter import XMLConverter, HTMLConverter, TextConverter
@@ -54,13 +54,13 @@ def main(argv):
     import getopt
     def usage():
         print ('usage: %s [-d] [-p pagenos] [-m maxpages] [-P password] [-o output]'
-               ' [-C] [-n] [-A] [-V] [-M char_margin] [-L line_margin] [-W word_margin]'
+               ' [-C] [-X] [-n] [-A] [-V] [-M char_margin] [-L line_margin] [-W word_margin]'
                ' [-F boxes_flow] [-Y layout_mode] [-O output_dir] [-R rotation]'
                ' [-t text|html|xml|tag] [-c codec] [-s scale]'
                ' file ...' % argv[0])
         return 100
     try:
-        (opts, args) = getopt.getopt(argv[1:], 'dp:m:P:o:CnAVM:L:W:F:Y:O:R:t:c:s:')
+        (opts, args) = getopt.getopt(argv[1:], 'dp:m:P:o:CXnAVM:L:W:F:Y:O:R:t:c:s:')
     except getopt.GetoptError:
         return usage()
     if not args: return usage()
@@ -80,6 +80,7 @@ def main(argv):
     pageno = 1
     scale = 1
     caching = True
+    xrefcache = False
     showpageno = True
     laparams = LAParams()
     for (k, v) in opts:
@@ -89,6 +90,7 @@ def main(argv):
         elif k == '-P': password = v
         elif k == '-o': outfile = v
         elif k == '-C': caching = False
+        elif k == '-X': xrefcache = True
         elif k == '-n': laparams = None
         elif k == '-A': laparams.all_texts = True
         elif k == '-V': laparams.detect_vertical = True
@@ -110,7 +112,9 @@ def main(argv):
     PDFPageInterpreter.debug = debug
     PDFDevice.debug = debug
     #
-    rsrcmgr = PDFResourceManager(caching=caching)
+    # the fonts are shared between the files (by content, not by objid).
+    fontcache = PDFFontCache()
+    rsrcmgr = PDFResourceManager(caching=caching, fontcache=fontcache)
     if not outtype:
         outtype = 'text'
         if outfile:
@@ -140,10 +144,12 @@ def main(argv):
         return usage()
     for fname in args:
         fp = file(fname, 'rb')
+        rsrcmgr = PDFResourceManager(caching=caching, fontcache=fontcache)
         interpreter = PDFPageInterpreter(rsrcmgr, device)
         for page in PDFPage.get_pages(fp, pagenos,
                                       maxpages=maxpages, password=password,
-                                      caching=caching, check_extractable=True):
+                                      caching=caching, check_extractable=True,
+                                      xrefcache=xrefcache, mapped=True):
             page.rotate = (page.rotate+rotation) % 360
             interpreter.process_page(page)
         fp.close()
@@ -18,6 +18,9 @@ class Arcfour(object):
     '1021bf0420'
     >>> Arcfour('Secret').process('Attack at dawn').encode('hex')
     '45a01f645fc35b383552544b9bf5'
+    >>> cipher = Arcfour('Key')
+    >>> cipher.copy().process('Plaintext') == cipher.copy().process('Plaintext')
+    True
     """
 
     def __init__(self, key):
@@ -31,6 +34,13 @@ class Arcfour(object):
         (self.i, self.j) = (0, 0)
         return
 
+    # copy(): a new cipher with the same state, to reuse a key schedule.
+    def copy(self):
+        cipher = Arcfour.__new__(Arcfour)
+        cipher.s = self.s[:]
+        (cipher.i, cipher.j) = (self.i, self.j)
+        return cipher
+
     def process(self, data):
         (i, j) = (self.i, self.j)
         s = self.s
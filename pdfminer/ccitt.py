@@ -9,9 +9,11 @@
 #   ITU-T Recommendation T.6
 #     "FACSIMILE CODING SCHEMES AND CODING CONTROL FUNCTIONS FOR GROUP 4 FACSIMILE APPARATUS"
 
+from __future__ import absolute_import
 
 import sys
 import array
+import ccitt
 
 
 ##  BitParser
@@ -709,16 +711,15 @@ class CCITTFaxDecoder(CCITTG4Parser):
 
 
 def ccittfaxdecode(data, params):
-    K = params.get('K')
-    cols = params.get('Columns')
-    bytealign = params.get('EncodedByteAlign')
-    reversed = params.get('BlackIs1')
-    if K == -1:
-        parser = CCITTFaxDecoder(cols, bytealign=bytealign, reversed=reversed)
-    else:
-        raise ValueError(K)
-    parser.feedbytes(data)
-    return parser.close()
+    # decoded with the table-driven decoder shared with ParanoiDF's filters
+    K = params.get('K', 0)
+    cols = params.get('Columns', 1728)
+    rows = params.get('Rows', 0)
+    eol = params.get('EndOfLine', False)
+    bytealign = params.get('EncodedByteAlign', False)
+    eob = params.get('EndOfBlock', True)
+    reversed = params.get('BlackIs1', False)
+    return ccitt.CCITTFax().decode(data, K, eol, bytealign, cols, rows, eob, reversed)
 
 
 # test
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 import sys
+import os
 import re
+import mmap
 import struct
 try:
     import hashlib as md5
@@ -11,13 +13,14 @@ from psparser import literal_name
 from psparser import LIT, KWD, STRICT
 from pdftypes import PDFException, PDFTypeError, PDFNotImplementedError
 from pdftypes import PDFObjectNotFound, PDFStream
-from pdftypes import decipher_all
+from pdftypes import decipher_all, obj_size
 from pdftypes import int_value
 from pdftypes import str_value, list_value, dict_value, stream_value
 from pdfparser import PDFSyntaxError
 from pdfparser import PDFStreamParser
 from arcfour import Arcfour
 from utils import choplist, nunpack
+from utils import LRUCache
 from utils import decode_text
 
 
@@ -145,54 +148,192 @@ class PDFXRef(PDFBaseXRef):
 ##
 class PDFXRefFallback(PDFXRef):
 
+    """Rebuilds the xref of a damaged file by looking for the objects in it.
+
+    The whole file is scanned at once (through mmap when possible) for the
+    "objid genno obj" cues, skipping the content of the streams. Object
+    streams are only recorded at that point and expanded when one of the
+    objects they may contain is requested. The rebuilt xref can be saved
+    next to the file (cachefile) and reused while the file is unchanged.
+    """
+
+    def __init__(self):
+        PDFXRef.__init__(self)
+        self.objstms = []
+        self.trailerpos = None
+        self.parser = None
+        return
+
     def __repr__(self):
         return '<PDFXRefFallback: offsets=%r>' % (self.offsets.keys())
 
-    PDFOBJ_CUE = re.compile(r'^(\d+)\s+(\d+)\s+obj\b')
+    PDFOBJ_CUE = re.compile(r'(?<![^\r\n])(?:(\d+)\s+(\d+)\s+obj\b|trailer)|>>\s*stream\b')
+    OBJSTM_CUE = re.compile(r'/Type\s*/ObjStm\b')
+    CACHE_MAGIC = '%PDFMINER-XREF-1'
 
-    def load(self, parser, debug=0):
-        parser.seek(0)
-        while 1:
+    def load(self, parser, debug=0, cachefile=None):
+        self.parser = parser
+        fp = parser.fp
+        try:
+            st = os.fstat(fp.fileno())
+            stamp = (st.st_size, int(st.st_mtime))
+        except (AttributeError, EnvironmentError, ValueError):
+            stamp = None
+        if cachefile and stamp and self.load_cache(cachefile, stamp):
+            trailerpos = self.trailerpos
+        else:
+            trailerpos = self.scan(parser, debug=debug)
+            if cachefile and stamp:
+                self.save_cache(cachefile, stamp)
+        if trailerpos is not None:
+            parser.seek(trailerpos)
+            self.load_trailer(parser)
+            if 1 <= debug:
+                print >>sys.stderr, 'trailer: %r' % self.get_trailer()
+        return
+
+    def scan(self, parser, debug=0):
+        """Finds the objects and the (first) trailer of the file.
+
+        Returns the position of the trailer or None.
+        """
+        data = parser.data
+        if data is None:
             try:
-                (pos, line) = parser.nextline()
-            except PSEOF:
-                break
-            if line.startswith('trailer'):
-                parser.seek(pos)
-                self.load_trailer(parser)
-                if 1 <= debug:
-                    print >>sys.stderr, 'trailer: %r' % self.get_trailer()
-                break
-            m = self.PDFOBJ_CUE.match(line)
-            if not m:
-                continue
-            (objid, genno) = m.groups()
-            objid = int(objid)
-            genno = int(genno)
-            self.offsets[objid] = (None, pos, genno)
-            # expand ObjStm.
-            parser.seek(pos)
-            (_, obj) = parser.nextobject()
-            if isinstance(obj, PDFStream) and obj.get('Type') is LITERAL_OBJSTM:
-                stream = stream_value(obj)
-                try:
-                    n = stream['N']
-                except KeyError:
-                    if STRICT:
-                        raise PDFSyntaxError('N is not defined: %r' % stream)
-                    n = 0
-                parser1 = PDFStreamParser(stream.get_data())
-                objs = []
-                try:
-                    while 1:
-                        (_, obj) = parser1.nextobject()
-                        objs.append(obj)
-                except PSEOF:
-                    pass
-                n = min(n, len(objs)//2)
-                for index in xrange(n):
-                    objid1 = objs[index*2]
-                    self.offsets[objid1] = (objid, index, 0)
+                data = mmap.mmap(parser.fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, EnvironmentError, ValueError):
+                # not a real file (or an empty one).
+                parser.fp.seek(0)
+                data = parser.fp.read()
+        self.trailerpos = None
+        obj = None
+        try:
+            pos = 0
+            while 1:
+                m = self.PDFOBJ_CUE.search(data, pos)
+                if not m:
+                    break
+                pos = m.end(0)
+                if m.group(1) is not None:
+                    (objid, genno) = (int(m.group(1)), int(m.group(2)))
+                    self.offsets[objid] = (None, m.start(0), genno)
+                    obj = (objid, genno, m.start(0))
+                elif m.group(0) == 'trailer':
+                    self.trailerpos = m.start(0)
+                    break
+                else:
+                    # skip the stream content, noting the object streams.
+                    if obj is not None and self.OBJSTM_CUE.search(data, obj[2], m.start(0)):
+                        self.objstms.append(obj)
+                    obj = None
+                    i = data.find('endstream', pos)
+                    if i == -1:
+                        break
+                    pos = i+9
+        finally:
+            if isinstance(data, mmap.mmap) and data is not parser.data:
+                data.close()
+        if 1 <= debug:
+            print >>sys.stderr, 'xref fallback: %d objects, %d object streams' % \
+                                (len(self.offsets), len(self.objstms))
+        return self.trailerpos
+
+    def load_objstm(self, objid, genno, pos):
+        """Adds the objects of the object stream at the given position."""
+        self.parser.seek(pos)
+        (_, obj) = self.parser.nextobject()
+        if not isinstance(obj, PDFStream) or obj.get('Type') is not LITERAL_OBJSTM:
+            return
+        obj.set_objid(objid, genno)
+        stream = stream_value(obj)
+        try:
+            n = stream['N']
+        except KeyError:
+            if STRICT:
+                raise PDFSyntaxError('N is not defined: %r' % stream)
+            n = 0
+        parser1 = PDFStreamParser(stream.get_data())
+        objs = []
+        try:
+            while 1:
+                (_, obj) = parser1.nextobject()
+                objs.append(obj)
+        except PSEOF:
+            pass
+        n = min(n, len(objs)//2)
+        for index in xrange(n):
+            objid1 = objs[index*2]
+            # the objects found directly in the file take precedence.
+            if objid1 not in self.offsets:
+                self.offsets[objid1] = (objid, index, 0)
+        return
+
+    def get_objids(self):
+        while self.objstms:
+            self.load_objstm(*self.objstms.pop())
+        return self.offsets.iterkeys()
+
+    def get_pos(self, objid):
+        # the last object streams of the file are expanded first.
+        while objid not in self.offsets and self.objstms:
+            self.load_objstm(*self.objstms.pop())
+        return self.offsets[objid]
+
+    def load_cache(self, cachefile, stamp):
+        """Reads a xref saved by save_cache for the same file size and mtime.
+
+        The cache is a plain text file which is only trusted to contain
+        numbers (it may come along with a malicious document).
+        """
+        try:
+            fp = open(cachefile, 'rb')
+        except EnvironmentError:
+            return False
+        try:
+            try:
+                f = fp.readline().split()
+                if f != [self.CACHE_MAGIC, str(stamp[0]), str(stamp[1])]:
+                    return False
+                f = fp.readline().split()
+                trailerpos = None
+                if f[1] != '-':
+                    trailerpos = int(f[1])
+                offsets = {}
+                objstms = []
+                for line in fp:
+                    (kind, objid, genno, pos) = line.split()
+                    ent = (int(objid), int(genno), int(pos))
+                    if kind == 'o':
+                        offsets[ent[0]] = (None, ent[2], ent[1])
+                    elif kind == 's':
+                        objstms.append(ent)
+                    else:
+                        return False
+            except (IndexError, ValueError):
+                return False
+        finally:
+            fp.close()
+        self.offsets.update(offsets)
+        self.objstms = objstms
+        self.trailerpos = trailerpos
+        return True
+
+    def save_cache(self, cachefile, stamp):
+        """Writes the rebuilt xref (ignoring write errors)."""
+        lines = ['%s %d %d\n' % (self.CACHE_MAGIC, stamp[0], stamp[1]),
+                 'trailer %s\n' % ('-' if self.trailerpos is None else self.trailerpos)]
+        for (objid, (_, pos, genno)) in self.offsets.iteritems():
+            lines.append('o %d %d %d\n' % (objid, genno, pos))
+        for (objid, genno, pos) in self.objstms:
+            lines.append('s %d %d %d\n' % (objid, genno, pos))
+        try:
+            fp = open(cachefile, 'wb')
+            try:
+                fp.writelines(lines)
+            finally:
+                fp.close()
+        except EnvironmentError:
+            pass
         return
 
 
@@ -283,12 +424,23 @@ class PDFDocument(object):
       doc = PDFDocument(parser, password)
       obj = doc.getobj(objid)
 
+    When caching is enabled, the objects (already deciphered) and the
+    parsed object streams are kept in LRU caches of cachesize bytes
+    each (roughly estimated).
+
+    With xrefcache, the xref rebuilt by the fallback is saved in a
+    file next to the document (with the .xref suffix) and reused the
+    next times.
+
     """
 
     debug = 0
+    CACHE_SIZE = 32*1024*1024
+    KEY_CACHE_SIZE = 1024
     PASSWORD_PADDING = '(\xbfN^Nu\x8aAd\x00NV\xff\xfa\x01\x08..\x00\xb6\xd0h>\x80/\x0c\xa9\xfedSiz'
 
-    def __init__(self, parser, password='', caching=True, fallback=True):
+    def __init__(self, parser, password='', caching=True, fallback=True, cachesize=CACHE_SIZE,
+                 xrefcache=False):
         "Set the document to use a given PDFParser object."
         self.caching = caching
         self.xrefs = []
@@ -297,8 +449,9 @@ class PDFDocument(object):
         self.encryption = None
         self.decipher = None
         self._parser = None
-        self._cached_objs = {}
-        self._parsed_objs = {}
+        self._cached_objs = LRUCache(cachesize, lambda (obj, genno): obj_size(obj))
+        self._parsed_objs = LRUCache(cachesize, lambda (objs, n): obj_size(objs))
+        self._rc4_ciphers = LRUCache(self.KEY_CACHE_SIZE)
         self._parser = parser
         self._parser.set_document(self)
         self.is_printable = self.is_modifiable = self.is_extractable = True
@@ -311,8 +464,11 @@ class PDFDocument(object):
             fallback = True
         if fallback:
             parser.fallback = True
+            cachefile = None
+            if xrefcache and isinstance(getattr(parser.fp, 'name', None), str):
+                cachefile = parser.fp.name+'.xref'
             xref = PDFXRefFallback()
-            xref.load(parser)
+            xref.load(parser, cachefile=cachefile)
             self.xrefs.append(xref)
         for xref in self.xrefs:
             trailer = xref.get_trailer()
@@ -393,10 +549,15 @@ class PDFDocument(object):
         return
 
     def decrypt_rc4(self, objid, genno, data):
-        key = self.decrypt_key + struct.pack('<L', objid)[:3]+struct.pack('<L', genno)[:2]
-        hash = md5.md5(key)
-        key = hash.digest()[:min(len(key), 16)]
-        return Arcfour(key).process(data)
+        if (objid, genno) in self._rc4_ciphers:
+            cipher = self._rc4_ciphers[(objid, genno)]
+        else:
+            key = self.decrypt_key + struct.pack('<L', objid)[:3]+struct.pack('<L', genno)[:2]
+            hash = md5.md5(key)
+            key = hash.digest()[:min(len(key), 16)]
+            cipher = Arcfour(key)
+            self._rc4_ciphers[(objid, genno)] = cipher
+        return cipher.copy().process(data)
 
     def _getobj_objstm(self, stream, index, objid):
         if stream.objid in self._parsed_objs:
@@ -477,10 +638,13 @@ class PDFDocument(object):
                 raise PDFObjectNotFound(objid)
             if 2 <= self.debug:
                 print >>sys.stderr, 'register: objid=%r: %r' % (objid, obj)
+            # Objects are cached once deciphered, so each one is deciphered only once.
+            if self.decipher:
+                obj = decipher_all(self.decipher, objid, genno, obj)
             if self.caching:
                 self._cached_objs[objid] = (obj, genno)
-        if self.decipher:
-            obj = decipher_all(self.decipher, objid, genno, obj)
+                if isinstance(obj, PDFStream):
+                    obj.set_cache(self._cached_objs)
         return obj
 
     def get_outlines(self):
@@ -2,9 +2,9 @@
 import sys
 import re
 try:
-    from cStringIO import StringIO
+    import hashlib as md5
 except ImportError:
-    from StringIO import StringIO
+    import md5
 from cmapdb import CMapDB, CMap
 from psparser import PSTypeError, PSEOF
 from psparser import PSKeyword, literal_name, keyword_name
@@ -22,6 +22,7 @@ from pdfcolor import LITERAL_DEVICE_GRAY, LITERAL_DEVICE_RGB
 from pdfcolor import LITERAL_DEVICE_CMYK
 from utils import choplist
 from utils import mult_matrix, MATRIX_IDENTITY
+from utils import LRUCache
 
 
 ##  Exceptions
@@ -38,6 +39,8 @@ class PDFInterpreterError(PDFException):
 LITERAL_PDF = LIT('PDF')
 LITERAL_TEXT = LIT('Text')
 LITERAL_FONT = LIT('Font')
+LITERAL_TYPE3 = LIT('Type3')
+LITERAL_TYPE0 = LIT('Type0')
 LITERAL_FORM = LIT('Form')
 LITERAL_IMAGE = LIT('Image')
 
@@ -120,6 +123,120 @@ class PDFGraphicState(object):
                  self.miterlimit, self.dash, self.intent, self.flatness))
 
 
+##  Font Cache
+##
+class PDFFontCache(object):
+
+    """Fonts shared by several resource managers (and documents).
+
+    A font is identified by the content of its specification: the
+    dictionaries (with their references resolved) and the decoded data
+    of their streams, such as the font programs and ToUnicode maps.
+    Documents built from the same templates get the same font objects,
+    which are only built once. The least recently used fonts are
+    dropped once they take more than maxsize bytes (roughly estimated).
+
+    Cached fonts are detached from their document, so that the
+    document can be released: their descriptor only keeps its direct
+    values, without the font programs.
+
+    Typical usage:
+      fontcache = PDFFontCache()
+      for fp in files:
+          rsrcmgr = PDFResourceManager(fontcache=fontcache)
+          ...
+    """
+
+    MAXSIZE = 64*1024*1024
+    # stream attributes which only tell how the data is stored.
+    STREAM_ATTRS = ('Length', 'Filter', 'DecodeParms', 'F', 'FFilter', 'FDecodeParms', 'DL')
+
+    def __init__(self, maxsize=MAXSIZE):
+        self._fonts = LRUCache(maxsize, lambda (font, size): size)
+        self.hits = self.misses = 0
+        return
+
+    def __repr__(self):
+        return '<PDFFontCache: fonts=%d, hits=%d, misses=%d>' % (len(self._fonts), self.hits, self.misses)
+
+    def get_key(self, spec):
+        """Returns the content hash of a font specification.
+
+        Type3 fonts are not shared (None), as their glyphs are
+        described with the resources of their document. Type0 fonts
+        are not stored either (None): the font built for them is the
+        one of their descendant font, which is stored with the key of
+        its own specification (with the Encoding and ToUnicode of the
+        Type0 font) when get_font creates it.
+        """
+        if resolve1(spec.get('Subtype')) in (LITERAL_TYPE3, LITERAL_TYPE0):
+            return None
+        hash = md5.md5()
+        refs = {}
+
+        def feed(x):
+            if isinstance(x, PDFObjRef):
+                # the references are numbered by order of appearance.
+                if x.objid in refs:
+                    hash.update('R%d ' % refs[x.objid])
+                    return
+                refs[x.objid] = len(refs)
+                x = x.resolve()
+            if isinstance(x, dict):
+                hash.update('<<')
+                for k in sorted(x.iterkeys()):
+                    hash.update('/%s ' % k)
+                    feed(x[k])
+                hash.update('>>')
+            elif isinstance(x, list):
+                hash.update('[')
+                for v in x:
+                    feed(v)
+                hash.update(']')
+            elif isinstance(x, PDFStream):
+                hash.update('stream')
+                feed(dict((k, v) for (k, v) in x.attrs.iteritems() if k not in self.STREAM_ATTRS))
+                data = x.get_data() or ''
+                hash.update('%d ' % len(data))
+                hash.update(data)
+            elif isinstance(x, str):
+                hash.update('(%d)' % len(x))
+                hash.update(x)
+            else:
+                hash.update('%s:%r ' % (type(x).__name__, x))
+            return
+        feed(spec)
+        return hash.hexdigest()
+
+    def get(self, key):
+        """Returns the font with the given key or None."""
+        if key in self._fonts:
+            self.hits += 1
+            return self._fonts[key][0]
+        self.misses += 1
+        return None
+
+    def put(self, key, font):
+        """Adds a font, detaching it from its document."""
+        descriptor = {}
+        for (k, v) in font.descriptor.iteritems():
+            v = resolve1(v)
+            if isinstance(v, list):
+                v = [resolve1(x) for x in v]
+            if not isinstance(v, (dict, PDFStream)):
+                descriptor[k] = v
+        font.descriptor = descriptor
+        if hasattr(font, 'fontfile'):
+            font.fontfile = None
+        size = 1024
+        for name in ('widths', 'disps', 'cid2unicode'):
+            size += 64*len(getattr(font, name, None) or ())
+        if getattr(font, 'unicode_map', None):
+            size += 64*len(font.unicode_map.cid2unichr)
+        self._fonts[key] = (font, size)
+        return
+
+
 ##  Resource Manager
 ##
 class PDFResourceManager(object):
@@ -129,11 +246,15 @@ class PDFResourceManager(object):
     ResourceManager facilitates reuse of shared resources
     such as fonts and images so that large objects are not
     allocated multiple times.
+
+    With a fontcache (PDFFontCache), the fonts are also shared with
+    the other resource managers using the same cache.
     """
     debug = 0
 
-    def __init__(self, caching=True):
+    def __init__(self, caching=True, fontcache=None):
         self.caching = caching
+        self.fontcache = fontcache
         self._cached_fonts = {}
         return
 
@@ -160,47 +281,59 @@ class PDFResourceManager(object):
         if objid and objid in self._cached_fonts:
             font = self._cached_fonts[objid]
         else:
-            if 2 <= self.debug:
-                print >>sys.stderr, 'get_font: create: objid=%r, spec=%r' % (objid, spec)
-            if STRICT:
-                if spec['Type'] is not LITERAL_FONT:
-                    raise PDFFontError('Type is not /Font')
-            # Create a Font object.
-            if 'Subtype' in spec:
-                subtype = literal_name(spec['Subtype'])
-            else:
-                if STRICT:
-                    raise PDFFontError('Font Subtype is not specified.')
-                subtype = 'Type1'
-            if subtype in ('Type1', 'MMType1'):
-                # Type1 Font
-                font = PDFType1Font(self, spec)
-            elif subtype == 'TrueType':
-                # TrueType Font
-                font = PDFTrueTypeFont(self, spec)
-            elif subtype == 'Type3':
-                # Type3 Font
-                font = PDFType3Font(self, spec)
-            elif subtype in ('CIDFontType0', 'CIDFontType2'):
-                # CID Font
-                font = PDFCIDFont(self, spec)
-            elif subtype == 'Type0':
-                # Type0 Font
-                dfonts = list_value(spec['DescendantFonts'])
-                assert dfonts
-                subspec = dict_value(dfonts[0]).copy()
-                for k in ('Encoding', 'ToUnicode'):
-                    if k in spec:
-                        subspec[k] = resolve1(spec[k])
-                font = self.get_font(None, subspec)
-            else:
-                if STRICT:
-                    raise PDFFontError('Invalid Font spec: %r' % spec)
-                font = PDFType1Font(self, spec)  # this is so wrong!
+            key = font = None
+            if self.caching and self.fontcache is not None:
+                key = self.fontcache.get_key(spec)
+                if key is not None:
+                    font = self.fontcache.get(key)
+            if font is None:
+                font = self.create_font(objid, spec)
+                if key is not None:
+                    self.fontcache.put(key, font)
             if objid and self.caching:
                 self._cached_fonts[objid] = font
         return font
 
+    def create_font(self, objid, spec):
+        if 2 <= self.debug:
+            print >>sys.stderr, 'get_font: create: objid=%r, spec=%r' % (objid, spec)
+        if STRICT:
+            if spec['Type'] is not LITERAL_FONT:
+                raise PDFFontError('Type is not /Font')
+        # Create a Font object.
+        if 'Subtype' in spec:
+            subtype = literal_name(spec['Subtype'])
+        else:
+            if STRICT:
+                raise PDFFontError('Font Subtype is not specified.')
+            subtype = 'Type1'
+        if subtype in ('Type1', 'MMType1'):
+            # Type1 Font
+            font = PDFType1Font(self, spec)
+        elif subtype == 'TrueType':
+            # TrueType Font
+            font = PDFTrueTypeFont(self, spec)
+        elif subtype == 'Type3':
+            # Type3 Font
+            font = PDFType3Font(self, spec)
+        elif subtype in ('CIDFontType0', 'CIDFontType2'):
+            # CID Font
+            font = PDFCIDFont(self, spec)
+        elif subtype == 'Type0':
+            # Type0 Font
+            dfonts = list_value(spec['DescendantFonts'])
+            assert dfonts
+            subspec = dict_value(dfonts[0]).copy()
+            for k in ('Encoding', 'ToUnicode'):
+                if k in spec:
+                    subspec[k] = resolve1(spec[k])
+            font = self.get_font(None, subspec)
+        else:
+            if STRICT:
+                raise PDFFontError('Invalid Font spec: %r' % spec)
+            font = PDFType1Font(self, spec)  # this is so wrong!
+        return font
+
 
 ##  PDFContentParser
 ##
@@ -212,31 +345,32 @@ class PDFContentParser(PSStackParser):
         PSStackParser.__init__(self, None)
         return
 
-    def fillfp(self):
-        if not self.fp:
+    def filldata(self):
+        if self.data is None:
             if self.istream < len(self.streams):
                 strm = stream_value(self.streams[self.istream])
                 self.istream += 1
             else:
                 raise PSEOF('Unexpected EOF, file truncated?')
-            self.fp = StringIO(strm.get_data())
+            self.data = strm.get_data()
         return
 
     def seek(self, pos):
-        self.fillfp()
+        self.filldata()
         PSStackParser.seek(self, pos)
         return
 
     def fillbuf(self):
+        # each stream is tokenized in place, as a whole.
         if self.charpos < len(self.buf):
             return
         while 1:
-            self.fillfp()
-            self.bufpos = self.fp.tell()
-            self.buf = self.fp.read(self.BUFSIZ)
-            if self.buf:
+            self.data = None
+            self.filldata()
+            if self.data:
                 break
-            self.fp = None
+        self.bufpos = 0
+        self.buf = self.data
         self.charpos = 0
         return
 
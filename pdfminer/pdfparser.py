@@ -1,9 +1,6 @@
 #!/usr/bin/env python
 import sys
-try:
-    from cStringIO import StringIO
-except ImportError:
-    from StringIO import StringIO
+import mmap
 from psparser import PSStackParser
 from psparser import PSSyntaxError, PSEOF
 from psparser import KWD, STRICT
@@ -37,10 +34,22 @@ class PDFParser(PSStackParser):
       parser.seek(offset)
       parser.nextobject()
 
+    With mapped=True, the file is mapped in memory (when possible)
+    and parsed in place instead of being read by chunks.
     """
 
-    def __init__(self, fp):
-        PSStackParser.__init__(self, fp)
+    def __init__(self, fp, mapped=False):
+        data = fp
+        if mapped:
+            try:
+                data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, EnvironmentError, ValueError):
+                # not a real file (or an empty one).
+                pass
+        PSStackParser.__init__(self, data)
+        if data is not fp:
+            # the file object is kept anyway (for its name).
+            self.fp = fp
         self.doc = None
         self.fallback = False
         return
@@ -99,23 +108,32 @@ class PDFParser(PSStackParser):
                     raise PDFSyntaxError('Unexpected EOF')
                 return
             pos += len(line)
-            self.fp.seek(pos)
-            data = self.fp.read(objlen)
+            data = self.read_data(pos, objlen)
             self.seek(pos+objlen)
-            while 1:
-                try:
-                    (linepos, line) = self.nextline()
-                except PSEOF:
+            if self.data is not None:
+                # the whole data is there, no need to go line by line.
+                i = self.data.find('endstream', pos+objlen)
+                if i == -1:
                     if STRICT:
                         raise PDFSyntaxError('Unexpected EOF')
-                    break
-                if 'endstream' in line:
-                    i = line.index('endstream')
-                    objlen += i
-                    data += line[:i]
-                    break
-                objlen += len(line)
-                data += line
+                    i = len(self.data)
+                data += self.data[pos+objlen:i]
+                objlen = i-pos
+            else:
+                while 1:
+                    try:
+                        (linepos, line) = self.nextline()
+                    except PSEOF:
+                        if STRICT:
+                            raise PDFSyntaxError('Unexpected EOF')
+                        break
+                    if 'endstream' in line:
+                        i = line.index('endstream')
+                        objlen += i
+                        data += line[:i]
+                        break
+                    objlen += len(line)
+                    data += line
             self.seek(pos+objlen)
             # XXX limit objlen not to exceed object boundary
             if 2 <= self.debug:
@@ -144,7 +162,7 @@ class PDFStreamParser(PDFParser):
     """
 
     def __init__(self, data):
-        PDFParser.__init__(self, StringIO(data))
+        PDFParser.__init__(self, data)
         return
 
     def flush(self):
@@ -94,17 +94,38 @@ def resolve_all(x, default=None):
 
 def decipher_all(decipher, objid, genno, x):
     """Recursively deciphers the given object.
+
+    Lists and dictionaries are copied, so the given object can be
+    deciphered again (it is left untouched).
     """
     if isinstance(x, str):
         return decipher(objid, genno, x)
     if isinstance(x, list):
         x = [decipher_all(decipher, objid, genno, v) for v in x]
     elif isinstance(x, dict):
-        for (k, v) in x.iteritems():
-            x[k] = decipher_all(decipher, objid, genno, v)
+        x = dict((k, decipher_all(decipher, objid, genno, v)) for (k, v) in x.iteritems())
     return x
 
 
+def obj_size(x):
+    """Roughly estimates the memory used by the given object (bytes).
+    """
+    if isinstance(x, str):
+        return 40+len(x)
+    if isinstance(x, list):
+        return 72+sum(obj_size(v) for v in x)
+    if isinstance(x, dict):
+        return 280+sum(50+obj_size(v) for v in x.itervalues())
+    if isinstance(x, PDFStream):
+        size = 400+obj_size(x.attrs)
+        if x.rawdata is not None:
+            size += len(x.rawdata)
+        if x.data is not None:
+            size += len(x.data)
+        return size
+    return 24
+
+
 # Type cheking
 def int_value(x):
     x = resolve1(x)
@@ -181,6 +202,7 @@ class PDFStream(PDFObject):
         self.data = None
         self.objid = None
         self.genno = None
+        self.cache = None
         return
 
     def set_objid(self, objid, genno):
@@ -188,6 +210,19 @@ class PDFStream(PDFObject):
         self.genno = genno
         return
 
+    def set_cache(self, cache):
+        """Sets the LRUCache holding the stream, its size is measured
+        again when the data is decoded."""
+        self.cache = cache
+        return
+
+    def set_data(self, data):
+        self.data = data
+        self.rawdata = None
+        if self.cache is not None:
+            self.cache.resize(self.objid)
+        return
+
     def __repr__(self):
         if self.data is None:
             assert self.rawdata is not None
@@ -227,8 +262,7 @@ class PDFStream(PDFObject):
             data = self.decipher(self.objid, self.genno, data)
         filters = self.get_filters()
         if not filters:
-            self.data = data
-            self.rawdata = None
+            self.set_data(data)
             return
         for f in filters:
             params = self.get_any(('DP', 'DecodeParms', 'FDecodeParms'), {})
@@ -241,7 +275,7 @@ class PDFStream(PDFObject):
                         raise PDFException('Invalid zlib bytes: %r, %r' % (e, data))
                     data = ''
             elif f in LITERALS_LZW_DECODE:
-                data = lzwdecode(data)
+                data = lzwdecode(data, int_value(params.get('EarlyChange', 1)))
             elif f in LITERALS_ASCII85_DECODE:
                 data = ascii85decode(data)
             elif f in LITERALS_ASCIIHEX_DECODE:
@@ -269,8 +303,7 @@ class PDFStream(PDFObject):
                     data = apply_png_predictor(pred, colors, columns, bitspercomponent, data)
                 else:
                     raise PDFNotImplementedError('Unsupported predictor: %r' % pred)
-        self.data = data
-        self.rawdata = None
+        self.set_data(data)
         return
 
     def get_data(self):
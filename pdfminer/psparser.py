@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import sys
 import re
+import mmap
 from utils import choplist
 
 STRICT = 0
@@ -151,18 +152,37 @@ END_KEYWORD = re.compile(r'[#/%\[\]()<>{}\s]')
 END_STRING = re.compile(r'[()\134]')
 OCT_STRING = re.compile(r'[0-7]')
 ESC_STRING = {'b': 8, 't': 9, 'n': 10, 'f': 12, 'r': 13, '(': 40, ')': 41, '\\': 92}
+# tokens that can be taken at once, when they are followed by a delimiter:
+# integer, real, literal, keyword, string, hex string and brackets.
+SIMPLE_TOKEN = re.compile(r'([-+]?\d+)(?=[^\d.])|'
+                          r'([-+]?(?:\d+\.\d*|\.\d+))(?=\D)|'
+                          r'/([^#/%\[\]()<>{}\s]*)(?=[/%\[\]()<>{}\s])|'
+                          r'([A-Za-z][^#/%\[\]()<>{}\s]*)(?=[#/%\[\]()<>{}\s])|'
+                          r'\(([^()\\]*)\)|'
+                          r'<([0-9a-fA-F\s]*)>(?=[^>])|'
+                          r'(<<|>>|[\[\]{}])')
 
 
 class PSBaseParser(object):
 
     """Most basic PostScript parser that performs only tokenization.
+
+    The parser reads either a file object or the whole data at once
+    (a string or a mmap). In the latter case the data is tokenized in
+    place, with no intermediate buffers. File objects are read by
+    chunks, starting with BUFSIZ bytes and doubling the chunk size
+    (up to MAXBUFSIZ) while the reading is sequential.
     """
     BUFSIZ = 4096
+    MAXBUFSIZ = 1024*1024
 
     debug = 0
 
     def __init__(self, fp):
-        self.fp = fp
+        if isinstance(fp, (str, mmap.mmap)):
+            (self.fp, self.data) = (None, fp)
+        else:
+            (self.fp, self.data) = (fp, None)
         self.seek(0)
         return
 
@@ -180,9 +200,12 @@ class PSBaseParser(object):
         return self.bufpos+self.charpos
 
     def poll(self, pos=None, n=80):
-        pos0 = self.fp.tell()
         if not pos:
             pos = self.bufpos+self.charpos
+        if self.data is not None:
+            print >>sys.stderr, 'poll(%d): %r' % (pos, self.data[pos:pos+n])
+            return
+        pos0 = self.fp.tell()
         self.fp.seek(pos)
         print >>sys.stderr, 'poll(%d): %r' % (pos, self.fp.read(n))
         self.fp.seek(pos0)
@@ -193,11 +216,17 @@ class PSBaseParser(object):
         """
         if 2 <= self.debug:
             print >>sys.stderr, 'seek: %r' % pos
-        self.fp.seek(pos)
         # reset the status for nextline()
-        self.bufpos = pos
-        self.buf = ''
-        self.charpos = 0
+        if self.data is not None:
+            self.bufpos = 0
+            self.buf = self.data
+            self.charpos = pos
+        else:
+            self.fp.seek(pos)
+            self.bufpos = pos
+            self.buf = ''
+            self.charpos = 0
+            self.bufsiz = self.BUFSIZ
         # reset the status for nexttoken()
         self._parse1 = self._parse_main
         self._curtoken = ''
@@ -208,14 +237,29 @@ class PSBaseParser(object):
     def fillbuf(self):
         if self.charpos < len(self.buf):
             return
+        if self.data is not None:
+            # the whole data is already in the buffer.
+            raise PSEOF('Unexpected EOF')
         # fetch next chunk.
         self.bufpos = self.fp.tell()
-        self.buf = self.fp.read(self.BUFSIZ)
+        self.buf = self.fp.read(self.bufsiz)
         if not self.buf:
             raise PSEOF('Unexpected EOF')
         self.charpos = 0
+        self.bufsiz = min(self.bufsiz*2, self.MAXBUFSIZ)
         return
 
+    def read_data(self, pos, n):
+        """Returns n bytes from the given position.
+
+        The file object may be moved, so the parser has to be seeked
+        afterwards.
+        """
+        if self.data is not None:
+            return self.data[pos:pos+n]
+        self.fp.seek(pos)
+        return self.fp.read(n)
+
     def nextline(self):
         """Fetches a next line that ends either with \\r or \\n.
         """
@@ -251,14 +295,16 @@ class PSBaseParser(object):
 
         This is used to locate the trailers at the end of a file.
         """
-        self.fp.seek(0, 2)
-        pos = self.fp.tell()
+        if self.data is not None:
+            pos = len(self.data)
+        else:
+            self.fp.seek(0, 2)
+            pos = self.fp.tell()
         buf = ''
         while 0 < pos:
             prevpos = pos
             pos = max(0, pos-self.BUFSIZ)
-            self.fp.seek(pos)
-            s = self.fp.read(prevpos-pos)
+            s = self.read_data(pos, prevpos-pos)
             if not s:
                 break
             while 1:
@@ -276,8 +322,33 @@ class PSBaseParser(object):
         if not m:
             return len(s)
         j = m.start(0)
-        c = s[j]
         self._curtokenpos = self.bufpos+j
+        m = SIMPLE_TOKEN.match(s, j)
+        if m:
+            # the whole token is there, no need to go char by char.
+            k = m.lastindex
+            token = m.group(k)
+            if k == 1:
+                token = int(token)
+            elif k == 2:
+                token = float(token)
+            elif k == 3:
+                token = LIT(token)
+            elif k == 4:
+                if token == 'true':
+                    token = True
+                elif token == 'false':
+                    token = False
+                else:
+                    token = KWD(token)
+            elif k == 6:
+                token = HEX_PAIR.sub(lambda m: chr(int(m.group(0), 16)),
+                                     SPC.sub('', token))
+            elif k == 7:
+                token = KWD(token)
+            self._add_token(token)
+            return m.end(0)
+        c = s[j]
         if c == '%':
             self._curtoken = '%'
             self._parse1 = self._parse_comment
@@ -4,6 +4,7 @@ Miscellaneous Routines.
 """
 import struct
 from sys import maxint as INF
+from collections import OrderedDict
 
 
 ##  PNG Predictor
@@ -237,6 +238,86 @@ def matrix2str((a, b, c, d, e, f)):
 
 ##  Plane
 ##
+##  LRUCache
+##
+class LRUCache(object):
+
+    """A dictionary holding at most maxsize units (as measured by the
+    sizeof function, one per entry by default). The least recently used
+    entries are discarded to make room for the new ones.
+
+    >>> cache = LRUCache(3)
+    >>> cache['a'] = 1; cache['b'] = 2; cache['c'] = 3
+    >>> cache['a']
+    1
+    >>> cache['d'] = 4
+    >>> 'b' in cache
+    False
+    >>> cache.keys()
+    ['c', 'a', 'd']
+    """
+
+    def __init__(self, maxsize, sizeof=None):
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.size = 0
+        self._entries = OrderedDict()
+        return
+
+    def __repr__(self):
+        return ('<LRUCache entries=%d size=%d/%d>' % (len(self._entries), self.size, self.maxsize))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __getitem__(self, key):
+        (value, size) = self._entries.pop(key)
+        self._entries[key] = (value, size)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._entries:
+            del self[key]
+        if self.sizeof is None:
+            size = 1
+        else:
+            size = self.sizeof(value)
+        if self.maxsize < size:
+            return
+        while self._entries and self.maxsize < self.size+size:
+            (_, (_, oldsize)) = self._entries.popitem(last=False)
+            self.size -= oldsize
+        self._entries[key] = (value, size)
+        self.size += size
+        return
+
+    def __delitem__(self, key):
+        (_, size) = self._entries.pop(key)
+        self.size -= size
+        return
+
+    def keys(self):
+        return self._entries.keys()
+
+    def resize(self, key):
+        """Measures again the size of an entry whose value has grown,
+        discarding the least recently used entries to keep the limit."""
+        if key not in self._entries or self.sizeof is None:
+            return
+        (value, oldsize) = self._entries.pop(key)
+        self.size -= oldsize
+        self[key] = value
+        return
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+        return
+
+
 ##  A set-like data structure for objects placed on a plane.
 ##  Can efficiently find objects in a certain rectangular area.
 ##  It maintains two parallel lists of objects, each of
@@ -0,0 +1,98 @@
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Generates tests/corpus/parserObjects.json: random indirect objects, valid and mutated, with the results of the parser found in the given directory.
+    The committed corpus was generated with the tokenizer previous to the offset-based one (a checkout of its parent revision), so testParser.py checks that both build the same object trees for the objects parsed without errors.
+    The objects which make the reference parser raise an exception or take more than two seconds are left out.
+
+    Usage: python tests/makeParserCorpus.py [-n num_objects] [-s seed] reference_dir
+'''
+
+import json, optparse, os, random, signal, sys
+
+atoms = ['1', '-2.5', '+.5', '3.', 'true', 'false', 'null', '12 0 R', '4 0 R', '/Name', '/A#20B', '(str)', '(a\\)b)', '(nested (paren) s)', '(\\\\)', '<414243>', '<4142 43>',
+         '<>', '()', '[]', '<< >>', '%comment\n', '% c\r\n', '\n', '  ', '\r\n', '\x00', '/', '(', ')', '<', '>', '[', ']', '<<', '>>', '{', '}', 'R', 'obj', 'stream\nabc\nendstream', 'endobj', '0', '99 7 R']
+numValueAtoms = 17
+
+def makeValue(depth):
+    choice = random.random()
+    if depth > 3 or choice < 0.45:
+        return random.choice(atoms[:numValueAtoms])
+    if choice < 0.7:
+        return '[' + random.choice(['', ' ']) + ' '.join([makeValue(depth + 1) for i in range(random.randint(0, 5))]) + random.choice(['', ' ']) + ']'
+    return makeDictionary(depth + 1)
+
+def makeDictionary(depth):
+    items = ['/K%d %s' % (random.randint(0, 9), makeValue(depth)) for i in range(random.randint(0, 5))]
+    separator = random.choice([' ', '\n', '\r\n', ''])
+    return '<<' + separator + separator.join(items) + separator + '>>'
+
+def makeIndirectObject():
+    '''
+        @return: A random indirect object, with some atoms inserted, removed or replaced in one of each two objects
+    '''
+    if random.random() < 0.3:
+        body = makeValue(0)
+    else:
+        body = makeDictionary(0)
+    if random.random() < 0.25:
+        body = makeDictionary(0) + random.choice(['\nstream\n', '\r\nstream\r\n', 'stream\n']) + 'xx(<[/%\nyy' + random.choice(['\nendstream', 'endstream', ''])
+    rawObject = list('%d 0 obj%s%s%s' % (random.randint(1, 50), random.choice([' ', '\n', '\r\n']), body, random.choice(['\nendobj', 'endobj', ' endobj', ''])))
+    for i in range(random.choice([0, 0, 0, 1, 2, 4])):
+        operation = random.random()
+        position = random.randint(0, len(rawObject))
+        if operation < 0.4:
+            rawObject.insert(position, random.choice(atoms))
+        elif position < len(rawObject):
+            if operation < 0.8:
+                del rawObject[position]
+            else:
+                rawObject[position] = random.choice(atoms)
+    return ''.join(rawObject)
+
+def timeoutHandler(signum, frame):
+    raise KeyboardInterrupt()
+
+if __name__ == '__main__':
+    argsParser = optparse.OptionParser(usage = 'Usage: python tests/makeParserCorpus.py [options] reference_dir')
+    argsParser.add_option('-n', '--objects', action = 'store', type = 'int', dest = 'numObjects', default = 200, help = 'Number of random objects (default: 200)')
+    argsParser.add_option('-s', '--seed', action = 'store', type = 'int', dest = 'seed', default = 1, help = 'Seed of the random objects (default: 1)')
+    (options, args) = argsParser.parse_args()
+    if len(args) != 1:
+        sys.exit(argsParser.get_usage())
+    # The reference PDFCore is imported before testParser, which adds the current tree to the path
+    sys.path.insert(0, os.path.abspath(args[0]))
+    import PDFCore
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from testParser import parseIndirectObject, corpusFile
+    random.seed(options.seed)
+    signal.signal(signal.SIGALRM, timeoutHandler)
+    corpus = []
+    for i in range(options.numObjects):
+        rawObject = makeIndirectObject()
+        for forceMode in [False, True]:
+            signal.alarm(2)
+            try:
+                result = parseIndirectObject(rawObject, forceMode)
+            except BaseException:
+                continue
+            finally:
+                signal.alarm(0)
+            corpus.append({'raw': rawObject, 'forceMode': forceMode, 'result': result})
+    # One object per line
+    open(corpusFile, 'wb').write('[\n' + ',\n'.join([json.dumps(entry, encoding = 'latin-1', sort_keys = True) for entry in corpus]) + '\n]\n')
+    print('%d objects stored in %s' % (len(corpus), corpusFile))
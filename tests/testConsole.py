@@ -0,0 +1,99 @@
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Tests of the console commands with scripts, run by the console loop and by PDFScriptExecutor, on a synthetic document with incremental updates (benchmarks/pdfCorpus.py).
+    The VirusTotal lookups are answered by the local stub of benchmarks/vtBenchmark.py.
+
+    Usage: python -m unittest discover -s tests
+'''
+
+import os, shutil, sys, tempfile, unittest
+from cStringIO import StringIO
+testsDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(testsDir, '..'))
+sys.path.insert(0, os.path.join(testsDir, '..', 'benchmarks'))
+from PDFCore import PDFParser
+from PDFUtils import enableVTLookupService
+from PDFConsole import PDFConsole, PDFScriptExecutor
+from pdfCorpus import makeDocument
+from vtBenchmark import startStubServer
+
+
+class ConsoleScriptTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        fileName = os.path.join(cls.directory, 'updates.pdf')
+        makeDocument(fileName, objects = 30, updates = 2)
+        ret, cls.pdfFile = PDFParser().parse(fileName, True)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def runScript(self, script, executor):
+        '''
+            Runs a console script and returns its output
+
+            @param script: The commands (string)
+            @param executor: Boolean to run the script with PDFScriptExecutor instead of the console loop
+            @return: The output of the script (string)
+        '''
+        console = PDFConsole(self.pdfFile, 'testkey', True, stdin = StringIO(script))
+        output = StringIO()
+        stdout = sys.stdout
+        sys.stdout = output
+        try:
+            if executor:
+                PDFScriptExecutor(console, 4).run()
+            else:
+                console.cmdloop()
+        finally:
+            sys.stdout = stdout
+        return output.getvalue()
+
+    def testChangelogVersions(self):
+        # The diff between two versions must not end the script
+        for executor in [False, True]:
+            output = self.runScript('changelog 0 1\nchangelog 0 1 > %s\nobject 1\n' % os.path.join(self.directory, 'changes.txt'), executor)
+            self.assertTrue('Changes from version 0 to version 1' in output)
+            self.assertTrue('/Catalog' in output, 'The commands after changelog did not run (executor: %s)' % executor)
+
+    def testVTCheck(self):
+        # The lookups of the objects run at the same time, and the detection rate of the document, found in the cache, is stored when its output is printed, before info reads it
+        server = startStubServer(0.5)
+        vtService = enableVTLookupService('testkey', requestsPerMinute = 0, url = 'http://127.0.0.1:%d/' % server.server_port)
+        report = {'response_code':1, 'scan_date':'2026-01-01 00:00:00', 'positives':5, 'total':60, 'scans':{}, 'permalink':'http://127.0.0.1/report'}
+        vtService.storeReport(self.pdfFile.getMD5(), report)
+        try:
+            self.assertTrue(PDFScriptExecutor(PDFConsole(self.pdfFile, 'testkey', True, stdin = StringIO(''))).isParallel('vtcheck'))
+            output = self.runScript('vtcheck object 1\nvtcheck object 2\nvtcheck\ninfo\n', True)
+            self.assertEqual((server.numRequests, server.numResources), (1, 2))
+            self.assertTrue('Detection rate: 5/60' in output)
+            self.assertTrue('Detection: 5/60' in output, 'The detection rate was not stored before info')
+            self.assertEqual(self.pdfFile.getDetectionRate(), [5, 60])
+            self.pdfFile.setDetectionRate([])
+            output = self.runScript('vtcheck\ninfo\n', False)
+            self.assertTrue('Detection: 5/60' in output)
+        finally:
+            self.pdfFile.setDetectionRate([])
+            vtService.close()
+            server.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
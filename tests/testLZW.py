@@ -0,0 +1,118 @@
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Tests of the LZW codec (lzw.lzwencode and lzw.lzwdecode): round trips with both values of /EarlyChange, output of a reference decoder reading the codes bit by bit and throughput.
+
+    Usage: python -m unittest discover -s tests
+'''
+
+import os, random, sys, time, unittest
+testsDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(testsDir, '..'))
+sys.path.insert(0, os.path.join(testsDir, '..', 'benchmarks'))
+import lzw
+from lzwBenchmark import makeStream
+from pdfminer.lzw import lzwdecode as pdfminerLZWDecode
+
+def referenceLZWDecode(stream, earlyChange = 1):
+    '''
+        Straightforward LZW decoder of the PDF specification (7.4.4), reading the codes bit by bit, used as reference
+
+        @param stream: The encoded stream (string)
+        @param earlyChange: The value of /EarlyChange. By default: 1.
+        @return: The decoded stream (string)
+    '''
+    bits = ''.join([bin(ord(char))[2:].zfill(8) for char in stream])
+    table = [chr(i) for i in range(256)] + [None, None]
+    output = []
+    previous = None
+    position = 0
+    width = 9
+    while position + width <= len(bits):
+        code = int(bits[position:position + width], 2)
+        position += width
+        if code == 256:
+            table = table[:258]
+            previous = None
+        elif code == 257:
+            break
+        else:
+            if code < len(table):
+                entry = table[code]
+                if previous != None and len(table) < 4096:
+                    table.append(previous + entry[0])
+            elif code == len(table) and previous != None:
+                entry = previous + previous[0]
+                table.append(entry)
+            else:
+                break
+            output.append(entry)
+            previous = entry
+        width = min(12, (len(table) + earlyChange).bit_length())
+    return ''.join(output)
+
+
+class LZWTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        # Empty, shorter than a code, with codes of every width and with several table resets (more than 4096 codes)
+        self.streams = ['', 'a', 'ab' * 3, '-----A---B', makeStream(3000, 4), makeStream(64 * 1024, 64), makeStream(256 * 1024, 256), os.urandom(32 * 1024)]
+
+    def testRoundTrip(self):
+        for earlyChange in [0, 1]:
+            for stream in self.streams:
+                encoded = lzw.lzwencode(stream, earlyChange)
+                self.assertEqual(lzw.lzwdecode(encoded, earlyChange), stream, 'Wrong round trip of %d bytes with /EarlyChange %d' % (len(stream), earlyChange))
+
+    def testEarlyChange(self):
+        # The code width changes one code later without early change, so the streams differ once the 9 bits codes are exhausted
+        stream = self.streams[5]
+        self.assertNotEqual(lzw.lzwencode(stream, 0), lzw.lzwencode(stream, 1))
+
+    def testReferenceDecoder(self):
+        for earlyChange in [0, 1]:
+            for stream in self.streams[1:7]:
+                encoded = lzw.lzwencode(stream, earlyChange)
+                self.assertEqual(referenceLZWDecode(encoded, earlyChange), stream)
+            # Corrupt streams are decoded up to the first wrong code
+            for i in range(20):
+                encoded = os.urandom(random.randint(1, 64))
+                self.assertEqual(lzw.lzwdecode(encoded, earlyChange), referenceLZWDecode(encoded, earlyChange), 'Different output decoding %r' % encoded)
+        self.assertEqual(pdfminerLZWDecode(lzw.lzwencode(self.streams[5])), self.streams[5])
+
+    def testKnownStream(self):
+        # Example of the PDF specification (7.4.4.2)
+        self.assertEqual(lzw.lzwdecode('\x80\x0b\x60\x50\x22\x0c\x0c\x85\x01'), '-----A---B')
+        self.assertEqual(lzw.lzwencode('-----A---B'), '\x80\x0b\x60\x50\x22\x0c\x0c\x85\x01')
+
+    def testThroughput(self):
+        stream = makeStream(1024 * 1024, 64)
+        start = time.time()
+        encoded = lzw.lzwencode(stream)
+        encodeTime = time.time() - start
+        start = time.time()
+        decoded = lzw.lzwdecode(encoded)
+        decodeTime = time.time() - start
+        self.assertEqual(decoded, stream)
+        # Generous limits, so slow machines don't fail: a few tenths of second are expected
+        self.assertTrue(encodeTime < 10, 'Encoding 1MB took %.3fs' % (encodeTime))
+        self.assertTrue(decodeTime < 5, 'Decoding 1MB took %.3fs' % (decodeTime))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Tests of the object tokenizer of PDFParser: the indirect objects of tests/corpus/parserObjects.json which the former tokenizer, which copied the content for every element, parsed without errors must produce the same object trees and comments.
+    The malformed objects are only parsed: the former tokenizer looked for the closing delimiter with a count of the rest of the content, so its results with unbalanced delimiters are not kept.
+    The expected results of the corpus were generated by the former tokenizer with tests/makeParserCorpus.py.
+
+    Usage: python -m unittest discover -s tests
+'''
+
+import json, os, sys, time, unittest
+testsDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(testsDir, '..'))
+import PDFCore
+
+corpusFile = os.path.join(testsDir, 'corpus', 'parserObjects.json')
+
+def describeObject(pdfObject, depth = 0):
+    '''
+        Converts a PDFObject to a structure with the values returned by its public methods, which can be compared and stored as JSON
+
+        @param pdfObject: A PDFObject instance
+        @param depth: Nesting level of the object. By default: 0.
+        @return: A dictionary with the type, values, errors and elements of the object
+    '''
+    if pdfObject == None:
+        return None
+    if depth > 50:
+        return 'Too deep'
+    objectType = pdfObject.getType()
+    description = {'type': objectType, 'rawValue': pdfObject.getRawValue(), 'value': pdfObject.getValue(),
+                   'errors': list(pdfObject.getErrors()), 'references': list(pdfObject.getReferences())}
+    if objectType == 'reference':
+        description['id'] = pdfObject.getId()
+        description['genNumber'] = pdfObject.getGenNumber()
+    elif objectType == 'array':
+        description['elements'] = [describeObject(element, depth + 1) for element in pdfObject.getElements()]
+    elif objectType in ['dictionary', 'stream']:
+        elements = pdfObject.getElements()
+        description['elements'] = [[key, describeObject(elements[key], depth + 1)] for key in sorted(elements)]
+        if objectType == 'stream':
+            description['rawStream'] = pdfObject.getRawStream()
+    return description
+
+def parseIndirectObject(rawObject, forceMode):
+    '''
+        Parses an indirect object with a new parser and document
+
+        @param rawObject: The raw indirect object (string)
+        @param forceMode: Boolean to ignore the parsing errors
+        @return: A dictionary with the status, object, final position, comments and errors of the document, or the exit message
+    '''
+    PDFCore.isForceMode = forceMode
+    PDFCore.pdfFile = PDFCore.PDFFile()
+    parser = PDFCore.PDFParser()
+    try:
+        ret = parser.createPDFIndirectObject(rawObject, forceMode)
+    except SystemExit as exitError:
+        return {'exit': str(exitError)}
+    result = {'status': ret[0], 'comments': list(parser.comments), 'documentErrors': list(PDFCore.pdfFile.errors)}
+    if ret[0] == -1:
+        result['error'] = ret[1]
+    else:
+        result['id'] = ret[1].getId()
+        result['genNumber'] = ret[1].getGenerationNumber()
+        result['object'] = describeObject(ret[1].getObject())
+        result['charCounter'] = parser.charCounter
+    return result
+
+def hasErrors(result):
+    '''
+        Checks if the parsing of an indirect object found any error
+
+        @param result: A dictionary returned by parseIndirectObject
+        @return: A boolean
+    '''
+    if 'exit' in result or result['status'] == -1 or result['documentErrors'] != []:
+        return True
+    pendingObjects = [result['object']]
+    while pendingObjects != []:
+        description = pendingObjects.pop()
+        if not isinstance(description, dict):
+            continue
+        if description['errors'] != []:
+            return True
+        for element in description.get('elements', []):
+            if isinstance(element, list):
+                element = element[1]
+            pendingObjects.append(element)
+    return False
+
+def normalize(structure):
+    '''
+        Converts the strings of a structure to unicode (Latin-1), as they are read from the JSON corpus
+    '''
+    if isinstance(structure, bytes):
+        return structure.decode('latin-1')
+    if isinstance(structure, (list, tuple)):
+        return [normalize(element) for element in structure]
+    if isinstance(structure, dict):
+        return dict([(normalize(key), normalize(structure[key])) for key in structure])
+    return structure
+
+
+class ParserEquivalenceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = json.loads(open(corpusFile, 'rb').read().decode('latin-1'))
+
+    def testCorpus(self):
+        numValidObjects = 0
+        for entry in self.corpus:
+            rawObject = entry['raw'].encode('latin-1')
+            result = normalize(parseIndirectObject(rawObject, entry['forceMode']))
+            if not hasErrors(entry['result']):
+                numValidObjects += 1
+                self.assertEqual(result, entry['result'], 'Different result parsing %r (force mode: %s)' % (rawObject, entry['forceMode']))
+        self.assertTrue(numValidObjects > 0)
+
+    def testEscapedBackslash(self):
+        # The closing parenthesis after an escaped backslash ends the string
+        result = parseIndirectObject('1 0 obj\n[ (\\\\) (a\\)b) <<>> ]\nendobj', False)
+        self.assertFalse(hasErrors(result))
+        self.assertEqual([element['value'] for element in result['object']['elements'][:2]], ['\\', 'a)b'])
+
+    def testBigObject(self):
+        # Linear time: the former tokenizer took about a minute with this object
+        rawObject = '1 0 obj\n<< /Widths [' + ' '.join([str(i) for i in range(20000)]) + '] /Kids [' + ' '.join(['%d 0 R' % i for i in range(5000)]) + '] /S (' + 'x\\)' * 20000 + ') >>\nendobj'
+        start = time.time()
+        result = parseIndirectObject(rawObject, False)
+        self.assertTrue(time.time() - start < 10)
+        self.assertEqual(result['status'], 0)
+        elements = dict(result['object']['elements'])
+        self.assertEqual(len(elements['/Widths']['elements']), 20000)
+        self.assertEqual(len(elements['/Kids']['elements']), 5000)
+        self.assertEqual(elements['/S']['value'], 'x)' * 20000)
+
+    def testNestedContainers(self):
+        # Each nested string or array must not scan the rest of the object: counting the closing delimiters for each one took about 25 seconds with 40000 elements
+        for rawObject, numElements in [('1 0 obj\n<< ' + ' '.join(['/K%d (s)' % i for i in range(50000)]) + ' >>\nendobj', 50000),
+                                       ('1 0 obj\n[ ' + ' '.join(['[%d]' % i for i in range(50000)]) + ' ]\nendobj', 50000)]:
+            start = time.time()
+            result = parseIndirectObject(rawObject, False)
+            elapsed = time.time() - start
+            self.assertFalse(hasErrors(result))
+            self.assertEqual(len(result['object']['elements']), numElements)
+            self.assertTrue(elapsed < 15, 'Parsing %d nested elements took %.1fs' % (numElements, elapsed))
+
+
+if __name__ == '__main__':
+    unittest.main()
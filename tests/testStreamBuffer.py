@@ -0,0 +1,67 @@
+#
+#    This file is part of ParanoiDF.
+#
+#        ParanoiDF is free software: you can redistribute it and/or modify
+#        it under the terms of the GNU General Public License as published by
+#        the Free Software Foundation, either version 3 of the License, or
+#        (at your option) any later version.
+#
+#        ParanoiDF is distributed in the hope that it will be useful,
+#        but WITHOUT ANY WARRANTY; without even the implied warranty of
+#        MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.    See the
+#        GNU General Public License for more details.
+#
+#        You should have received a copy of the GNU General Public License
+#        along with ParanoiDF. If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Tests of the stream contents spilled to temporary files (PDFCore.PDFStreamBuffer), read by several threads like the console script executor does.
+
+    Usage: python -m unittest discover -s tests
+'''
+
+import os, sys, threading, unittest
+testsDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(testsDir, '..'))
+import PDFCore
+
+
+class StreamBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        PDFCore.enableStreamSpilling(1024)
+
+    def tearDown(self):
+        PDFCore.enableStreamSpilling(None)
+
+    def testSpilledBuffer(self):
+        content = os.urandom(4096)
+        streamBuffer = PDFCore.PDFStreamBuffer(content)
+        self.assertEqual(streamBuffer.content, None)
+        self.assertEqual(streamBuffer.get(), content)
+        self.assertTrue(streamBuffer.contains(content[:]))
+        self.assertFalse(streamBuffer.contains(content[::-1]))
+        smallBuffer = PDFCore.PDFStreamBuffer('abc')
+        self.assertEqual(smallBuffer.file, None)
+        self.assertEqual(smallBuffer.get(), 'abc')
+
+    def testConcurrentReads(self):
+        # Each thread reads all the buffers in turn, so the same file is read by several threads at once
+        contents = [os.urandom(200000) for i in range(4)]
+        streamBuffers = [PDFCore.PDFStreamBuffer(content) for content in contents]
+        wrongReads = []
+        def readBuffers(first):
+            for i in range(200):
+                index = (first + i) % len(streamBuffers)
+                if streamBuffers[index].get() != contents[index]:
+                    wrongReads.append(index)
+        threads = [threading.Thread(target = readBuffers, args = (first,)) for first in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(wrongReads, [])
+
+
+if __name__ == '__main__':
+    unittest.main()